@@ -0,0 +1,63 @@
+"""Concurrent order placement: verify no overselling and report throughput per thread count.
+
+Usage: python -m benchmarks.bench_concurrency [--orders N] [--products N] [--threads 1 2 4 8]
+"""
+import argparse
+import random
+import threading
+import time
+
+from ecommerce.ecommerce import ECommerce
+
+
+def run(threads, orders, products, stock):
+    ecommerce = ECommerce()
+    for i in range(products):
+        ecommerce.add_product(f"P{i}", f"Product {i}", 10, stock, "Misc")
+    for worker in range(threads):
+        ecommerce.add_customer(f"C{worker}", f"Customer {worker}", f"c{worker}@example.com", "5555555555")
+
+    rejected = [0] * threads
+
+    def place_orders(worker):
+        rng = random.Random(worker)
+        for n in range(orders // threads):
+            items = {f"P{i}": rng.randint(1, 3) for i in rng.sample(range(products), 3)}
+            try:
+                ecommerce.place_order(f"O{worker}-{n}", f"C{worker}", items)
+            except ValueError:
+                rejected[worker] += 1
+
+    workers = [threading.Thread(target=place_orders, args=(worker,)) for worker in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    sold = dict.fromkeys(ecommerce.products.ids(), 0)
+    for order in ecommerce.orders:
+        for item in order.items:
+            sold[item.product.product_id] += item.quantity
+    oversold = [p.product_id for p in ecommerce.products if p.stock < 0 or p.stock + sold[p.product_id] != stock]
+    attempted = threads * (orders // threads)
+    return attempted / elapsed, sum(rejected), oversold
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=80_000)
+    parser.add_argument("--products", type=int, default=1_000)
+    parser.add_argument("--stock", type=int, default=400)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args(argv)
+
+    print(f"{'threads':>7} {'orders/s':>10} {'rejected':>9}  consistent")
+    for threads in args.threads:
+        throughput, rejected, oversold = run(threads, args.orders, args.products, args.stock)
+        print(f"{threads:>7} {throughput:>10.0f} {rejected:>9}  {'yes' if not oversold else oversold}")
+
+
+if __name__ == "__main__":
+    main()
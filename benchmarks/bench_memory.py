@@ -0,0 +1,85 @@
+"""Measure resident bytes per order for the legacy and the compact entity layouts.
+
+Usage: python -m benchmarks.bench_memory [--orders N] [--items-per-order K]
+"""
+import argparse
+import datetime
+import gc
+import tracemalloc
+
+from ecommerce.ecommerce import Customer, Order, Product
+
+
+class LegacyProduct:
+    """Pre-__slots__ Product layout: per-instance __dict__."""
+
+    def __init__(self, product_id, name, price, stock, category):
+        self.product_id = product_id
+        self.name = name
+        self.price = price
+        self.stock = stock
+        self.category = category
+
+
+class LegacyCustomer:
+    def __init__(self, customer_id, name, email, phone_number):
+        self.customer_id = customer_id
+        self.name = name
+        self.email = email
+        self.phone_number = phone_number
+        self.purchase_history = []
+
+
+class LegacyOrder:
+    """Pre-__slots__ Order layout with {"product": ..., "quantity": ...} line items."""
+
+    def __init__(self, order_id, customer, order_date):
+        self.order_id = order_id
+        self.customer = customer
+        self.order_date = order_date
+        self.items = []
+        self.total_cost = 0
+
+    def add_item(self, product, quantity):
+        product.stock -= quantity
+        self.items.append({"product": product, "quantity": quantity})
+        self.total_cost += product.price * quantity
+
+
+def measure(product_cls, customer_cls, order_cls, orders, items_per_order):
+    products = [product_cls(f"P{i}", f"Product {i}", 10 + i, 10 ** 9, "Misc") for i in range(100)]
+    customers = [customer_cls(f"C{i}", f"Customer {i}", f"c{i}@example.com", "5555555555")
+                 for i in range(max(orders // 10, 1))]
+    today = datetime.date.today()
+    gc.collect()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    placed = []
+    for i in range(orders):
+        customer = customers[i % len(customers)]
+        order = order_cls(f"O{i}", customer, today)
+        for j in range(items_per_order):
+            order.add_item(products[(i + j) % len(products)], 1)
+        customer.purchase_history.append(order)
+        placed.append(order)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # The order ID strings and the list holding the orders are the same in both layouts.
+    return (current - baseline) / orders
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--items-per-order", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    before = measure(LegacyProduct, LegacyCustomer, LegacyOrder, args.orders, args.items_per_order)
+    after = measure(Product, Customer, Order, args.orders, args.items_per_order)
+    print(f"orders: {args.orders}, items per order: {args.items_per_order}")
+    print(f"legacy layout:  {before:8.1f} bytes/order")
+    print(f"compact layout: {after:8.1f} bytes/order ({100 * (1 - after / before):.1f}% smaller)")
+
+
+if __name__ == "__main__":
+    main()
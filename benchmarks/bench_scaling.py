@@ -0,0 +1,337 @@
+"""Time every public ECommerce method as the store grows, and flag regressions.
+
+For each size N the store holds N orders, N // 10 customers and N // 100
+products (at least 10 of each), generated by benchmarks.datagen and loaded
+with the import_* methods. Every operation is then called repeatedly, and
+the median call time and the peak memory allocated by one call are recorded.
+The scaling exponent is the least-squares slope of log(time) against log(N):
+about 0 for constant-time operations, 1 for linear, 2 for quadratic.
+
+Usage:
+    python -m benchmarks.bench_scaling --sizes 1000 10000 100000 --output results.json
+    python -m benchmarks.bench_scaling --sizes 1000 10000 --backend sqlite
+    python -m benchmarks.bench_scaling --sizes 1000 10000 --backend tiered
+    python -m benchmarks.bench_scaling --sizes 1000 10000 --baseline results.json
+
+The tiered backend archives the first half of the year's orders after
+loading, so order queries read both the in-memory and the archived tier.
+
+With --baseline, the exit status is 1 when any operation got slower than
+the baseline by more than --tolerance, or its exponent grew by more than
+--exponent-tolerance.
+"""
+import argparse
+import datetime
+import gc
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import datagen
+from ecommerce.archive import OrderArchive
+from ecommerce.ecommerce import ECommerce
+from ecommerce.sqlstore import SQLiteECommerce
+
+
+def _customer(data, i):
+    return data.customers[i * 7919 % len(data.customers)][0]
+
+
+def _product(data, i):
+    return data.products[i * 7919 % len(data.products)][0]
+
+
+def _order(data, i):
+    return data.orders[i * 7919 % len(data.orders)][0]
+
+
+def _category(data, i):
+    return data.products[i % len(data.products)][4]
+
+
+def _day(i):
+    return datagen.START_DATE + datetime.timedelta(days=i % 365)
+
+
+def _first_page(page):
+    return lambda store, data, i: page(store)
+
+
+# name -> operation(store, dataset, call_number). Read-only operations come
+# first; cancel_order runs last because it removes orders the others query.
+OPERATIONS = {
+    "list_products": lambda store, data, i: store.list_products(),
+    "search_products_by_category": lambda store, data, i: store.search_products_by_category(_category(data, i)),
+    "list_out_of_stock_products": lambda store, data, i: store.list_out_of_stock_products(),
+    "get_featured_products": lambda store, data, i: store.get_featured_products(),
+    "calculate_total_inventory_value": lambda store, data, i: store.calculate_total_inventory_value(),
+    "find_products_in_price_range": lambda store, data, i: store.find_products_in_price_range(100, 200),
+    "search_products": lambda store, data, i: store.search_products(data.products[i % len(data.products)][1][:-1]),
+    "list_customers": lambda store, data, i: store.list_customers(),
+    "get_customers_by_loyalty": lambda store, data, i: store.get_customers_by_loyalty(
+        ("Bronze", "Silver", "Gold", "Platinum")[i % 4]),
+    "find_customers_purchased_product": lambda store, data, i: store.find_customers_purchased_product(
+        _product(data, i)),
+    "get_inactive_customers": lambda store, data, i: store.get_inactive_customers(),
+    "search_customers": lambda store, data, i: store.search_customers(
+        data.customers[i * 7919 % len(data.customers)][2][2:-12]),
+    "get_highest_spending_customer": lambda store, data, i: store.get_highest_spending_customer(),
+    "find_customers_with_high_spending": lambda store, data, i: store.find_customers_with_high_spending(5000),
+    "list_orders": lambda store, data, i: store.list_orders(),
+    "get_orders_in_date_range": lambda store, data, i: store.get_orders_in_date_range(
+        _day(i), _day(i) + datetime.timedelta(days=7)),
+    "find_orders_by_date": lambda store, data, i: store.find_orders_by_date(_day(i).isoformat()),
+    "get_orders_by_customer": lambda store, data, i: store.get_orders_by_customer(_customer(data, i)),
+    "customer_purchase_history": lambda store, data, i: store.customer_purchase_history(_customer(data, i)),
+    "generate_customer_order_history": lambda store, data, i: store.generate_customer_order_history(
+        _customer(data, i)),
+    "generate_sales_report": lambda store, data, i: store.generate_sales_report(),
+    "sales_by_period": lambda store, data, i: store.sales_by_period(_day(i), _day(i) + datetime.timedelta(days=30),
+                                                                    "week"),
+    "generate_customer_spending_report": lambda store, data, i: store.generate_customer_spending_report(),
+    "top_selling_products": lambda store, data, i: store.top_selling_products(10),
+    "find_top_selling_product": lambda store, data, i: store.find_top_selling_product(),
+    "find_most_purchased_product": lambda store, data, i: store.find_most_purchased_product(),
+    "iter_products": lambda store, data, i: sum(1 for _ in store.iter_products()),
+    "iter_customers": lambda store, data, i: sum(1 for _ in store.iter_customers()),
+    "iter_orders": lambda store, data, i: sum(1 for _ in store.iter_orders()),
+    "iter_customer_purchase_history": lambda store, data, i: list(
+        store.iter_customer_purchase_history(_customer(data, i))),
+    "iter_customer_order_history": lambda store, data, i: list(store.iter_customer_order_history(_customer(data, i))),
+    "stats": lambda store, data, i: store.stats(),
+    "cache_stats": lambda store, data, i: store.cache_stats(),
+    "page_products": _first_page(lambda store: store.page_products(100)),
+    "page_customers": _first_page(lambda store: store.page_customers(100)),
+    "page_orders": _first_page(lambda store: store.page_orders(100)),
+    "add_product": lambda store, data, i: store.add_product(f"bench-P{i}", "Bench product", 10, 10, "Bench"),
+    "restock_product": lambda store, data, i: store.restock_product(_product(data, i), 1),
+    "mark_product_featured": lambda store, data, i: store.mark_product_featured(_product(data, i)),
+    "apply_discount_to_category": lambda store, data, i: store.apply_discount_to_category(_category(data, i), 0),
+    "add_customer": lambda store, data, i: store.add_customer(f"bench-C{i}", "Bench", "bench@example.com",
+                                                              "5555555555"),
+    "update_customer_email": lambda store, data, i: store.update_customer_email(_customer(data, i),
+                                                                                f"bench{i}@example.com"),
+    "update_customer_phone": lambda store, data, i: store.update_customer_phone(_customer(data, i), "5555555555"),
+    "deactivate_customer": lambda store, data, i: store.deactivate_customer(_customer(data, i)),
+    "place_order": lambda store, data, i: store.place_order(f"bench-O{i}", _customer(data, i), {"bench-stock": 1}),
+    "apply_order_discount": lambda store, data, i: store.apply_order_discount(_order(data, i), 0),
+    "cancel_order": lambda store, data, i: store.cancel_order(data.orders[-1 - i][0]),
+}
+IMPORTS = ("import_products", "import_customers", "import_orders")
+# Timed once, as part of "load", when the store has an archive.
+ARCHIVE_BEFORE = datagen.START_DATE + datetime.timedelta(days=182)
+# name -> store factory(scratch directory). peak_bytes only counts Python allocations, not SQLite's page cache.
+BACKENDS = {
+    "memory": lambda directory: ECommerce(),
+    "sqlite": lambda directory: SQLiteECommerce(os.path.join(tempfile.mkdtemp(dir=directory), "store.db")),
+    "tiered": lambda directory: ECommerce(archive=OrderArchive(tempfile.mkdtemp(dir=directory))),
+}
+
+
+def untimed_methods():
+    """Public ECommerce methods the harness does not cover."""
+    return sorted(name for name in dir(ECommerce)
+                  if not name.startswith("_") and name not in OPERATIONS and name not in IMPORTS
+                  and name != "archive_orders")
+
+
+def scale(size):
+    return max(size // 100, 10), max(size // 10, 10), size
+
+
+def _close(store):
+    if hasattr(store, "close"):
+        store.close()
+
+
+def load(paths, backend="memory"):
+    """Import the dataset into a fresh store; returns (store, {import method: seconds})."""
+    store = BACKENDS[backend](os.path.dirname(paths["products"]))
+    timings = {}
+    gc.collect()
+    for method, name in zip(IMPORTS, ("products", "customers", "orders")):
+        start = time.perf_counter()
+        getattr(store, method)(paths[name])
+        timings[method] = time.perf_counter() - start
+    if getattr(store, "archive", None) is not None:
+        start = time.perf_counter()
+        store.archive_orders(ARCHIVE_BEFORE)
+        timings["archive_orders"] = time.perf_counter() - start
+    return store, timings
+
+
+def load_peak_memory(paths, backend="memory"):
+    """Peak bytes allocated while importing the dataset; a separate run so tracemalloc does not skew timings."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        store, _ = load(paths, backend)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    _close(store)
+    return peak
+
+
+def time_operation(operation, store, data, min_time, max_calls):
+    """Return (median seconds per call, calls made)."""
+    gc.collect()
+    durations = []
+    while len(durations) < max_calls and (not durations or sum(durations) < min_time):
+        start = time.perf_counter()
+        operation(store, data, len(durations))
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations), len(durations)
+
+
+def peak_memory(operation, store, data, call_number):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        operation(store, data, call_number)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_size(size, operations, skew, seed, min_time, max_calls, measure_memory, backend="memory"):
+    products, customers, orders = scale(size)
+    data = datagen.generate(products, customers, orders, skew, seed=seed)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = data.write(directory)
+        store, timings = load(paths, backend)
+        try:
+            # "load" is the whole import; its peak memory is the store's footprint at this size.
+            results = {"load": {"seconds": sum(timings.values()), "calls": 1}}
+            if measure_memory:
+                results["load"]["peak_bytes"] = load_peak_memory(paths, backend)
+            results.update({method: {"seconds": seconds, "calls": 1} for method, seconds in timings.items()})
+            if "archive_orders" in timings:
+                # The order mutations need orders that are still in memory.
+                data.orders = [row for row in data.orders if row[0] in store.orders]
+            # Stock for place_order, so it never fails however many calls it gets.
+            store.add_product("bench-stock", "Bench stock", 10, 10 ** 9, "Bench")
+            for name in operations:
+                seconds, calls = time_operation(OPERATIONS[name], store, data, min_time, max_calls)
+                results[name] = {"seconds": seconds, "calls": calls}
+                if measure_memory:
+                    results[name]["peak_bytes"] = peak_memory(OPERATIONS[name], store, data, calls)
+        finally:
+            _close(store)
+    return results
+
+
+def exponent(points):
+    """Least-squares slope of log(seconds) against log(size), or None with fewer than two sizes."""
+    points = [(math.log(size), math.log(max(seconds, 1e-9))) for size, seconds in points]
+    if len(points) < 2:
+        return None
+    mean_x = statistics.fmean(x for x, _ in points)
+    mean_y = statistics.fmean(y for _, y in points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+
+def run(sizes, operations, skew=1.0, seed=0, min_time=0.05, max_calls=200, measure_memory=True, progress=None,
+        backend="memory"):
+    methods = {}
+    for size in sizes:
+        if progress:
+            progress(f"size {size}...")
+        for method, result in run_size(size, operations, skew, seed, min_time, max_calls, measure_memory,
+                                       backend).items():
+            methods.setdefault(method, {"sizes": {}})["sizes"][str(size)] = result
+    for entry in methods.values():
+        entry["exponent"] = exponent([(int(size), result["seconds"]) for size, result in entry["sizes"].items()])
+    return {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(), "sizes": sizes,
+                 "skew": skew, "seed": seed, "backend": backend,
+                 "created": datetime.datetime.now().isoformat(timespec="seconds")},
+        "methods": methods,
+    }
+
+
+def compare(current, baseline, tolerance=0.5, exponent_tolerance=0.25, noise_floor=5e-5):
+    """Return a list of regression messages for methods measured in both runs.
+
+    Timings below noise_floor seconds are too jittery to compare and are skipped,
+    and so is the exponent of a method whose slowest timing is below it.
+    """
+    regressions = []
+    for method, entry in current["methods"].items():
+        previous = baseline["methods"].get(method)
+        if previous is None:
+            continue
+        for size, result in entry["sizes"].items():
+            before = previous["sizes"].get(size)
+            if before and result["seconds"] >= noise_floor and result["seconds"] > before["seconds"] * (1 + tolerance):
+                regressions.append(f"{method} at {size}: {result['seconds'] * 1e3:.3f} ms vs "
+                                   f"{before['seconds'] * 1e3:.3f} ms baseline "
+                                   f"({result['seconds'] / before['seconds']:.1f}x)")
+        if (entry["exponent"] is not None and previous["exponent"] is not None
+                and max(result["seconds"] for result in entry["sizes"].values()) >= noise_floor
+                and entry["exponent"] > previous["exponent"] + exponent_tolerance):
+            regressions.append(f"{method}: scaling exponent {entry['exponent']:.2f} vs "
+                               f"{previous['exponent']:.2f} baseline")
+    return regressions
+
+
+def print_table(results):
+    sizes = [str(size) for size in results["meta"]["sizes"]]
+    print(f"{'method':<36}" + "".join(f"{'N=' + size:>12}" for size in sizes) + f"{'exponent':>10}")
+    for method, entry in results["methods"].items():
+        cells = "".join(f"{entry['sizes'][size]['seconds'] * 1e3:>10.3f}ms" if size in entry["sizes"] else f"{'-':>12}"
+                        for size in sizes)
+        slope = f"{entry['exponent']:>10.2f}" if entry["exponent"] is not None else f"{'-':>10}"
+        print(f"{method:<36}{cells}{slope}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--methods", nargs="+", choices=sorted(OPERATIONS), default=list(OPERATIONS))
+    parser.add_argument("--skew", type=float, default=1.0)
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="memory")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds to spend per method and size")
+    parser.add_argument("--max-calls", type=int, default=200)
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc peak-memory measurements")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against a JSON file written by --output")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown, 0.5 = 50%%")
+    parser.add_argument("--exponent-tolerance", type=float, default=0.25)
+    parser.add_argument("--noise-floor", type=float, default=5e-5, help="ignore timings below this many seconds")
+    args = parser.parse_args(argv)
+
+    missing = untimed_methods()
+    if missing:
+        print(f"warning: no benchmark for {', '.join(missing)}", file=sys.stderr)
+    operations = [name for name in OPERATIONS if name in args.methods]
+    results = run(sorted(args.sizes), operations, args.skew, args.seed, args.min_time, args.max_calls,
+                  not args.no_memory, progress=lambda message: print(message, file=sys.stderr), backend=args.backend)
+    print_table(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+    if args.baseline:
+        if not os.path.exists(args.baseline):
+            parser.error(f"baseline {args.baseline} does not exist")
+        with open(args.baseline, encoding="utf-8") as handle:
+            regressions = compare(results, json.load(handle), args.tolerance, args.exponent_tolerance,
+                                  args.noise_floor)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            return 1
+        print("No regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Time type-ahead search over customer names and emails as the index grows.
+
+Builds a SearchIndex over N synthetic customers, times incremental adds and
+email updates, then reports the median and 99th-percentile latency of
+several query shapes.
+
+Usage: python -m benchmarks.bench_search [--entities N] [--limit K] [--queries Q]
+"""
+import argparse
+import random
+import statistics
+import time
+
+from ecommerce.search import SearchIndex
+
+FIRST = ["James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+         "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen",
+         "Chen", "Wei", "Priya", "Arjun", "Sofia", "Mateo", "Aiko", "Hiroshi", "Fatima", "Omar"]
+LAST = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+        "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+        "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson"]
+DOMAINS = ["example.com", "mail.net", "inbox.org", "post.io"]
+
+
+def customer(rng, i):
+    first, last = rng.choice(FIRST), rng.choice(LAST)
+    return f"C{i}", f"{first} {last}", f"{first.lower()}.{last.lower()}{i}@{rng.choice(DOMAINS)}"
+
+
+def queries(rng, rows):
+    """query shape -> function returning a query; emails are drawn from rows so that they match."""
+    return {
+        "short prefix": lambda: rng.choice(LAST)[:2],
+        "word prefix": lambda: rng.choice(LAST)[:5],
+        "full name prefix": lambda: f"{rng.choice(FIRST)} {rng.choice(LAST)[:3]}",
+        "email prefix": lambda: rng.choice(rows)[2][:-8],
+        "substring": lambda: rng.choice(rows)[2].split("@")[0][2:],
+        "miss": lambda: f"zq{rng.randrange(len(rows))}x",
+    }
+
+
+def percentile(samples, fraction):
+    return sorted(samples)[min(int(len(samples) * fraction), len(samples) - 1)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entities", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    rng = random.Random(args.seed)
+
+    rows = [customer(rng, i) for i in range(args.entities)]
+    index = SearchIndex()
+    start = time.perf_counter()
+    index.update((customer_id, customer_id, (name, email)) for customer_id, name, email in rows)
+    print(f"entities: {args.entities}, bulk build: {time.perf_counter() - start:.2f}s")
+
+    extra = [customer(rng, args.entities + i) for i in range(1000)]
+    start = time.perf_counter()
+    for customer_id, name, email in extra:
+        index.add(customer_id, customer_id, name, email)
+    print(f"incremental add:  {(time.perf_counter() - start) * 1e6 / len(extra):8.1f} us")
+    start = time.perf_counter()
+    for customer_id, name, email in extra:
+        index.add(customer_id, customer_id, name, "moved." + email)
+    print(f"email update:     {(time.perf_counter() - start) * 1e6 / len(extra):8.1f} us")
+
+    print(f"{'query shape':<18} {'median':>9} {'p99':>9}  results (limit {args.limit})")
+    for shape, make in queries(rng, rows).items():
+        durations, results = [], []
+        for _ in range(args.queries):
+            query = make()
+            start = time.perf_counter()
+            results.append(len(index.search(query, args.limit)))
+            durations.append(time.perf_counter() - start)
+        print(f"{shape:<18} {statistics.median(durations) * 1e6:7.1f}us {percentile(durations, 0.99) * 1e6:7.1f}us"
+              f"  {statistics.fmean(results):.1f}")
+
+
+if __name__ == "__main__":
+    main()
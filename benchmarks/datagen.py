@@ -0,0 +1,102 @@
+"""Deterministic synthetic catalogs, customers and orders for benchmarks.
+
+Product and customer popularity follow a Zipf-like distribution: with
+skew=s, the i-th entity is picked with weight 1 / (i + 1) ** s. skew=0 is
+uniform. Product stock is set to the units the generated orders need plus a
+random surplus. Some products end with a surplus of zero, so loading every
+order never fails for lack of stock and still leaves some products sold out.
+
+Usage: python -m benchmarks.datagen OUT_DIR [--products N] [--customers N] [--orders N] [--skew S]
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import random
+
+START_DATE = datetime.date(2023, 1, 1)
+
+
+def _zipf_weights(count, skew):
+    return list(itertools.accumulate(1 / (i + 1) ** skew for i in range(count)))
+
+
+class Dataset:
+    """Rows in the shapes produced by ecommerce.importer.
+
+    products:  (product_id, name, price, stock, category)
+    customers: (customer_id, name, email, phone_number)
+    orders:    (order_id, customer_id, {product_id: quantity}, order_date)
+    """
+
+    def __init__(self, products, customers, orders, categories):
+        self.products = products
+        self.customers = customers
+        self.orders = orders
+        self.categories = categories
+
+    def write(self, directory):
+        """Write products/customers/orders .jsonl files; returns their paths by name."""
+        os.makedirs(directory, exist_ok=True)
+        paths = {}
+        for name, fields, rows in (
+                ("products", ("product_id", "name", "price", "stock", "category"), self.products),
+                ("customers", ("customer_id", "name", "email", "phone_number"), self.customers),
+                ("orders", ("order_id", "customer_id", "items", "order_date"), self.orders)):
+            paths[name] = os.path.join(directory, f"{name}.jsonl")
+            with open(paths[name], "w", encoding="utf-8") as handle:
+                for row in rows:
+                    handle.write(json.dumps(dict(zip(fields, row)), separators=(",", ":")) + "\n")
+        return paths
+
+
+def generate(products=1000, customers=1000, orders=10000, skew=1.0, categories=20, max_items=4, days=365,
+             seed=0):
+    """Return a Dataset; the same arguments always produce the same rows."""
+    if min(products, customers) < 1:
+        raise ValueError("At least one product and one customer are required.")
+    rng = random.Random(seed)
+    category_names = [f"Category {i}" for i in range(categories)]
+    product_ids = [f"P{i}" for i in range(products)]
+    customer_ids = [f"C{i}" for i in range(customers)]
+    product_weights = _zipf_weights(products, skew)
+    customer_weights = _zipf_weights(customers, skew)
+
+    demand = dict.fromkeys(product_ids, 0)
+    order_rows = []
+    for n in range(orders):
+        customer_id = rng.choices(customer_ids, cum_weights=customer_weights)[0]
+        items = {}
+        for product_id in rng.choices(product_ids, cum_weights=product_weights, k=rng.randint(1, max_items)):
+            items[product_id] = items.get(product_id, 0) + rng.randint(1, 3)
+        for product_id, quantity in items.items():
+            demand[product_id] += quantity
+        order_date = START_DATE + datetime.timedelta(days=rng.randrange(days))
+        order_rows.append((f"O{n}", customer_id, items, order_date.isoformat()))
+
+    product_rows = [(product_id, f"Product {i}", round(rng.uniform(1, 2000), 2),
+                     demand[product_id] + (0 if rng.random() < 0.05 else rng.randint(1, 500)),
+                     category_names[i % categories])
+                    for i, product_id in enumerate(product_ids)]
+    customer_rows = [(customer_id, f"Customer {i}", f"customer{i}@example.com", f"555{i % 10 ** 7:07d}")
+                     for i, customer_id in enumerate(customer_ids)]
+    return Dataset(product_rows, customer_rows, order_rows, category_names)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out_dir")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--skew", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    dataset = generate(args.products, args.customers, args.orders, args.skew, seed=args.seed)
+    for name, path in dataset.write(args.out_dir).items():
+        print(f"{name}: {path}")
+
+
+if __name__ == "__main__":
+    main()
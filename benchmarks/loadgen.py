@@ -0,0 +1,105 @@
+"""HTTP load generator for the ECommerce service; reports requests/sec and latency percentiles.
+
+Usage:
+    python main.py serve --port 8080 &
+    python -m benchmarks.loadgen --port 8080 --connections 64 --requests 20000
+
+Without --port an in-process server is started on a free port and seeded with
+a synthetic catalog, which is handy for quick local comparisons.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+
+from ecommerce.ecommerce import ECommerce
+from ecommerce.service import ECommerceService
+
+
+def seed(ecommerce, products, customers):
+    for i in range(products):
+        ecommerce.add_product(f"P{i}", f"Product {i}", 10 + i % 90, 10 ** 9, f"Category {i % 20}")
+    for i in range(customers):
+        ecommerce.add_customer(f"C{i}", f"Customer {i}", f"c{i}@example.com", "5555555555")
+
+
+async def worker(host, port, requests, write_ratio, products, customers, order_ids, rng, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(requests):
+            if rng.random() < write_ratio:
+                payload = {"order_id": f"L{next(order_ids)}", "customer_id": f"C{rng.randrange(customers)}",
+                           "items": {f"P{rng.randrange(products)}": rng.randint(1, 3)}}
+                body = json.dumps(payload).encode()
+                request = (f"POST /orders HTTP/1.1\r\nHost: load\r\nContent-Length: {len(body)}\r\n\r\n"
+                           .encode() + body)
+            else:
+                path = rng.choice([f"/products/P{rng.randrange(products)}", f"/customers/C{rng.randrange(customers)}",
+                                   "/reports/top-products?k=10", f"/products?category=Category%20{rng.randrange(20)}"])
+                request = f"GET {path} HTTP/1.1\r\nHost: load\r\n\r\n".encode()
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while (line := await reader.readline()) != b"\r\n":
+                name, _, value = line.decode().partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def run(args):
+    service = None
+    port = args.port
+    if port is None:
+        ecommerce = ECommerce()
+        seed(ecommerce, args.products, args.customers)
+        service = await ECommerceService(ecommerce, port=0, max_pending_orders=max(1024, args.connections)).start()
+        port = service.port
+    latencies = []
+    statuses = {}
+    order_ids = itertools.count()
+    per_connection = args.requests // args.connections
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(
+            worker(args.host, port, per_connection, args.write_ratio, args.products, args.customers, order_ids,
+                   random.Random(i), latencies, statuses)
+            for i in range(args.connections)))
+    finally:
+        elapsed = time.perf_counter() - start
+        if service is not None:
+            await service.close()
+    latencies.sort()
+    print(f"requests: {len(latencies)} over {args.connections} connections in {elapsed:.2f}s")
+    print(f"throughput: {len(latencies) / elapsed:.0f} req/s")
+    print(f"latency p50: {percentile(latencies, 0.50) * 1000:.2f} ms, "
+          f"p99: {percentile(latencies, 0.99) * 1000:.2f} ms, max: {latencies[-1] * 1000:.2f} ms")
+    print(f"status codes: {dict(sorted(statuses.items()))}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load generator for the ECommerce HTTP service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="target an already running server")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="fraction of requests that place orders")
+    parser.add_argument("--products", type=int, default=1_000)
+    parser.add_argument("--customers", type=int, default=1_000)
+    asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
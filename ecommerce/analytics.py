@@ -0,0 +1,295 @@
+"""Parallel map-reduce analytics over sharded order data.
+
+Orders are flattened into shards of typed arrays: day ordinals, totals in
+cents, customer and product indexes, and line-item quantities. Integer
+totals make the partial sums exact, whichever worker adds them up. Workers receive the
+raw array bytes rather than pickled Order object graphs. Each worker computes
+partial aggregates for its shard, and the parent process merges them.
+
+The arrays for in-memory orders are kept current as orders are placed,
+changed and cancelled, so a run only slices them into shards. Archived
+orders are encoded once per archive segment, straight from its columns.
+"""
+import datetime
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from ecommerce.ecommerce import _to_date
+from ecommerce.money import format_cents, to_dollars
+
+# Typecodes of the arrays making up an encoded shard, in order.
+SHARD_LAYOUT = ("i", "q", "i", "q", "i", "q")
+
+
+def encode_shard(orders, customer_index, product_index):
+    """Flatten orders into (dates, totals, customers, offsets, products, quantities) array bytes."""
+    dates, totals, customers, offsets, products, quantities = (array(code) for code in SHARD_LAYOUT)
+    offsets.append(0)
+    for order in orders:
+        dates.append(order.order_date.toordinal())
+        totals.append(order.total_cents)
+        customers.append(customer_index[order.customer.customer_id])
+        for item in order.items:
+            products.append(product_index[item.product.product_id])
+            quantities.append(item.quantity)
+        offsets.append(len(products))
+    return tuple(column.tobytes() for column in (dates, totals, customers, offsets, products, quantities))
+
+
+def aggregate_shard(shard, start=None, end=None):
+    """Map step: partial aggregates, in cents, for one encoded shard, limited to [start, end] day ordinals.
+
+    Offsets may start above zero when the shard is a slice of longer arrays.
+    Rows with day ordinal 0 are removed orders and are skipped.
+    """
+    dates, totals, customers, offsets, products, quantities = (
+        array(code, data) for code, data in zip(SHARD_LAYOUT, shard))
+    base = offsets[0]
+    total = 0
+    count = 0
+    spend = {}
+    units = {}
+    daily = {}
+    for i, day in enumerate(dates):
+        if not day or (start is not None and day < start) or (end is not None and day > end):
+            continue
+        amount = totals[i]
+        total += amount
+        count += 1
+        customer = customers[i]
+        spend[customer] = spend.get(customer, 0) + amount
+        daily[day] = daily.get(day, 0) + amount
+        for j in range(offsets[i] - base, offsets[i + 1] - base):
+            product = products[j]
+            units[product] = units.get(product, 0) + quantities[j]
+    return total, count, spend, units, daily
+
+
+def _interned(key, index, keys):
+    position = index.get(key)
+    if position is None:
+        position = index[key] = len(keys)
+        keys.append(key)
+    return position
+
+
+class OrderColumns:
+    """A store's in-memory orders as encode_shard arrays, kept current through its order hooks.
+
+    Rows are appended in placement order. A cancelled or archived order keeps
+    its row with day ordinal 0 until removed rows outnumber live ones and the
+    arrays are compacted. Customer and product indexes are assigned on first
+    sight and never change, so shards encoded earlier stay valid.
+    """
+
+    def __init__(self):
+        self.customer_ids = []
+        self.product_ids = []
+        self._customer_index = {}
+        self._product_index = {}
+        self.reset(())
+
+    def reset(self, orders):
+        self._dates, self._totals, self._customers, self._offsets, self._products, self._quantities = (
+            array(code) for code in SHARD_LAYOUT)
+        self._offsets.append(0)
+        self._rows = {}
+        self._removed = 0
+        for order in orders:
+            self.order_added(order)
+
+    def order_added(self, order):
+        self._rows[order.order_id] = len(self._dates)
+        self._dates.append(order.order_date.toordinal())
+        self._totals.append(order.total_cents)
+        self._customers.append(_interned(order.customer.customer_id, self._customer_index, self.customer_ids))
+        for item in order.items:
+            self._products.append(_interned(item.product.product_id, self._product_index, self.product_ids))
+            self._quantities.append(item.quantity)
+        self._offsets.append(len(self._products))
+
+    def order_removed(self, order):
+        row = self._rows.pop(order.order_id, None)
+        if row is None:
+            return
+        self._dates[row] = 0
+        self._removed += 1
+        if self._removed > 1024 and 2 * self._removed > len(self._dates):
+            self._compact()
+
+    def order_changed(self, order):
+        row = self._rows.get(order.order_id)
+        if row is not None:
+            self._dates[row] = order.order_date.toordinal()
+            self._totals[row] = order.total_cents
+
+    def _compact(self):
+        old = (self._dates, self._totals, self._customers, self._offsets, self._products, self._quantities)
+        dates, totals, customers, offsets, products, quantities = old
+        rows = self._rows
+        self.reset(())
+        for order_id, row in sorted(rows.items(), key=lambda entry: entry[1]):
+            self._rows[order_id] = len(self._dates)
+            self._dates.append(dates[row])
+            self._totals.append(totals[row])
+            self._customers.append(customers[row])
+            self._products.extend(products[offsets[row]:offsets[row + 1]])
+            self._quantities.extend(quantities[offsets[row]:offsets[row + 1]])
+            self._offsets.append(len(self._products))
+
+    def shards(self, size):
+        """Encoded shards of up to size rows each; copying the slices is the only per-row work."""
+        shards = []
+        for start in range(0, len(self._dates), size):
+            stop = min(start + size, len(self._dates))
+            first, last = self._offsets[start], self._offsets[stop]
+            shards.append((self._dates[start:stop].tobytes(), self._totals[start:stop].tobytes(),
+                           self._customers[start:stop].tobytes(), self._offsets[start:stop + 1].tobytes(),
+                           self._products[first:last].tobytes(), self._quantities[first:last].tobytes()))
+        return shards
+
+    def encode_segment(self, columns):
+        """Encode an archive segment's columns (see OrderArchive.columns) as one shard."""
+        return (array("i", columns["order_date"]).tobytes(),
+                array("q", columns["total_cents"]).tobytes(),
+                array("i", [_interned(customer_id, self._customer_index, self.customer_ids)
+                            for customer_id in columns["customer_id"]]).tobytes(),
+                array("q", columns["offsets"]).tobytes(),
+                array("i", [_interned(product_id, self._product_index, self.product_ids)
+                            for product_id in columns["product_id"]]).tobytes(),
+                array("q", columns["quantity"]).tobytes())
+
+
+def _merge_into(target, partial):
+    for key, value in partial.items():
+        target[key] = target.get(key, 0) + value
+
+
+class SalesAggregates:
+    """Merged result of an AnalyticsEngine run."""
+
+    def __init__(self, total_sales, order_count, customer_spend, product_units, daily_revenue):
+        self.total_sales = total_sales
+        self.order_count = order_count
+        self.customer_spend = customer_spend
+        self.product_units = product_units
+        self.daily_revenue = daily_revenue
+
+    def top_products(self, k=10):
+        return sorted(self.product_units.items(), key=lambda entry: entry[1], reverse=True)[:k]
+
+
+class AnalyticsEngine:
+    """Computes sales, spend, units and daily revenue aggregates across worker processes.
+
+    Small inputs (a single shard, or workers=1) are aggregated in-process, so
+    the pool is only started when there is enough data to split. It is then
+    reused by later runs until close(). The engine keeps an OrderColumns
+    registered with the store from construction until close(). Encoded
+    archive segments are cached, at about 40 bytes per archived order.
+    """
+
+    def __init__(self, ecommerce, workers=None, shard_size=50000):
+        self.ecommerce = ecommerce
+        self.workers = workers or os.cpu_count() or 1
+        self.shard_size = shard_size
+        self.columns = OrderColumns()
+        self._segment_shards = {}
+        self._pool = None
+        with ecommerce._lock:
+            self.columns.reset(ecommerce.orders)
+            ecommerce._order_listeners.append(self.columns)
+
+    def close(self):
+        """Stop tracking the store's orders and shut the worker pool down."""
+        with self.ecommerce._lock:
+            if self.columns in self.ecommerce._order_listeners:
+                self.ecommerce._order_listeners.remove(self.columns)
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _shards(self, start=None, end=None):
+        ecommerce = self.ecommerce
+        archived = []
+        if ecommerce.archive is not None:
+            # One shard per archive segment; segments outside the date range are not opened.
+            for segment in ecommerce.archive.segments_between(start, end):
+                shard = self._segment_shards.get(segment.file)
+                if shard is None:
+                    columns = ecommerce.archive.columns(segment)
+                    with ecommerce._lock:
+                        shard = self._segment_shards[segment.file] = self.columns.encode_segment(columns)
+                archived.append(shard)
+        with ecommerce._lock:
+            shards = self.columns.shards(self.shard_size)
+            customer_ids = list(self.columns.customer_ids)
+            product_ids = list(self.columns.product_ids)
+        return shards + archived, customer_ids, product_ids
+
+    def aggregate(self, start_date=None, end_date=None):
+        """Run map-reduce over all orders dated within [start_date, end_date] (both optional), archived ones too."""
+        total_sales, order_count, spend, units, daily = self._reduce(start_date, end_date)
+        return SalesAggregates(
+            to_dollars(total_sales),
+            order_count,
+            {customer_id: to_dollars(amount) for customer_id, amount in spend.items()},
+            units,
+            {day: to_dollars(amount) for day, amount in daily.items()},
+        )
+
+    def _reduce(self, start_date, end_date):
+        """aggregate() as (total, order count, spend, units, daily revenue) with money in cents."""
+        start_day = None if start_date is None else _to_date(start_date)
+        end_day = None if end_date is None else _to_date(end_date)
+        start = None if start_day is None else start_day.toordinal()
+        end = None if end_day is None else end_day.toordinal()
+        shards, customer_ids, product_ids = self._shards(start_day, end_day)
+        if self.workers == 1 or len(shards) <= 1:
+            partials = [aggregate_shard(shard, start, end) for shard in shards]
+        else:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            partials = list(self._pool.map(aggregate_shard, shards, [start] * len(shards), [end] * len(shards)))
+
+        total_sales = 0
+        order_count = 0
+        spend, units, daily = {}, {}, {}
+        for total, count, partial_spend, partial_units, partial_daily in partials:
+            total_sales += total
+            order_count += count
+            _merge_into(spend, partial_spend)
+            _merge_into(units, partial_units)
+            _merge_into(daily, partial_daily)
+        return (total_sales, order_count, {customer_ids[i]: amount for i, amount in spend.items()},
+                {product_ids[i]: quantity for i, quantity in units.items()},
+                {datetime.date.fromordinal(day): amount for day, amount in sorted(daily.items())})
+
+    def generate_sales_report(self, start_date=None, end_date=None):
+        return f"Total Sales: ${self.aggregate(start_date, end_date).total_sales}"
+
+    def generate_customer_spending_report(self, start_date=None, end_date=None):
+        """ECommerce.generate_customer_spending_report over the date range: every customer, biggest spender first."""
+        spend = self._reduce(start_date, end_date)[2]
+        # A stable sort keeps tied customers in registration order, as the store's spend ranking does.
+        customers = sorted(self.ecommerce.customers, key=lambda customer: spend.get(customer.customer_id, 0),
+                           reverse=True)
+        return "Customer Spending Report:\n" + "\n".join(
+            f"{customer.name}: ${format_cents(spend.get(customer.customer_id, 0))}" for customer in customers)
+
+    def find_top_selling_product(self, start_date=None, end_date=None):
+        top = self.aggregate(start_date, end_date).top_products(1)
+        if not top:
+            return "No sales data available."
+        product_id, units = top[0]
+        return f"Top Selling Product: {self.ecommerce.products.get(product_id).name} (Sold: {units} units)"
+
+    def daily_revenue(self, start_date=None, end_date=None):
+        return self.aggregate(start_date, end_date).daily_revenue
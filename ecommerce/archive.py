@@ -0,0 +1,230 @@
+"""Cold tier for old orders: compressed, date-partitioned columnar segments.
+
+ECommerce.archive_orders() moves orders dated before a cutoff out of memory
+and into an OrderArchive directory. Orders are grouped by day, week or month
+of their date. Each group becomes an immutable segment file
+``orders-<period>-<seq>.json.gz``, a gzip-compressed JSON object holding one
+list per column. ``manifest.json`` lists every segment with its first and last
+day and the customers it contains, so a query only opens segments that can
+hold matching orders. The manifest also holds the archived orders'
+per-day sales and units per product. The store uses these to keep reports
+whole whenever it rebuilds its indexes. Money is stored in integer cents.
+
+Archived orders come back as detached Order objects that share the store's
+products and customers. Changing them does not change the archive.
+"""
+import bisect
+import collections
+import datetime
+import gzip
+import itertools
+import json
+import os
+import threading
+
+from ecommerce.ecommerce import SALES_GRANULARITIES, LineItem, Order, _order_sales, _period_start
+from ecommerce.indexes import DayTotals, SalesRollup
+
+MANIFEST = "manifest.json"
+COLUMNS = ("order_id", "customer_id", "order_date", "total_cents", "gift_message", "lines", "product_id",
+           "quantity", "price_cents")
+
+
+def _write_atomically(path, data, compress=False):
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as raw:
+        if compress:
+            with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as handle:
+                handle.write(data)
+        else:
+            raw.write(data)
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(temporary, path)
+
+
+class Segment:
+    __slots__ = ("file", "first_day", "last_day", "orders", "customers")
+
+    def __init__(self, file, first_day, last_day, orders, customers):
+        self.file = file
+        self.first_day = first_day
+        self.last_day = last_day
+        self.orders = orders
+        self.customers = customers
+
+
+class OrderArchive:
+    """Date-partitioned segment files holding orders older than max_age_days."""
+
+    def __init__(self, directory, max_age_days=365, partition="month", cached_segments=8):
+        if partition not in SALES_GRANULARITIES:
+            raise ValueError(f"Unsupported partition '{partition}'.")
+        self.directory = directory
+        self.max_age_days = max_age_days
+        self.partition = partition
+        self.cached_segments = cached_segments
+        # Totals of the archived orders, kept so the store's reports still count them.
+        self.sales = SalesRollup()
+        self.units = {}
+        self.segments_read = 0
+        self._segments = []
+        self._segments_by_customer = {}
+        self._next = 0
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load_manifest()
+
+    def __len__(self):
+        return sum(segment.orders for segment in self._segments)
+
+    def cutoff(self, today=None):
+        """The date before which orders are old enough to archive."""
+        return (today or datetime.date.today()) - datetime.timedelta(days=self.max_age_days)
+
+    def _load_manifest(self):
+        path = os.path.join(self.directory, MANIFEST)
+        if not os.path.exists(path):
+            return
+        with open(path, encoding="utf-8") as handle:
+            manifest = json.load(handle)
+        self._next = manifest["next"]
+        for file, first_day, last_day, orders, customers in manifest["segments"]:
+            self._add_segment(Segment(file, datetime.date.fromisoformat(first_day),
+                                      datetime.date.fromisoformat(last_day), orders, customers))
+        self.units = manifest["units"]
+        days = []
+        for day, revenue, orders, units, categories in manifest["sales"]:
+            totals = DayTotals()
+            totals.revenue, totals.orders, totals.units, totals.categories = revenue, orders, units, categories
+            days.append((datetime.date.fromisoformat(day), totals))
+        self.sales.merge(days)
+
+    def _save_manifest(self):
+        manifest = {
+            "next": self._next,
+            "segments": [[s.file, s.first_day.isoformat(), s.last_day.isoformat(), s.orders, s.customers]
+                         for s in self._segments],
+            "units": self.units,
+            "sales": [[day.isoformat(), totals.revenue, totals.orders, totals.units, totals.categories]
+                      for day, totals in self.sales.between()],
+        }
+        _write_atomically(os.path.join(self.directory, MANIFEST),
+                          json.dumps(manifest, separators=(",", ":")).encode("utf-8"))
+
+    def _add_segment(self, segment):
+        index = len(self._segments)
+        self._segments.append(segment)
+        for customer_id in segment.customers:
+            self._segments_by_customer.setdefault(customer_id, []).append(index)
+
+    def write(self, orders):
+        """Write orders as new segments, one per partition period, then record them in the manifest.
+
+        Nothing is recorded unless every segment is written; segment files
+        left by a failed call are simply not listed.
+        """
+        groups = {}
+        for order in orders:
+            groups.setdefault(_period_start(order.order_date, self.partition), []).append(order)
+        with self._lock:
+            segments = []
+            sales = SalesRollup()
+            units = {}
+            for period, group in sorted(groups.items()):
+                group.sort(key=lambda order: order.order_date)
+                columns = {name: [] for name in COLUMNS}
+                for order in group:
+                    columns["order_id"].append(order.order_id)
+                    columns["customer_id"].append(order.customer.customer_id)
+                    columns["order_date"].append(order.order_date.toordinal())
+                    columns["total_cents"].append(order.total_cents)
+                    columns["gift_message"].append(order.gift_message)
+                    columns["lines"].append(len(order.items))
+                    for item in order.items:
+                        columns["product_id"].append(item.product.product_id)
+                        columns["quantity"].append(item.quantity)
+                        columns["price_cents"].append(item.product.price_cents if item.price_cents is None
+                                                      else item.price_cents)
+                        units[item.product.product_id] = units.get(item.product.product_id, 0) + item.quantity
+                    order_units, categories = _order_sales(order, order.total_cents)
+                    sales.add(order.order_date, order.total_cents, order_units, categories)
+                self._next += 1
+                file = f"orders-{period.isoformat()}-{self._next:06d}.json.gz"
+                _write_atomically(os.path.join(self.directory, file),
+                                  json.dumps(columns, separators=(",", ":")).encode("utf-8"), compress=True)
+                segments.append(Segment(file, group[0].order_date, group[-1].order_date, len(group),
+                                        sorted(set(columns["customer_id"]))))
+            for segment in segments:
+                self._add_segment(segment)
+            self.sales.merge(sales.between())
+            for product_id, quantity in units.items():
+                self.units[product_id] = self.units.get(product_id, 0) + quantity
+            try:
+                self._save_manifest()
+            except BaseException:
+                # Fall back to what the manifest on disk says.
+                self.sales, self.units, self._segments, self._segments_by_customer = SalesRollup(), {}, [], {}
+                self._load_manifest()
+                raise
+
+    def columns(self, segment):
+        """A segment's COLUMNS lists plus "offsets": order row i owns line items offsets[i] to offsets[i + 1]."""
+        with self._lock:
+            columns = self._cache.get(segment.file)
+            if columns is not None:
+                self._cache.move_to_end(segment.file)
+                return columns
+        with gzip.open(os.path.join(self.directory, segment.file), "rb") as handle:
+            columns = json.loads(handle.read())
+        columns["offsets"] = list(itertools.accumulate(columns["lines"], initial=0))
+        rows_by_customer = columns["rows_by_customer"] = {}
+        for row, customer_id in enumerate(columns["customer_id"]):
+            rows_by_customer.setdefault(customer_id, []).append(row)
+        with self._lock:
+            self.segments_read += 1
+            if self.cached_segments:
+                self._cache[segment.file] = columns
+                if len(self._cache) > self.cached_segments:
+                    self._cache.popitem(last=False)
+        return columns
+
+    def _orders(self, store, columns, rows):
+        orders = []
+        for row in rows:
+            order = Order(columns["order_id"][row], store.customers.get(columns["customer_id"][row]),
+                          datetime.date.fromordinal(columns["order_date"][row]))
+            for line in range(columns["offsets"][row], columns["offsets"][row + 1]):
+                order.items.append(LineItem(store.products.get(columns["product_id"][line]),
+                                            columns["quantity"][line], columns["price_cents"][line]))
+            order.total_cents = columns["total_cents"][row]
+            order.gift_message = columns["gift_message"][row]
+            orders.append(order)
+        return orders
+
+    def segments_between(self, start=None, end=None):
+        """Segments that may hold orders dated within [start, end]; None leaves a side open."""
+        return [segment for segment in list(self._segments)
+                if (start is None or segment.last_day >= start) and (end is None or segment.first_day <= end)]
+
+    def orders_between(self, store, start, end):
+        """Archived orders dated within [start, end], oldest first; other segments are not opened."""
+        low, high = start.toordinal(), end.toordinal()
+        orders = []
+        for segment in self.segments_between(start, end):
+            columns = self.columns(segment)
+            # Rows are sorted by date within a segment.
+            dates = columns["order_date"]
+            rows = range(bisect.bisect_left(dates, low), bisect.bisect_right(dates, high))
+            orders.extend(self._orders(store, columns, rows))
+        orders.sort(key=lambda order: order.order_date)
+        return orders
+
+    def orders_for_customer(self, store, customer_id):
+        """Archived orders placed by customer_id, in the order they were archived."""
+        orders = []
+        for index in list(self._segments_by_customer.get(customer_id, ())):
+            columns = self.columns(self._segments[index])
+            orders.extend(self._orders(store, columns, columns["rows_by_customer"].get(customer_id, ())))
+        return orders
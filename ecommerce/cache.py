@@ -0,0 +1,93 @@
+import collections
+import threading
+
+COUNTS = ("entries", "maxsize", "hits", "misses", "evictions", "listing_hits", "listing_misses")
+
+
+def _with_rates(counts):
+    lookups = counts["hits"] + counts["misses"]
+    listings = counts["listing_hits"] + counts["listing_misses"]
+    return dict(counts, hit_rate=counts["hits"] / lookups if lookups else 0.0,
+                listing_hit_rate=counts["listing_hits"] / listings if listings else 0.0)
+
+
+def combine_stats(stats):
+    """Sum several RenderCache.stats() results; empty ones, from disabled caches, are skipped."""
+    stats = [entry for entry in stats if entry]
+    if not stats:
+        return {}
+    return _with_rates({key: sum(entry[key] for entry in stats) for key in COUNTS})
+
+
+class RenderCache:
+    """Bounded LRU cache of rendered entity strings and of whole listings.
+
+    An entity's string is reused while its _version is unchanged, and a
+    listing while its collection's version is unchanged. Mutators bump those
+    versions, so stale entries are never served and need no explicit purge.
+    Listings longer than maxsize are rendered but not kept.
+    """
+
+    def __init__(self, maxsize=100000):
+        if maxsize < 1:
+            raise ValueError("Cache size must be at least 1.")
+        self.maxsize = maxsize
+        self._entries = collections.OrderedDict()
+        self._listings = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.listing_hits = 0
+        self.listing_misses = 0
+
+    def render(self, entity):
+        entries = self._entries
+        with self._lock:
+            version = entity._version
+            entry = entries.get(entity)
+            if entry is not None and entry[0] == version:
+                entries.move_to_end(entity)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            text = str(entity)
+            entries[entity] = (version, text)
+            entries.move_to_end(entity)
+            if len(entries) > self.maxsize:
+                entries.popitem(last=False)
+                self.evictions += 1
+            return text
+
+    def listing(self, collection, render):
+        """Return a fresh list of render() results, reusing the last one if collection is unchanged."""
+        version = collection.version
+        with self._lock:
+            entry = self._listings.get(collection)
+            if entry is not None and entry[0] == version:
+                self.listing_hits += 1
+                return list(entry[1])
+            self.listing_misses += 1
+        rendered = list(render())
+        with self._lock:
+            if len(rendered) <= self.maxsize:
+                self._listings[collection] = (version, rendered)
+            else:
+                self._listings.pop(collection, None)
+        return list(rendered)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._listings.clear()
+
+    def stats(self):
+        return _with_rates({
+            "entries": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "listing_hits": self.listing_hits,
+            "listing_misses": self.listing_misses,
+        })
@@ -0,0 +1,102 @@
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+from ecommerce.ecommerce import Product
+from ecommerce.money import to_cents, to_dollars
+
+
+def percent_off(cents, percentage):
+    """Vectorized money.percent_off over an integer cents array.
+
+    The same float operations in the same order, then np.rint (half to even)
+    like the builtin round, so results never differ from Product.apply_discount.
+    """
+    return np.rint(cents * (100 - percentage) / 100).astype(np.int64)
+
+
+class ProductTable:
+    """Column store holding product prices (in cents), stock and category codes in NumPy arrays."""
+
+    def __init__(self, capacity=1024):
+        if np is None:
+            raise ImportError("ProductTable requires numpy.")
+        self.price_cents = np.zeros(capacity, dtype=np.int64)
+        self.stock = np.zeros(capacity, dtype=np.int64)
+        self.categories = np.zeros(capacity, dtype=np.int32)
+        self.products = []
+        self._category_codes = {}
+
+    def __len__(self):
+        return len(self.products)
+
+    def append(self, product, category):
+        row = len(self.products)
+        if row == len(self.price_cents):
+            capacity = 2 * row
+            self.price_cents = np.resize(self.price_cents, capacity)
+            self.stock = np.resize(self.stock, capacity)
+            self.categories = np.resize(self.categories, capacity)
+        key = category.casefold()
+        code = self._category_codes.setdefault(key, len(self._category_codes))
+        self.categories[row] = code
+        self.products.append(product)
+        return row
+
+    def _rows_in_category(self, category):
+        code = self._category_codes.get(category.casefold())
+        if code is None:
+            return np.empty(0, dtype=np.intp)
+        return np.flatnonzero(self.categories[:len(self)] == code)
+
+    def total_value(self):
+        size = len(self)
+        return to_dollars(int(np.dot(self.stock[:size], self.price_cents[:size])))
+
+    def discount_category(self, category, percentage):
+        """Discount every product in category; returns the number of rows changed."""
+        rows = self._rows_in_category(category)
+        if len(rows):
+            self.price_cents[rows] = percent_off(self.price_cents[rows], percentage)
+            for row in rows:
+                self.products[row]._version += 1
+        return len(rows)
+
+    def out_of_stock(self):
+        return [self.products[row] for row in np.flatnonzero(self.stock[:len(self)] == 0)]
+
+    def in_price_range(self, min_price, max_price):
+        prices = self.price_cents[:len(self)]
+        rows = np.flatnonzero((prices >= to_cents(min_price)) & (prices <= to_cents(max_price)))
+        return [self.products[row] for row in rows]
+
+
+class ProductRow(Product):
+    """Product whose price and stock are a view onto a ProductTable row."""
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table, product_id, name, price, stock, category):
+        self._table = table
+        self._row = table.append(self, category)
+        super().__init__(product_id, name, price, stock, category)
+
+    @property
+    def price_cents(self):
+        return int(self._table.price_cents[self._row])
+
+    @price_cents.setter
+    def price_cents(self, value):
+        self._table.price_cents[self._row] = value
+        self._version += 1
+
+    @property
+    def stock(self):
+        return int(self._table.stock[self._row])
+
+    @stock.setter
+    def stock(self, value):
+        self._table.stock[self._row] = value
+        self._version += 1
+        if self._owner is not None:
+            self._owner._product_stock_changed(self)
@@ -1,13 +1,181 @@
+import collections
 import datetime
+import heapq
+import threading
+
+from ecommerce import importer
+from ecommerce.cache import RenderCache
+from ecommerce.indexes import DateIndex, IndexedCollection, RankedIndex, SalesRollup
+from ecommerce.money import format_cents, percent_off, split_cents, to_cents, to_dollars
+from ecommerce.search import SearchIndex
+
+SALES_GRANULARITIES = ("day", "week", "month")
+
+
+def _to_date(value):
+    """Accept a date, a datetime or a YYYY-MM-DD string and return a date."""
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def _loyalty_status(spent_cents):
+    if spent_cents > 500000:
+        return "Platinum"
+    elif spent_cents > 200000:
+        return "Gold"
+    elif spent_cents > 100000:
+        return "Silver"
+    return "Bronze"
+
+
+def _period_start(day, granularity):
+    if granularity == "week":
+        return day - datetime.timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _sales_periods(days, granularity):
+    """Fold (day, DayTotals) pairs, oldest first, into sales_by_period() tuples with amounts in cents."""
+    if granularity not in SALES_GRANULARITIES:
+        raise ValueError(f"Unsupported granularity '{granularity}'.")
+    periods = []
+    for day, totals in days:
+        period = _period_start(day, granularity)
+        if not periods or periods[-1][0] != period:
+            periods.append([period, 0, 0, 0, {}])
+        entry = periods[-1]
+        entry[1] += totals.revenue
+        entry[2] += totals.orders
+        entry[3] += totals.units
+        for category, amount in totals.categories.items():
+            entry[4][category] = entry[4].get(category, 0) + amount
+    return [tuple(entry) for entry in periods]
+
+
+def _periods_in_dollars(periods):
+    return [(period, to_dollars(revenue), orders, units,
+             {category: to_dollars(amount) for category, amount in categories.items()})
+            for period, revenue, orders, units, categories in periods]
+
+
+def _format_sales_report(periods, granularity):
+    """Render _sales_periods() rows, with each period's categories by revenue."""
+    lines = [f"Sales Report by {granularity}:"]
+    for period, revenue, orders, units, categories in periods:
+        lines.append(f"{period}: ${format_cents(revenue)} ({orders} orders, {units} units)")
+        lines.extend(f"  {category}: ${format_cents(amount)}"
+                     for category, amount in sorted(categories.items(), key=lambda entry: entry[1], reverse=True))
+    if not periods:
+        lines.append("No sales found in the given date range.")
+    lines.append(f"Total Sales: ${to_dollars(sum(period[1] for period in periods))}")
+    return "\n".join(lines)
+
+
+def _order_sales(order, total):
+    """Return (units, {category: revenue}) for an order whose total is `total` cents.
+
+    Category revenue is the total split across categories in proportion to
+    line value, so order discounts carry through; the parts always sum to the total.
+    """
+    units = 0
+    categories = {}
+    for item in order.items:
+        value = (item.product.price_cents if item.price_cents is None else item.price_cents) * item.quantity
+        units += item.quantity
+        category = item.product.category
+        categories[category] = categories.get(category, 0) + value
+    return units, split_cents(total, categories)
+
+
+def _detached_state(entity):
+    """Pickle state for an entity minus its owning store, so copies can cross processes."""
+    return None, {name: getattr(entity, name) for cls in type(entity).__mro__
+                  for name in getattr(cls, "__slots__", ()) if name != "_owner" and hasattr(entity, name)}
+
+
+def _restore_state(entity, state):
+    entity._owner = None
+    for name, value in state[1].items():
+        setattr(entity, name, value)
+
+
+class LineItem(collections.namedtuple("LineItem", "product quantity price_cents", defaults=(None,))):
+    """Compact order line; item['product'] style access is kept for older callers.
+
+    price_cents is the unit price when the line was added; None for lines
+    built without one, which fall back to the product's current price.
+    """
+    __slots__ = ()
+
+    @property
+    def price(self):
+        return None if self.price_cents is None else to_dollars(self.price_cents)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
 
 
 class Product:
+    __slots__ = ("_owner", "_version", "product_id", "name", "price_cents", "_stock", "category",
+                 "is_featured", "original_price_cents")
+
     def __init__(self, product_id, name, price, stock, category):
+        self._owner = None
+        # Bumped by every mutator; cached renderings are keyed by it.
+        self._version = 0
         self.product_id = product_id
         self.name = name
         self.price = price
         self.stock = stock
         self.category = category
+        self.is_featured = False
+        self.original_price_cents = None
+
+    __getstate__ = _detached_state
+    __setstate__ = _restore_state
+
+    @property
+    def price(self):
+        return to_dollars(self.price_cents)
+
+    @price.setter
+    def price(self, value):
+        self.price_cents = to_cents(value)
+        self._changed()
+
+    @property
+    def original_price(self):
+        return None if self.original_price_cents is None else to_dollars(self.original_price_cents)
+
+    @original_price.setter
+    def original_price(self, value):
+        self.original_price_cents = None if value is None else to_cents(value)
+
+    @property
+    def stock(self):
+        return self._stock
+
+    @stock.setter
+    def stock(self, value):
+        self._stock = value
+        self._version += 1
+        if self._owner is not None:
+            self._owner._product_stock_changed(self)
+
+    def _changed(self):
+        self._version += 1
+        if self._owner is not None:
+            self._owner._entity_changed(self)
 
     def update_stock(self, quantity):
         if self.stock - quantity < 0:
@@ -22,21 +190,23 @@ class Product:
     def apply_discount(self, percentage):
         if percentage < 0 or percentage > 100:
             raise ValueError("Invalid discount percentage.")
-        self.price = round(self.price * (1 - percentage / 100), 2)
+        self.price_cents = percent_off(self.price_cents, percentage)
+        self._changed()
 
     def is_out_of_stock(self):
         return self.stock == 0
 
     def calculate_stock_value(self):
-        return self.stock * self.price
+        return to_dollars(self.stock * self.price_cents)
 
     def is_on_sale(self):
         """Check if the product is on sale (price is discounted)."""
-        return self.price < self.original_price if hasattr(self, 'original_price') else False
+        return self.original_price_cents is not None and self.price_cents < self.original_price_cents
 
     def mark_as_featured(self):
         """Mark the product as featured."""
         self.is_featured = True
+        self._changed()
         return f"Product {self.name} is now marked as featured."
 
 
@@ -46,21 +216,66 @@ class Product:
 
 
 class Customer:
+    __slots__ = ("_owner", "_version", "customer_id", "name", "email", "phone_number", "purchase_history",
+                 "_spent_cents", "_purchased_products", "is_active")
+
     def __init__(self, customer_id, name, email, phone_number):
+        self._owner = None
+        self._version = 0
         self.customer_id = customer_id
         self.name = name
         self.email = email
         self.phone_number = phone_number
         self.purchase_history = []
+        self._spent_cents = 0
+        # product_id -> number of orders in purchase_history containing it
+        self._purchased_products = {}
+        self.is_active = True
+
+    __getstate__ = _detached_state
+    __setstate__ = _restore_state
 
     def add_purchase(self, order):
         self.purchase_history.append(order)
+        order._booked = True
+        self._adjust_spent(order.total_cents)
+        for product_id in {item.product.product_id for item in order.items}:
+            count = self._purchased_products.get(product_id, 0)
+            self._purchased_products[product_id] = count + 1
+            if count == 0 and self._owner is not None:
+                self._owner._buyer_added(self, product_id)
+
+    def remove_purchase(self, order):
+        self.purchase_history.remove(order)
+        order._booked = False
+        self._adjust_spent(-order.total_cents)
+        for product_id in {item.product.product_id for item in order.items}:
+            count = self._purchased_products[product_id] - 1
+            if count:
+                self._purchased_products[product_id] = count
+            else:
+                del self._purchased_products[product_id]
+                if self._owner is not None:
+                    self._owner._buyer_removed(self, product_id)
+
+    def _adjust_spent(self, cents):
+        self._spent_cents += cents
+        self._version += 1
+        if self._owner is not None:
+            self._owner._customer_spend_changed(self)
 
     def update_phone_number(self, new_phone):
         if not new_phone.isdigit() or len(new_phone) != 10:
             raise ValueError("Invalid phone number format.")
         self.phone_number = new_phone
+        self._changed()
         return f"Phone number for {self.name} updated to {new_phone}."
+
+    def _changed(self):
+        self._version += 1
+        if self._owner is not None:
+            self._owner._entity_changed(self)
+
     def get_recent_purchases(self, limit=5):
         sorted_history = sorted(self.purchase_history, key=lambda order: order.order_date, reverse=True)
         return sorted_history[:limit]
@@ -71,22 +286,14 @@ class Customer:
 
 
     def get_total_spent(self):
-        return sum(order.total_cost for order in self.purchase_history)
+        return to_dollars(self._spent_cents)
 
     def get_loyalty_status(self):
-        total_spent = self.get_total_spent()
-        if total_spent > 5000:
-            return "Platinum"
-        elif total_spent > 2000:
-            return "Gold"
-        elif total_spent > 1000:
-            return "Silver"
-        return "Bronze"
+        return _loyalty_status(self._spent_cents)
 
     def has_purchased_product(self, product_id):
         """Check if the customer has purchased a specific product."""
-        return any(product_id in [item['product'].product_id for item in order.items]
-                   for order in self.purchase_history)
+        return product_id in self._purchased_products
 
     def __str__(self):
         return (f"{self.name} (ID: {self.customer_id}, Email: {self.email}, "
@@ -94,23 +301,64 @@ class Customer:
 
 
 class Order:
+    __slots__ = ("_owner", "_version", "order_id", "customer", "_order_date", "items", "total_cents", "_booked",
+                 "gift_message")
+
     def __init__(self, order_id, customer, order_date):
+        self._owner = None
+        self._version = 0
         self.order_id = order_id
         self.customer = customer
         self.order_date = order_date
         self.items = []
-        self.total_cost = 0
+        self.total_cents = 0
+        self._booked = False
+        self.gift_message = None
+
+    __getstate__ = _detached_state
+    __setstate__ = _restore_state
+
+    @property
+    def total_cost(self):
+        return to_dollars(self.total_cents)
+
+    @total_cost.setter
+    def total_cost(self, value):
+        self.total_cents = to_cents(value)
+        self._changed()
+
+    @property
+    def order_date(self):
+        return self._order_date
+
+    @order_date.setter
+    def order_date(self, value):
+        previous = getattr(self, "_order_date", None)
+        self._order_date = value
+        if self._owner is not None:
+            self._owner._order_date_changed(self, previous)
 
     def add_item(self, product, quantity):
         if product.stock < quantity:
             raise ValueError(f"Not enough stock for product {product.name}.")
         product.update_stock(quantity)
-        self.items.append({"product": product, "quantity": quantity})
-        self.total_cost += product.price * quantity
+        self._add_reserved_item(product, quantity)
+
+    def _add_reserved_item(self, product, quantity):
+        """Append a line whose stock the caller has already taken."""
+        price_cents = product.price_cents
+        self.items.append(LineItem(product, quantity, price_cents))
+        self.total_cents += price_cents * quantity
+        self._changed()
+
+    def _changed(self):
+        self._version += 1
+        if self._owner is not None:
+            self._owner._entity_changed(self)
 
     def get_itemized_bill(self):
         bill = "\n".join(
-            [f"{item['quantity']}x {item['product'].name} @ ${item['product'].price} each"
+            [f"{item.quantity}x {item.product.name} @ ${item.product.price} each"
              for item in self.items]
         )
         return f"Order {self.order_id}:\n{bill}\nTotal: ${self.total_cost}"
@@ -125,10 +373,16 @@ class Order:
     def apply_order_discount(self, percentage):
         if percentage < 0 or percentage > 100:
             raise ValueError("Invalid discount percentage.")
-        self.total_cost = round(self.total_cost * (1 - percentage / 100), 2)
+        previous = self.total_cents
+        self.total_cents = percent_off(previous, percentage)
+        self._changed()
+        if self._owner is not None:
+            self._owner._order_total_changed(self, previous)
+        if self._booked:
+            self.customer._adjust_spent(self.total_cents - previous)
 
     def contains_product(self, product_id):
-        return any(item['product'].product_id == product_id for item in self.items)
+        return any(item.product.product_id == product_id for item in self.items)
 
     def get_order_summary(self):
         """Get a summary of the order, including customer and total cost."""
@@ -141,204 +395,731 @@ class Order:
 
     def __str__(self):
         items_str = ", ".join(
-            [f"{item['quantity']}x {item['product'].name}" for item in self.items]
+            [f"{item.quantity}x {item.product.name}" for item in self.items]
         )
         return f"Order {self.order_id}: {items_str}, Total: ${self.total_cost}"
 
 
 class ECommerce:
-    def __init__(self):
-        self.products = []
-        self.customers = []
-        self.orders = []
+    def __init__(self, columnar=False, render_cache_size=100000, sketches=None, archive=None):
+        """Set columnar=True to keep product prices and stock in a NumPy ProductTable.
+
+        render_cache_size bounds the cache of rendered entity strings and
+        listings; 0 disables it. sketches is an optional
+        ecommerce.sketches.OrderSketches fed with every placed or imported order.
+        archive is an optional ecommerce.archive.OrderArchive that archive_orders
+        moves old orders into.
+        """
+        self.products = IndexedCollection("product_id", "Product")
+        self.customers = IndexedCollection("customer_id", "Customer")
+        self.orders = IndexedCollection("order_id", "Order")
+        # Secondary indexes, kept in sync with the collections above.
+        self._products_by_category = {}
+        self._out_of_stock = {}
+        self._orders_by_date = DateIndex()
+        self._customers_by_tier = {}
+        self._customer_tiers = {}
+        self._spend_ranking = RankedIndex()
+        self._product_sales = RankedIndex()
+        self._buyers_by_product = {}
+        self._sales_by_day = SalesRollup()
+        self._product_search = SearchIndex()
+        self._customer_search = SearchIndex()
+        # Objects kept in step with the in-memory orders, such as analytics.OrderColumns; each has
+        # order_added, order_removed and order_changed methods taking an Order, and reset(orders).
+        self._order_listeners = []
+        # _lock guards the collections and indexes above; stock is guarded per product.
+        self._lock = threading.RLock()
+        self._product_locks = {}
+        self._product_table = None
+        if columnar:
+            from ecommerce.columnar import ProductTable
+            self._product_table = ProductTable()
+        self._render_cache = RenderCache(render_cache_size) if render_cache_size else None
+        self.sketches = sketches
+        self.archive = archive
+        if archive is not None:
+            self._add_archived_totals()
+
+    def _index_product(self, product):
+        product._owner = self
+        key = product.category.casefold()
+        self._products_by_category.setdefault(key, {})[product.product_id] = product
+        self._product_stock_changed(product)
+
+    def _product_stock_changed(self, product):
+        self.products.touch()
+        if self._product_table is not None:
+            # Stock-outs are found by scanning the stock column instead.
+            return
+        if product.is_out_of_stock():
+            self._out_of_stock[product.product_id] = product
+        else:
+            self._out_of_stock.pop(product.product_id, None)
+
+    def _index_customer(self, customer):
+        customer._owner = self
+        self._customer_spend_changed(customer)
+
+    def _customer_spend_changed(self, customer):
+        self.customers.touch()
+        customer_id = customer.customer_id
+        tier = customer.get_loyalty_status().casefold()
+        previous = self._customer_tiers.get(customer_id)
+        if tier != previous:
+            if previous is not None:
+                del self._customers_by_tier[previous][customer_id]
+            self._customers_by_tier.setdefault(tier, {})[customer_id] = customer
+            self._customer_tiers[customer_id] = tier
+        self._spend_ranking.set(customer_id, customer._spent_cents)
+
+    def _entity_changed(self, entity):
+        if isinstance(entity, Product):
+            self.products.touch()
+        elif isinstance(entity, Customer):
+            self.customers.touch()
+        else:
+            self.orders.touch()
+
+    def _buyer_added(self, customer, product_id):
+        self._buyers_by_product.setdefault(product_id, {})[customer.customer_id] = customer
+
+    def _buyer_removed(self, customer, product_id):
+        buyers = self._buyers_by_product[product_id]
+        del buyers[customer.customer_id]
+        if not buyers:
+            del self._buyers_by_product[product_id]
+
+    def _index_order(self, order):
+        order._owner = self
+        self._orders_by_date.add(order.order_date, order.order_id, order)
+        self._record_sales(order, 1)
+        self._record_revenue(order, order.order_date, order.total_cents, 1)
+        for listener in self._order_listeners:
+            listener.order_added(order)
+
+    def _unindex_order(self, order):
+        order._owner = None
+        self._orders_by_date.remove(order.order_date, order.order_id)
+        self._record_sales(order, -1)
+        self._record_revenue(order, order.order_date, order.total_cents, -1)
+        for listener in self._order_listeners:
+            listener.order_removed(order)
+
+    def _record_sales(self, order, sign):
+        for item in order.items:
+            product_id = item.product.product_id
+            units = self._product_sales.score(product_id) + sign * item.quantity
+            if units > 0:
+                self._product_sales.set(product_id, units)
+            else:
+                self._product_sales.discard(product_id)
+
+    def _record_revenue(self, order, day, total, sign):
+        """Add (sign=1) or remove (sign=-1) an order's contribution to the daily rollups."""
+        units, categories = _order_sales(order, total)
+        self._sales_by_day.add(day, total, units, categories, sign)
+
+    def _order_date_changed(self, order, previous):
+        self._orders_by_date.remove(previous, order.order_id)
+        self._orders_by_date.add(order.order_date, order.order_id, order)
+        self._record_revenue(order, previous, order.total_cents, -1)
+        self._record_revenue(order, order.order_date, order.total_cents, 1)
+        for listener in self._order_listeners:
+            listener.order_changed(order)
+
+    def _order_total_changed(self, order, previous):
+        self._record_revenue(order, order.order_date, previous, -1)
+        self._record_revenue(order, order.order_date, order.total_cents, 1)
+        for listener in self._order_listeners:
+            listener.order_changed(order)
+
+    def _detach_indexes(self):
+        """Stop entities from reporting changes until _rebuild_indexes runs."""
+        for collection in (self.products, self.customers, self.orders):
+            for entity in collection:
+                entity._owner = None
+
+    def _rebuild_indexes(self):
+        """Recompute every secondary index from the primary collections."""
+        self._products_by_category.clear()
+        self._out_of_stock.clear()
+        self._orders_by_date.clear()
+        self._customers_by_tier.clear()
+        self._customer_tiers.clear()
+        self._spend_ranking.clear()
+        self._product_sales.clear()
+        self._buyers_by_product.clear()
+        self._sales_by_day.clear()
+        # Names and emails only change through methods that keep the search indexes current,
+        # so only entities added since the last rebuild need indexing.
+        self._product_search.update((product.product_id, product, (product.name,)) for product in self.products
+                                    if product.product_id not in self._product_search)
+        self._customer_search.update((customer.customer_id, customer, (customer.name, customer.email))
+                                     for customer in self.customers
+                                     if customer.customer_id not in self._customer_search)
+        for product in self.products:
+            self._index_product(product)
+        # The rankings are built with one sort each rather than one insert per customer or order line.
+        for customer in self.customers:
+            customer._owner = self
+            tier = customer.get_loyalty_status().casefold()
+            self._customers_by_tier.setdefault(tier, {})[customer.customer_id] = customer
+            self._customer_tiers[customer.customer_id] = tier
+            for product_id in customer._purchased_products:
+                self._buyer_added(customer, product_id)
+        self._spend_ranking.rebuild((customer.customer_id, customer._spent_cents) for customer in self.customers)
+        units_sold = {}
+        for order in self.orders:
+            order._owner = self
+            self._orders_by_date.add(order.order_date, order.order_id, order)
+            self._record_revenue(order, order.order_date, order.total_cents, 1)
+            for item in order.items:
+                product_id = item.product.product_id
+                units_sold[product_id] = units_sold.get(product_id, 0) + item.quantity
+        self._product_sales.rebuild(units_sold.items())
+        for listener in self._order_listeners:
+            listener.reset(self.orders)
+        if self.archive is not None:
+            self._add_archived_totals()
+        # Entities may have changed while detached.
+        for collection in (self.products, self.customers, self.orders):
+            collection.touch()
+
+    def _add_archived_totals(self):
+        """Count archived orders in the sales rollups and product rankings."""
+        self._sales_by_day.merge(self.archive.sales.between())
+        for product_id, units in self.archive.units.items():
+            self._product_sales.set(product_id, self._product_sales.score(product_id) + units)
+
+    def _new_product(self, product_id, name, price, stock, category):
+        if self._product_table is not None:
+            from ecommerce.columnar import ProductRow
+            return ProductRow(self._product_table, product_id, name, price, stock, category)
+        return Product(product_id, name, price, stock, category)
+
+    def _resolve_items(self, items):
+        lines = []
+        for product_id, quantity in items.items():
+            product = self.products.get(product_id)
+            if not product:
+                raise ValueError(f"Product {product_id} not found.")
+            if quantity < 1:
+                raise ValueError(f"Invalid quantity for product {product_id}.")
+            lines.append((product, quantity))
+        return lines
+
+    def _locked_demand(self, lines):
+        """Sum quantities per product and return them with their locks in a fixed global order.
+
+        Every caller acquires product locks sorted by product ID, so two orders
+        can never wait on each other's locks.
+        """
+        demand = {}
+        for product, quantity in lines:
+            entry = demand.setdefault(product.product_id, [product, 0])
+            entry[1] += quantity
+        product_ids = sorted(demand)
+        locks = [self._product_locks.setdefault(product_id, threading.Lock()) for product_id in product_ids]
+        return [demand[product_id] for product_id in product_ids], locks
+
+    def _reserve_stock(self, lines):
+        """Take stock for every (product, quantity) line, or for none of them."""
+        demand, locks = self._locked_demand(lines)
+        for lock in locks:
+            lock.acquire()
+        try:
+            for product, quantity in demand:
+                if product.stock < quantity:
+                    raise ValueError(f"Not enough stock for product {product.name}.")
+            for product, quantity in demand:
+                product.stock -= quantity
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def _release_stock(self, lines):
+        demand, locks = self._locked_demand(lines)
+        for lock in locks:
+            lock.acquire()
+        try:
+            for product, quantity in demand:
+                product.stock += quantity
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def _new_order(self, order_id, customer, lines, order_date):
+        order = Order(order_id, customer, datetime.date.today() if order_date is None else _to_date(order_date))
+        for product, quantity in lines:
+            order._add_reserved_item(product, quantity)
+        return order
 
     # Product Management
     def add_product(self, product_id, name, price, stock, category):
-        self.products.append(Product(product_id, name, price, stock, category))
+        if product_id in self.products:
+            raise ValueError(f"Product {product_id} already exists.")
+        product = self._new_product(product_id, name, price, stock, category)
+        with self._lock:
+            self.products.add(product)
+            self._index_product(product)
+            self._product_search.add(product_id, product, name)
 
     def list_products(self):
-        return [str(product) for product in self.products]
+        return self._listing(self.products, self.iter_products)
 
     def restock_product(self, product_id, quantity):
-        product = next((p for p in self.products if p.product_id == product_id), None)
+        product = self.products.get(product_id)
         if not product:
             raise ValueError("Product not found.")
-        product.restock(quantity)
+        with self._product_locks.setdefault(product_id, threading.Lock()):
+            product.restock(quantity)
         return f"{quantity} units added to {product.name}."
 
+    def mark_product_featured(self, product_id):
+        product = self.products.get(product_id)
+        if not product:
+            raise ValueError("Product not found.")
+        with self._lock:
+            return product.mark_as_featured()
+
     def search_products_by_category(self, category):
-        results = [product for product in self.products if product.category.lower() == category.lower()]
+        results = list(self._products_by_category.get(category.casefold(), {}).values())
         return results if results else f"No products found in category '{category}'."
 
     def apply_discount_to_category(self, category, percentage):
-        discounted_products = []
-        for product in self.products:
-            if product.category.lower() == category.lower():
-                product.apply_discount(percentage)
-                discounted_products.append(product)
+        if self._product_table is not None:
+            if percentage < 0 or percentage > 100:
+                raise ValueError("Invalid discount percentage.")
+            discounted = self._product_table.discount_category(category, percentage)
+            if not discounted:
+                raise ValueError(f"No products found in category '{category}'.")
+            self.products.touch()
+            return f"Discount applied to {discounted} product(s) in category '{category}'."
+        discounted_products = list(self._products_by_category.get(category.casefold(), {}).values())
+        for product in discounted_products:
+            product.apply_discount(percentage)
         if not discounted_products:
             raise ValueError(f"No products found in category '{category}'.")
         return f"Discount applied to {len(discounted_products)} product(s) in category '{category}'."
 
+    def search_products(self, query, limit=10):
+        """Up to limit products whose name matches query, best match first; see search_customers."""
+        with self._lock:
+            return [product for _, _, product in self._product_search.search(query, limit)]
+
     def list_out_of_stock_products(self):
         """List all products that are out of stock."""
-        out_of_stock = [product for product in self.products if product.is_out_of_stock()]
+        if self._product_table is not None:
+            out_of_stock = self._product_table.out_of_stock()
+        else:
+            out_of_stock = list(self._out_of_stock.values())
         return out_of_stock if out_of_stock else "No out-of-stock products found."
 
     # Customer Management
     def add_customer(self, customer_id, name, email, phone_number):
-        self.customers.append(Customer(customer_id, name, email, phone_number))
+        customer = Customer(customer_id, name, email, phone_number)
+        with self._lock:
+            self.customers.add(customer)
+            self._index_customer(customer)
+            self._customer_search.add(customer_id, customer, name, email)
 
     def list_customers(self):
-        return [str(customer) for customer in self.customers]
+        return self._listing(self.customers, self.iter_customers)
 
     def update_customer_email(self, customer_id, new_email):
-        customer = next((c for c in self.customers if c.customer_id == customer_id), None)
+        customer = self.customers.get(customer_id)
         if not customer:
             raise ValueError("Customer not found.")
-        customer.email = new_email
+        with self._lock:
+            customer.email = new_email
+            self._customer_search.add(customer_id, customer, customer.name, new_email)
+        customer._changed()
         return f"Email for {customer.name} updated to {new_email}."
 
+    def update_customer_phone(self, customer_id, new_phone):
+        customer = self.customers.get(customer_id)
+        if not customer:
+            raise ValueError("Customer not found.")
+        with self._lock:
+            return customer.update_phone_number(new_phone)
+
+    def deactivate_customer(self, customer_id):
+        customer = self.customers.get(customer_id)
+        if not customer:
+            raise ValueError("Customer not found.")
+        with self._lock:
+            result = customer.deactivate_account()
+        customer._changed()
+        return result
+
+    def search_customers(self, query, limit=10):
+        """Up to limit customers whose name or email matches query, best match first.
+
+        Words starting with query rank first, then names and emails merely
+        containing it (queries of three or more characters); see ecommerce.search.
+        """
+        with self._lock:
+            return [customer for _, _, customer in self._customer_search.search(query, limit)]
+
     def get_customers_by_loyalty(self, loyalty_level):
-        return [customer for customer in self.customers if customer.get_loyalty_status().lower() == loyalty_level.lower()]
+        return list(self._customers_by_tier.get(loyalty_level.casefold(), {}).values())
 
     def find_customers_purchased_product(self, product_id):
         """Find all customers who have purchased a specific product."""
-        return [customer for customer in self.customers if customer.has_purchased_product(product_id)]
+        return list(self._buyers_by_product.get(product_id, {}).values())
 
     # Order Management
-    def place_order(self, order_id, customer_id, items):
-        customer = next((c for c in self.customers if c.customer_id == customer_id), None)
+    def place_order(self, order_id, customer_id, items, order_date=None):
+        customer = self.customers.get(customer_id)
         if not customer:
             raise ValueError("Customer not found.")
-
-        order = Order(order_id, customer, datetime.date.today())
-        for product_id, quantity in items.items():
-            product = next((p for p in self.products if p.product_id == product_id), None)
-            if not product:
-                raise ValueError(f"Product {product_id} not found.")
-            order.add_item(product, quantity)
-
-        customer.add_purchase(order)
-        self.orders.append(order)
+        if order_id in self.orders:
+            raise ValueError(f"Order {order_id} already exists.")
+
+        lines = self._resolve_items(items)
+        order_date = datetime.date.today() if order_date is None else _to_date(order_date)
+        self._reserve_stock(lines)
+        order = self._new_order(order_id, customer, lines, order_date)
+        with self._lock:
+            if order_id in self.orders:
+                self._release_stock(lines)
+                raise ValueError(f"Order {order_id} already exists.")
+            customer.add_purchase(order)
+            self.orders.add(order)
+            self._index_order(order)
+        if self.sketches is not None:
+            self.sketches.record(order)
+
+    def apply_order_discount(self, order_id, percentage):
+        order = self.orders.get(order_id)
+        if not order:
+            raise ValueError("Order not found.")
+        with self._lock:
+            order.apply_order_discount(percentage)
+        return f"Discount applied to order {order_id}."
 
     def list_orders(self):
-        return [str(order) for order in self.orders]
+        return self._listing(self.orders, self.iter_orders)
 
     def get_orders_in_date_range(self, start_date, end_date):
-        start_date = datetime.datetime.strptime(start_date, "%Y-%m-%d").date()
-        end_date = datetime.datetime.strptime(end_date, "%Y-%m-%d").date()
-        orders_in_range = [order for order in self.orders if start_date <= order.order_date <= end_date]
+        start, end = _to_date(start_date), _to_date(end_date)
+        orders_in_range = list(self._orders_by_date.between(start, end))
+        if self.archive is not None:
+            orders_in_range = list(heapq.merge(self.archive.orders_between(self, start, end), orders_in_range,
+                                               key=lambda order: order.order_date))
         return orders_in_range if orders_in_range else "No orders found in the given date range."
 
     def cancel_order(self, order_id):
-        order = next((o for o in self.orders if o.order_id == order_id), None)
-        if not order:
-            raise ValueError("Order not found.")
-        for item in order.items:
-            item["product"].stock += item["quantity"]
-        self.orders.remove(order)
+        with self._lock:
+            order = self.orders.remove(order_id)
+            self._unindex_order(order)
+            order.customer.remove_purchase(order)
+        self._release_stock([(item.product, item.quantity) for item in order.items])
         return f"Order {order_id} has been canceled and stock returned."
 
+    def archive_orders(self, before=None):
+        """Move orders dated before `before` into the archive; returns how many moved.
+
+        `before` defaults to the archive's cutoff, max_age_days ago. Archived
+        orders still count in sales reports, rankings and customer spend, and
+        date-range and per-customer queries still return them. They leave
+        the orders collection, so listings, paging, cancel_order and the
+        duplicate check of place_order only see the orders still in memory.
+        """
+        if self.archive is None:
+            raise ValueError("No order archive configured.")
+        cutoff = self.archive.cutoff() if before is None else _to_date(before)
+        if cutoff <= datetime.date.min:
+            return 0
+        with self._lock:
+            old = list(self._orders_by_date.between(datetime.date.min, cutoff - datetime.timedelta(days=1)))
+            if not old:
+                return 0
+            self.archive.write(old)
+            self._drop_archived(old)
+        return len(old)
+
+    def _drop_archived(self, orders, counted=False):
+        """Take orders now held by the archive out of memory; customer spend keeps counting them.
+
+        The sales rollups and product rankings keep counting them too, unless
+        counted=True says the archive's own totals already include them.
+        """
+        for order in orders:
+            self.orders.remove(order.order_id)
+            if counted:
+                self._unindex_order(order)
+            else:
+                self._orders_by_date.remove(order.order_date, order.order_id)
+                order._owner = None
+                for listener in self._order_listeners:
+                    listener.order_removed(order)
+            order._booked = False
+        for customer in {order.customer.customer_id: order.customer for order in orders}.values():
+            customer.purchase_history = [order for order in customer.purchase_history if order._booked]
+
+    # Bulk Import
+    def import_products(self, path, batch_size=10000):
+        """Stream products from a CSV or JSONL file; returns the number loaded."""
+        return self._bulk_import(importer.iter_products(path), batch_size, self._insert_product_batch)
+
+    def import_customers(self, path, batch_size=10000):
+        """Stream customers from a CSV or JSONL file; returns the number loaded."""
+        return self._bulk_import(importer.iter_customers(path), batch_size, self._insert_customer_batch)
+
+    def import_orders(self, path, batch_size=10000):
+        """Stream orders from a CSV or JSONL file; returns the number placed.
+
+        Each batch is checked for unknown IDs, malformed dates and quantities,
+        and for enough stock to cover all of its orders before any of them is
+        placed, so a bad batch changes nothing.
+        """
+        return self._bulk_import(importer.iter_orders(path), batch_size, self._insert_order_batch)
+
+    def _bulk_import(self, rows, batch_size, insert_batch):
+        self._detach_indexes()
+        loaded = 0
+        try:
+            for batch in importer.batched(rows, batch_size):
+                insert_batch(batch)
+                loaded += len(batch)
+        finally:
+            self._rebuild_indexes()
+        return loaded
+
+    def _check_new_ids(self, ids, collection, label):
+        seen = set()
+        for item_id in ids:
+            if item_id in collection or item_id in seen:
+                raise ValueError(f"{label} {item_id} already exists.")
+            seen.add(item_id)
+
+    def _insert_product_batch(self, batch):
+        self._check_new_ids((row[0] for row in batch), self.products, "Product")
+        for row in batch:
+            self.products.add(self._new_product(*row))
+
+    def _insert_customer_batch(self, batch):
+        self._check_new_ids((row[0] for row in batch), self.customers, "Customer")
+        for row in batch:
+            self.customers.add(Customer(*row))
+
+    def _insert_order_batch(self, batch):
+        self._check_new_ids((row[0] for row in batch), self.orders, "Order")
+        # Every row is resolved, with its date parsed, before any stock is taken.
+        orders = []
+        demand = {}
+        for order_id, customer_id, items, order_date in batch:
+            customer = self.customers.get(customer_id)
+            if not customer:
+                raise ValueError(f"Customer {customer_id} not found.")
+            lines = self._resolve_items(items)
+            for product, quantity in lines:
+                entry = demand.setdefault(product.product_id, [product, 0])
+                entry[1] += quantity
+            order_date = datetime.date.today() if order_date is None else _to_date(order_date)
+            orders.append((order_id, customer, lines, order_date))
+        for product, quantity in demand.values():
+            if product.stock < quantity:
+                raise ValueError(f"Not enough stock for product {product.name}.")
+        for order_id, customer, lines, order_date in orders:
+            self._reserve_stock(lines)
+            order = self._new_order(order_id, customer, lines, order_date)
+            customer.add_purchase(order)
+            self.orders.add(order)
+            if self.sketches is not None:
+                self.sketches.record(order)
+
     # Reports and Analytics
-    def generate_sales_report(self):
-        total_sales = sum(order.total_cost for order in self.orders)
-        return f"Total Sales: ${total_sales}"
+    def generate_sales_report(self, start_date=None, end_date=None, granularity=None):
+        """All-time total with no arguments; otherwise revenue per day, week or month within [start, end].
+
+        Both forms read the daily rollups, so cost grows with the days in
+        range rather than the number of orders.
+        """
+        if start_date is None and end_date is None and granularity is None:
+            return f"Total Sales: ${to_dollars(self._sales_by_day.total)}"
+        granularity = granularity or "day"
+        return _format_sales_report(self._period_totals(start_date, end_date, granularity), granularity)
+
+    def sales_by_period(self, start_date=None, end_date=None, granularity="day"):
+        """Return (period start, revenue, orders, units, {category: revenue}) tuples, oldest first."""
+        return _periods_in_dollars(self._period_totals(start_date, end_date, granularity))
+
+    def _period_totals(self, start_date, end_date, granularity):
+        """sales_by_period() with revenue in cents."""
+        start = None if start_date is None else _to_date(start_date)
+        end = None if end_date is None else _to_date(end_date)
+        with self._lock:
+            return _sales_periods(self._sales_by_day.between(start, end), granularity)
 
     def customer_purchase_history(self, customer_id):
-        customer = next((c for c in self.customers if c.customer_id == customer_id), None)
-        if not customer:
-            return "Customer not found."
-        history = "\n".join(order.get_itemized_bill() for order in customer.purchase_history)
-        return f"Purchase History for {customer.name}:\n{history}" if history else "No purchases found."
-
-    def calculate_total_inventory_value(self):
-        return sum(product.calculate_stock_value() for product in self.products)
+        return "".join(self.iter_customer_purchase_history(customer_id))
 
     def get_featured_products(self):
-        featured_products = [product for product in self.products if getattr(product, 'is_featured', False)]
+        featured_products = [product for product in self.products if product.is_featured]
         return featured_products if featured_products else "No featured products available."
 
     def get_inactive_customers(self):
-        return [customer for customer in self.customers if not getattr(customer, 'is_active', True)]
+        return [customer for customer in self.customers if not customer.is_active]
 
     def get_highest_spending_customer(self):
         if not self.customers:
             return "No customers available."
-        highest_spender = max(self.customers, key=lambda c: c.get_total_spent(), default=None)
+        top = self._spend_ranking.top(1)
+        highest_spender = self.customers.get(top[0]) if top else None
         return highest_spender if highest_spender else "No purchases yet."
 
     def get_orders_by_customer(self, customer_id):
         customer_orders = [order for order in self.orders if order.customer.customer_id == customer_id]
+        if self.archive is not None:
+            customer_orders = self.archive.orders_for_customer(self, customer_id) + customer_orders
         return customer_orders if customer_orders else f"No orders found for customer ID {customer_id}."
 
 
     def calculate_total_inventory_value(self):
-        return sum(product.calculate_stock_value() for product in self.products)
+        if self._product_table is not None:
+            return self._product_table.total_value()
+        return to_dollars(sum(product.stock * product.price_cents for product in self.products))
+
+    def find_products_in_price_range(self, min_price, max_price):
+        if self._product_table is not None:
+            return self._product_table.in_price_range(min_price, max_price)
+        low, high = to_cents(min_price), to_cents(max_price)
+        return [product for product in self.products if low <= product.price_cents <= high]
+
+    def top_selling_products(self, k=10):
+        """Return up to k (product, units sold) pairs, best seller first."""
+        return [(self.products.get(product_id), self._product_sales.score(product_id))
+                for product_id in self._product_sales.top(k)]
 
     def find_top_selling_product(self):
-        product_sales = {}
-        for order in self.orders:
-            for item in order.items:
-                product = item['product']
-                product_sales[product.product_id] = product_sales.get(product.product_id, 0) + item['quantity']
-        if not product_sales:
+        top = self._product_sales.top(1)
+        if not top:
             return "No sales data available."
-        top_product_id = max(product_sales, key=product_sales.get)
-        top_product = next((p for p in self.products if p.product_id == top_product_id), None)
-        return f"Top Selling Product: {top_product.name} (Sold: {product_sales[top_product_id]} units)" if top_product else "No products found."
+        top_product_id = top[0]
+        top_product = self.products.get(top_product_id)
+        return f"Top Selling Product: {top_product.name} (Sold: {self._product_sales.score(top_product_id)} units)" if top_product else "No products found."
 
     def find_customers_with_high_spending(self, threshold):
-        return [customer for customer in self.customers if customer.get_total_spent() > threshold]
+        return [self.customers.get(customer_id) for customer_id in self._spend_ranking.above(to_cents(threshold))]
 
     def find_orders_by_date(self, date_str):
-        target_date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
-        return [order for order in self.orders if order.order_date == target_date]
+        day = _to_date(date_str)
+        if self.archive is not None:
+            return self.archive.orders_between(self, day, day) + self._orders_by_date.on(day)
+        return self._orders_by_date.on(day)
 
 
     def find_most_purchased_product(self):
-        product_counts = {}
-        for order in self.orders:
-            for item in order.items:
-                product_id = item['product'].product_id
-                product_counts[product_id] = product_counts.get(product_id, 0) + item['quantity']
-        if not product_counts:
+        top = self._product_sales.top(1)
+        if not top:
             return "No products have been purchased yet."
-        most_purchased_id = max(product_counts, key=product_counts.get)
-        most_purchased = next((p for p in self.products if p.product_id == most_purchased_id), None)
+        most_purchased = self.products.get(top[0])
         return most_purchased if most_purchased else "Error finding the most purchased product."
 
     def generate_customer_spending_report(self):
-        customer_spending = {}
-        for customer in self.customers:
-            total_spent = sum(order.total_cost for order in self.orders if order.customer == customer)
-            customer_spending[customer.name] = total_spent
-
         report = "Customer Spending Report:\n"
-        report += "\n".join([f"{name}: ${amount:.2f}" for name, amount in sorted(customer_spending.items(), key=lambda x: x[1], reverse=True)])
+        report += "\n".join(
+            f"{customer.name}: ${format_cents(customer._spent_cents)}"
+            for customer in map(self.customers.get, self._spend_ranking.top())
+        )
 
         return report
 
     def generate_customer_order_history(self, customer_id):
-        customer = next((c for c in self.customers if c.customer_id == customer_id), None)
+        return "".join(self.iter_customer_order_history(customer_id))
+
+    def stats(self):
+        """Snapshot of the opt-in call metrics; empty unless instrumentation.enable() was called."""
+        from ecommerce import instrumentation
+        return instrumentation.snapshot()
+
+    def cache_stats(self):
+        """Hit and miss counts of the rendered-string cache; empty when it is disabled."""
+        return self._render_cache.stats() if self._render_cache is not None else {}
+
+    # Streaming and Pagination
+    def _render(self, entity):
+        if self._render_cache is None:
+            return str(entity)
+        return self._render_cache.render(entity)
+
+    def _listing(self, collection, render):
+        if self._render_cache is None:
+            return list(render())
+        return self._render_cache.listing(collection, render)
+
+    def _iter_rendered(self, collection, page_size=1000):
+        items, token = collection.page(page_size)
+        while True:
+            for item in items:
+                yield self._render(item)
+            if token is None:
+                return
+            items, token = collection.page(page_size, token)
+
+    def iter_products(self):
+        """Yield rendered products lazily, in insertion order."""
+        return self._iter_rendered(self.products)
+
+    def iter_customers(self):
+        return self._iter_rendered(self.customers)
+
+    def iter_orders(self):
+        return self._iter_rendered(self.orders)
+
+    def page_products(self, page_size=100, token=None):
+        """Return (rendered products, next_token); pass next_token back to get the next page."""
+        products, token = self.products.page(page_size, token)
+        return [self._render(product) for product in products], token
+
+    def page_customers(self, page_size=100, token=None):
+        customers, token = self.customers.page(page_size, token)
+        return [self._render(customer) for customer in customers], token
+
+    def page_orders(self, page_size=100, token=None):
+        orders, token = self.orders.page(page_size, token)
+        return [self._render(order) for order in orders], token
+
+    def _purchase_history(self, customer):
+        history = list(customer.purchase_history)
+        if self.archive is not None:
+            history = self.archive.orders_for_customer(self, customer.customer_id) + history
+        return history
+
+    def iter_customer_purchase_history(self, customer_id):
+        """Yield the customer_purchase_history text in chunks, one bill at a time."""
+        customer = self.customers.get(customer_id)
         if not customer:
-            return f"No customer found with ID {customer_id}."
-
-        customer_orders = [order for order in self.orders if order.customer == customer]
-
-        if not customer_orders:
-            return f"No orders found for customer {customer.name}."
-
-        report = f"Order History for {customer.name} (ID: {customer.customer_id}):\n\n"
-
-        for order in customer_orders:
-            items_summary = ", ".join([f"{item['quantity']}x {item['product'].name}" for item in order.items])
-            report += (
+            yield "Customer not found."
+            return
+        history = self._purchase_history(customer)
+        if not history:
+            yield "No purchases found."
+            return
+        yield f"Purchase History for {customer.name}:\n"
+        for position, order in enumerate(history):
+            yield ("\n" if position else "") + order.get_itemized_bill()
+
+    def iter_customer_order_history(self, customer_id):
+        """Yield the generate_customer_order_history report in chunks, one order at a time."""
+        customer = self.customers.get(customer_id)
+        if not customer:
+            yield f"No customer found with ID {customer_id}."
+            return
+        history = self._purchase_history(customer)
+        if not history:
+            yield f"No orders found for customer {customer.name}."
+            return
+        yield f"Order History for {customer.name} (ID: {customer.customer_id}):\n\n"
+        for order in history:
+            items_summary = ", ".join([f"{item.quantity}x {item.product.name}" for item in order.items])
+            yield (
                 f"Order ID: {order.order_id}\n"
                 f"Date: {order.order_date}\n"
-                f"Total: ${order.total_cost:.2f}\n"
+                f"Total: ${format_cents(order.total_cents)}\n"
                 f"Items: {items_summary}\n\n"
             )
 
-        return report
-
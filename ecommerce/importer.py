@@ -0,0 +1,73 @@
+"""Streaming readers for bulk catalog, customer and order files.
+
+Files are read lazily, one record at a time, so memory stays flat no matter
+how large the input is. The format is picked from the file extension:
+``.csv`` files need a header row, and ``.jsonl``/``.ndjson`` files hold one
+JSON object per line.
+"""
+import csv
+import itertools
+import json
+import os
+
+
+def iter_records(path):
+    """Yield each record in path as a dict."""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline="", encoding="utf-8") as handle:
+        if extension == ".csv":
+            yield from csv.DictReader(handle)
+        elif extension in (".jsonl", ".ndjson"):
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            raise ValueError(f"Unsupported import format '{extension}'.")
+
+
+def batched(iterable, size):
+    """Yield lists of up to size items from iterable."""
+    if size < 1:
+        raise ValueError("Batch size must be at least 1.")
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def iter_products(path):
+    for record in iter_records(path):
+        yield (record["product_id"], record["name"], float(record["price"]), int(record["stock"]),
+               record["category"])
+
+
+def iter_customers(path):
+    for record in iter_records(path):
+        yield record["customer_id"], record["name"], record["email"], record["phone_number"]
+
+
+def iter_orders(path):
+    """Yield (order_id, customer_id, items, order_date) tuples.
+
+    JSONL records carry a whole order with an ``items`` object mapping product
+    IDs to quantities. CSV files have one line item per row, and consecutive
+    rows sharing an order_id are merged into one order. ``order_date`` is
+    optional in both formats.
+    """
+    current = None
+    for record in iter_records(path):
+        if "items" in record:
+            if current is not None:
+                yield current
+                current = None
+            items = {product_id: int(quantity) for product_id, quantity in record["items"].items()}
+            yield record["order_id"], record["customer_id"], items, record.get("order_date") or None
+            continue
+        order_id = record["order_id"]
+        if current is None or current[0] != order_id:
+            if current is not None:
+                yield current
+            current = (order_id, record["customer_id"], {}, record.get("order_date") or None)
+        items = current[2]
+        items[record["product_id"]] = items.get(record["product_id"], 0) + int(record["quantity"])
+    if current is not None:
+        yield current
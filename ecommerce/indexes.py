@@ -0,0 +1,356 @@
+import base64
+import binascii
+import bisect
+import itertools
+import json
+
+# Tombstone left in IndexedCollection's ID log by removals.
+_REMOVED = object()
+
+
+class IndexedCollection:
+    """Insertion-ordered collection of entities with O(1) lookup and removal by ID."""
+
+    def __init__(self, key, label):
+        self._key = key
+        self._label = label
+        self._items = {}
+        # Append-only ID log that continuation tokens point into.
+        self._log = []
+        self._positions = {}
+        self._removed = 0
+        self._generation = 0
+        # Bumped whenever membership or a member's rendering changes.
+        self.version = 0
+
+    def add(self, item):
+        item_id = getattr(item, self._key)
+        if item_id in self._items:
+            raise ValueError(f"{self._label} {item_id} already exists.")
+        self._items[item_id] = item
+        self._positions[item_id] = len(self._log)
+        self._log.append(item_id)
+        self.version += 1
+
+    def get(self, item_id, default=None):
+        return self._items.get(item_id, default)
+
+    def remove(self, item_id):
+        try:
+            item = self._items.pop(item_id)
+        except KeyError:
+            raise ValueError(f"{self._label} not found.") from None
+        self._log[self._positions.pop(item_id)] = _REMOVED
+        self._removed += 1
+        self.version += 1
+        if self._removed > 1024 and 2 * self._removed > len(self._log):
+            self._compact()
+        return item
+
+    def _compact(self):
+        self._log = list(self._items)
+        self._positions = {item_id: position for position, item_id in enumerate(self._log)}
+        self._removed = 0
+        self._generation += 1
+
+    def clear(self):
+        self._items.clear()
+        self._compact()
+        self.version += 1
+
+    def touch(self):
+        """Record that a member changed in place."""
+        self.version += 1
+
+    def page(self, page_size, token=None):
+        """Return (items, next_token) for up to page_size items following token.
+
+        next_token is None once the end of the collection has been reached.
+        Tokens survive later adds and removes. If the ID log has been compacted
+        since the token was issued, reading resumes after the last item the
+        token returned. If that item has also been removed, the token is
+        rejected as expired.
+        """
+        if page_size < 1:
+            raise ValueError("Page size must be at least 1.")
+        position, last_id = self._decode_token(token) if token else (0, None)
+        log = self._log
+        items = []
+        while position < len(log) and len(items) < page_size:
+            item_id = log[position]
+            position += 1
+            item = self._items.get(item_id) if item_id is not _REMOVED else None
+            if item is not None:
+                items.append(item)
+                last_id = item_id
+        if position >= len(log):
+            return items, None
+        return items, self._encode_token(position, last_id)
+
+    def _encode_token(self, position, last_id):
+        raw = json.dumps([self._generation, position, last_id], separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+    def _decode_token(self, token):
+        try:
+            generation, position, last_id = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        except (binascii.Error, UnicodeError, TypeError, ValueError):
+            raise ValueError("Invalid continuation token.") from None
+        if generation != self._generation:
+            if last_id is None or last_id not in self._positions:
+                raise ValueError("Continuation token has expired.")
+            position = self._positions[last_id] + 1
+        return position, last_id
+
+    def ids(self):
+        return self._items.keys()
+
+    def __contains__(self, item_id):
+        return item_id in self._items
+
+    def __iter__(self):
+        # Iterate over a copy so concurrent adds and removes cannot break iteration.
+        return iter(list(self._items.values()))
+
+    def __reversed__(self):
+        return reversed(list(self._items.values()))
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, position):
+        """Positional access in insertion order, kept for list-style callers."""
+        return list(self._items.values())[position]
+
+
+class DateIndex:
+    """Entities bucketed by day, with the days kept sorted for range queries."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._days = []
+
+    def add(self, day, key, item):
+        bucket = self._buckets.get(day)
+        if bucket is None:
+            bucket = self._buckets[day] = {}
+            bisect.insort(self._days, day)
+        bucket[key] = item
+
+    def remove(self, day, key):
+        bucket = self._buckets[day]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[day]
+            del self._days[bisect.bisect_left(self._days, day)]
+
+    def on(self, day):
+        return list(self._buckets.get(day, {}).values())
+
+    def between(self, start, end):
+        """Yield items dated within [start, end], oldest day first."""
+        lo = bisect.bisect_left(self._days, start)
+        hi = bisect.bisect_right(self._days, end)
+        for day in self._days[lo:hi]:
+            yield from list(self._buckets.get(day, {}).values())
+
+    def clear(self):
+        self._buckets.clear()
+        self._days.clear()
+
+
+class DayTotals:
+    __slots__ = ("revenue", "orders", "units", "categories")
+
+    def __init__(self):
+        self.revenue = 0
+        self.orders = 0
+        self.units = 0
+        self.categories = {}
+
+
+class SalesRollup:
+    """Per-day revenue, order count, units and per-category revenue, with the days kept sorted.
+
+    Revenue is in integer cents, so adding and removing orders is exact in any order.
+    """
+
+    def __init__(self):
+        self._totals = {}
+        self._days = []
+        self.total = 0
+
+    def add(self, day, revenue, units, categories, sign=1):
+        """Add one order's contribution to day; sign=-1 takes it back out."""
+        totals = self._totals.get(day)
+        if totals is None:
+            totals = self._totals[day] = DayTotals()
+            bisect.insort(self._days, day)
+        totals.revenue += sign * revenue
+        totals.orders += sign
+        totals.units += sign * units
+        for category, amount in categories.items():
+            amount = totals.categories.get(category, 0) + sign * amount
+            if amount:
+                totals.categories[category] = amount
+            else:
+                totals.categories.pop(category, None)
+        if not totals.orders:
+            del self._totals[day]
+            del self._days[bisect.bisect_left(self._days, day)]
+        self.total += sign * revenue
+
+    def merge(self, days):
+        """Add (day, DayTotals) pairs, such as another rollup's between(), into this one."""
+        for day, theirs in days:
+            totals = self._totals.get(day)
+            if totals is None:
+                totals = self._totals[day] = DayTotals()
+                bisect.insort(self._days, day)
+            totals.revenue += theirs.revenue
+            totals.orders += theirs.orders
+            totals.units += theirs.units
+            for category, amount in theirs.categories.items():
+                totals.categories[category] = totals.categories.get(category, 0) + amount
+            self.total += theirs.revenue
+
+    def between(self, start=None, end=None):
+        """Yield (day, DayTotals) for days within [start, end], oldest first; None leaves a side open."""
+        lo = 0 if start is None else bisect.bisect_left(self._days, start)
+        hi = len(self._days) if end is None else bisect.bisect_right(self._days, end)
+        for day in self._days[lo:hi]:
+            totals = self._totals.get(day)
+            if totals is not None:
+                yield day, totals
+
+    def clear(self):
+        self._totals.clear()
+        self._days.clear()
+        self.total = 0
+
+
+class SortedKeys:
+    """Sorted values stored in chunks, so an insert shifts one chunk rather than the whole list."""
+
+    CHUNK = 1000
+
+    def __init__(self):
+        self._chunks = []
+        self._maxes = []
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self._chunks)
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self._chunks)
+
+    def __reversed__(self):
+        return itertools.chain.from_iterable(reversed(chunk) for chunk in reversed(self._chunks))
+
+    def add(self, value):
+        if not self._chunks:
+            self._chunks.append([value])
+            self._maxes.append(value)
+            return
+        index = min(bisect.bisect_left(self._maxes, value), len(self._chunks) - 1)
+        chunk = self._chunks[index]
+        bisect.insort(chunk, value)
+        self._maxes[index] = chunk[-1]
+        if len(chunk) > 2 * self.CHUNK:
+            self._chunks[index:index + 1] = [chunk[:self.CHUNK], chunk[self.CHUNK:]]
+            self._maxes[index:index + 1] = [chunk[self.CHUNK - 1], chunk[-1]]
+
+    def update(self, values):
+        """Add many values with one sort instead of one insert each."""
+        merged = sorted(itertools.chain(itertools.chain.from_iterable(self._chunks), values))
+        self._chunks = [merged[i:i + self.CHUNK] for i in range(0, len(merged), self.CHUNK)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+
+    def remove(self, value):
+        index = bisect.bisect_left(self._maxes, value)
+        if index == len(self._chunks):
+            raise KeyError(value)
+        chunk = self._chunks[index]
+        position = bisect.bisect_left(chunk, value)
+        if position == len(chunk) or chunk[position] != value:
+            raise KeyError(value)
+        del chunk[position]
+        if chunk:
+            self._maxes[index] = chunk[-1]
+        else:
+            del self._chunks[index]
+            del self._maxes[index]
+
+    def irange(self, start):
+        """Yield values >= start in ascending order."""
+        index = bisect.bisect_left(self._maxes, start)
+        if index == len(self._chunks):
+            return
+        chunk = self._chunks[index]
+        yield from itertools.islice(chunk, bisect.bisect_left(chunk, start), None)
+        for chunk in self._chunks[index + 1:]:
+            yield from chunk
+
+    def clear(self):
+        self._chunks.clear()
+        self._maxes.clear()
+
+
+class RankedIndex:
+    """Keys kept sorted by a numeric score; ties rank in first-registered order.
+
+    Entries live in a SortedKeys, so a score change moves one entry within one chunk.
+    """
+
+    def __init__(self):
+        self._entries = SortedKeys()
+        self._scores = {}
+        self._next_seq = 0
+
+    def set(self, key, score):
+        entry = self._scores.get(key)
+        if entry is not None:
+            if entry[0] == score:
+                return
+            self._entries.remove((*entry, key))
+            rank = entry[1]
+        else:
+            rank = -self._next_seq
+            self._next_seq += 1
+        self._scores[key] = (score, rank)
+        self._entries.add((score, rank, key))
+
+    def rebuild(self, pairs):
+        """Replace the contents with (key, score) pairs using one sort; ties rank in pair order."""
+        self._scores = {}
+        for seq, (key, score) in enumerate(pairs, self._next_seq):
+            self._scores[key] = (score, -seq)
+        self._next_seq += len(self._scores)
+        self._entries.clear()
+        self._entries.update((score, rank, key) for key, (score, rank) in self._scores.items())
+
+    def discard(self, key):
+        entry = self._scores.pop(key, None)
+        if entry is not None:
+            self._entries.remove((*entry, key))
+
+    def score(self, key, default=0):
+        entry = self._scores.get(key)
+        return entry[0] if entry is not None else default
+
+    def top(self, k=None):
+        """Return up to k keys, highest score first."""
+        return [key for _, _, key in itertools.islice(reversed(self._entries), k)]
+
+    def above(self, threshold):
+        """Return keys scoring strictly above threshold, highest score first."""
+        keys = [key for _, _, key in self._entries.irange((threshold, float("inf")))]
+        keys.reverse()
+        return keys
+
+    def clear(self):
+        self._entries.clear()
+        self._scores.clear()
+
+    def __len__(self):
+        return len(self._scores)
@@ -0,0 +1,308 @@
+"""Opt-in call metrics and sampling profiler for ECommerce, Order and Customer.
+
+Nothing is measured until enable() is called. enable() replaces each public
+method on the instrumented classes with a timing wrapper; disable() puts
+the original functions back. While disabled there is therefore no wrapper
+and no per-call cost at all.
+
+For every method the wrapper records call and error counts, a latency
+histogram (from which p50/p95/p99 are estimated) and the size of list, dict,
+tuple and str results. Methods returning a generator are timed until it is
+exhausted, and their size is the number of items yielded. Metrics are
+process-wide, keyed by "Class.method", and read through snapshot() (also
+ECommerce.stats()) or prometheus_text(). export() hands them to another
+process, whose snapshot() can merge them.
+
+start_profiling(sample_rate) profiles a random sample of instrumented calls
+with cProfile; stop_profiling() returns the accumulated pstats.Stats.
+"""
+import bisect
+import cProfile
+import functools
+import inspect
+import pstats
+import random
+import threading
+import time
+import types
+
+from ecommerce.ecommerce import Customer, ECommerce, Order
+
+INSTRUMENTED_CLASSES = (ECommerce, Order, Customer)
+# Upper bounds in seconds: 1us doubling up to about 134s.
+BUCKETS = tuple(1e-6 * 2 ** i for i in range(28))
+SKIPPED = {"stats"}
+
+
+class LatencyHistogram:
+    """Fixed exponential buckets; percentiles are interpolated within a bucket."""
+    __slots__ = ("counts", "count", "total", "maximum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.maximum:
+            self.maximum = seconds
+
+    def percentile(self, fraction):
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                if index == len(BUCKETS):
+                    return self.maximum
+                lower = BUCKETS[index - 1] if index else 0.0
+                upper = min(BUCKETS[index], self.maximum)
+                return lower + (upper - lower) * max(rank - seen, 0) / bucket_count
+            seen += bucket_count
+        return self.maximum
+
+
+class MethodStats:
+    __slots__ = ("calls", "errors", "latency", "sized_results", "result_items", "largest_result", "lock")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency = LatencyHistogram()
+        self.sized_results = 0
+        self.result_items = 0
+        self.largest_result = 0
+        self.lock = threading.Lock()
+
+    def record(self, seconds, size, failed):
+        with self.lock:
+            self.calls += 1
+            if failed:
+                self.errors += 1
+            self.latency.record(seconds)
+            if size is not None:
+                self.sized_results += 1
+                self.result_items += size
+                if size > self.largest_result:
+                    self.largest_result = size
+
+    def state(self):
+        """Plain copy of the counters that can cross a pipe; see merge()."""
+        with self.lock:
+            latency = self.latency
+            return (self.calls, self.errors, list(latency.counts), latency.total, latency.maximum,
+                    self.sized_results, self.result_items, self.largest_result)
+
+    def merge(self, state):
+        """Add in the counters of a state() taken elsewhere, e.g. in another process."""
+        calls, errors, counts, total, maximum, sized_results, result_items, largest_result = state
+        with self.lock:
+            self.calls += calls
+            self.errors += errors
+            latency = self.latency
+            latency.counts = [mine + theirs for mine, theirs in zip(latency.counts, counts)]
+            latency.count += calls
+            latency.total += total
+            latency.maximum = max(latency.maximum, maximum)
+            self.sized_results += sized_results
+            self.result_items += result_items
+            self.largest_result = max(self.largest_result, largest_result)
+
+
+_metrics = {}
+_originals = {}
+_state_lock = threading.Lock()
+_profiler = None
+_profiler_lock = threading.Lock()
+_sample_rate = 0.0
+_profiling = threading.local()
+
+
+def _result_size(result):
+    return len(result) if isinstance(result, (list, dict, tuple, str)) else None
+
+
+def _call(stats, function, args, kwargs):
+    if _profiler is not None and not getattr(_profiling, "active", False) and random.random() < _sample_rate:
+        return _profiled_call(stats, function, args, kwargs)
+    start = time.perf_counter()
+    try:
+        result = function(*args, **kwargs)
+    except BaseException:
+        stats.record(time.perf_counter() - start, None, True)
+        raise
+    if isinstance(result, types.GeneratorType):
+        return _timed_generator(stats, result, start)
+    stats.record(time.perf_counter() - start, _result_size(result), False)
+    return result
+
+
+def _timed_generator(stats, generator, start):
+    failed = True
+    yielded = 0
+    try:
+        for item in generator:
+            yielded += 1
+            yield item
+        failed = False
+    finally:
+        stats.record(time.perf_counter() - start, yielded, failed)
+
+
+def _profiled_call(stats, function, args, kwargs):
+    profiler = _profiler
+    # A Profile can only be active on one thread at a time; other threads skip the sample.
+    if profiler is None or not _profiler_lock.acquire(blocking=False):
+        _profiling.active = True
+        try:
+            return _call(stats, function, args, kwargs)
+        finally:
+            _profiling.active = False
+    _profiling.active = True
+    try:
+        profiler.enable()
+        try:
+            return _call(stats, function, args, kwargs)
+        finally:
+            profiler.disable()
+    finally:
+        _profiling.active = False
+        _profiler_lock.release()
+
+
+def _wrap(name, function):
+    stats = _metrics.setdefault(name, MethodStats())
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        return _call(stats, function, args, kwargs)
+    return wrapper
+
+
+def is_enabled():
+    return bool(_originals)
+
+
+def enable(classes=INSTRUMENTED_CLASSES):
+    """Install timing wrappers on every public method of classes; calling it twice is harmless."""
+    with _state_lock:
+        for cls in classes:
+            for name, function in list(vars(cls).items()):
+                if name.startswith("_") or name in SKIPPED or not inspect.isfunction(function):
+                    continue
+                if (cls, name) in _originals:
+                    continue
+                _originals[(cls, name)] = function
+                setattr(cls, name, _wrap(f"{cls.__name__}.{name}", function))
+
+
+def disable():
+    """Restore the original methods; recorded metrics are kept until reset()."""
+    with _state_lock:
+        for (cls, name), function in _originals.items():
+            setattr(cls, name, function)
+        _originals.clear()
+
+
+def reset():
+    with _state_lock:
+        _metrics.clear()
+        for (cls, name), function in _originals.items():
+            setattr(cls, name, _wrap(f"{cls.__name__}.{name}", function))
+
+
+def start_profiling(sample_rate=0.01):
+    """Profile roughly sample_rate of instrumented calls until stop_profiling()."""
+    global _profiler, _sample_rate
+    if not 0 < sample_rate <= 1:
+        raise ValueError("Sample rate must be in (0, 1].")
+    _sample_rate = sample_rate
+    _profiler = cProfile.Profile()
+
+
+def stop_profiling():
+    """Stop sampling and return the collected pstats.Stats, or None if nothing was sampled."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is None:
+        return None
+    # Wait for a sample that is still running on another thread.
+    with _profiler_lock:
+        pass
+    try:
+        return pstats.Stats(profiler)
+    except TypeError:
+        return None
+
+
+def export():
+    """Return {"Class.method": MethodStats.state()} for every called method, to merge into another snapshot()."""
+    return {name: stats.state() for name, stats in sorted(_metrics.items()) if stats.calls}
+
+
+def snapshot(others=()):
+    """Return {"Class.method": metrics} for every method called while instrumented.
+
+    others are export() results from other processes; their calls are added
+    to this process's before the percentiles are estimated.
+    """
+    metrics = _metrics
+    if others:
+        metrics = {}
+        for exported in (export(), *others):
+            for name, state in exported.items():
+                metrics.setdefault(name, MethodStats()).merge(state)
+    result = {}
+    for name, stats in sorted(metrics.items()):
+        with stats.lock:
+            if not stats.calls:
+                continue
+            latency = stats.latency
+            result[name] = {
+                "calls": stats.calls,
+                "errors": stats.errors,
+                "total_seconds": latency.total,
+                "max_seconds": latency.maximum,
+                "p50_seconds": latency.percentile(0.50),
+                "p95_seconds": latency.percentile(0.95),
+                "p99_seconds": latency.percentile(0.99),
+                "mean_result_size": stats.result_items / stats.sized_results if stats.sized_results else None,
+                "max_result_size": stats.largest_result if stats.sized_results else None,
+            }
+    return result
+
+
+def _labels(name):
+    return 'method="' + name.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def prometheus_text(prefix="ecommerce"):
+    """Render the metrics in the Prometheus text exposition format."""
+    lines = [f"# HELP {prefix}_call_seconds Latency of instrumented ECommerce, Order and Customer methods.",
+             f"# TYPE {prefix}_call_seconds histogram"]
+    errors = [f"# HELP {prefix}_call_errors_total Calls that raised an exception.",
+              f"# TYPE {prefix}_call_errors_total counter"]
+    sizes = [f"# HELP {prefix}_result_size Items in list, dict, tuple and str results, or yielded by generators.",
+             f"# TYPE {prefix}_result_size summary"]
+    for name, stats in sorted(_metrics.items()):
+        with stats.lock:
+            if not stats.calls:
+                continue
+            labels = _labels(name)
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS, stats.latency.counts):
+                cumulative += bucket_count
+                lines.append(f'{prefix}_call_seconds_bucket{{{labels},le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'{prefix}_call_seconds_bucket{{{labels},le="+Inf"}} {stats.calls}')
+            lines.append(f"{prefix}_call_seconds_sum{{{labels}}} {stats.latency.total:.9g}")
+            lines.append(f"{prefix}_call_seconds_count{{{labels}}} {stats.calls}")
+            errors.append(f"{prefix}_call_errors_total{{{labels}}} {stats.errors}")
+            if stats.sized_results:
+                sizes.append(f"{prefix}_result_size_sum{{{labels}}} {stats.result_items}")
+                sizes.append(f"{prefix}_result_size_count{{{labels}}} {stats.sized_results}")
+    return "\n".join(lines + errors + sizes) + "\n"
@@ -0,0 +1,58 @@
+"""Money as integer cents.
+
+Prices, order totals, customer spend and the sales rollups are all held in
+whole cents, so sums are exact and associative. Partial totals from
+partitions, worker processes or integer arrays add up to the same figure
+in any order. Dollars appear only at the edges: amounts passed to the
+public API go through to_cents(), and amounts handed back or rendered in
+reports go through to_dollars() or format_cents().
+"""
+
+# Below this many cents the float nearest to a dollar amount is well within half a cent of it.
+FLOAT_EXACT_CENTS = 10 ** 15
+
+
+def to_cents(amount):
+    """Dollars (an int, float or Decimal) to the nearest whole cent."""
+    return round(amount * 100)
+
+
+def to_dollars(cents):
+    """Cents to dollars: an int for whole dollars, otherwise the nearest float, e.g. 1750 -> 17.5."""
+    return cents // 100 if cents % 100 == 0 else cents / 100
+
+
+def format_cents(cents):
+    """Render cents with exactly two decimals, e.g. 123405 -> "1234.05"."""
+    if -FLOAT_EXACT_CENTS < cents < FLOAT_EXACT_CENTS:
+        # Float formatting is exact in this range and about twice as fast.
+        return f"{cents / 100:.2f}"
+    whole, part = divmod(abs(cents), 100)
+    return f"{'-' if cents < 0 else ''}{whole}.{part:02d}"
+
+
+def percent_off(cents, percentage):
+    """cents less percentage percent, rounded half to even to a whole cent."""
+    return round(cents * (100 - percentage) / 100)
+
+
+def split_cents(total, weights):
+    """Split total cents across {key: weight} in proportion to weight.
+
+    Shares are whole cents summing exactly to total. Leftover cents go to
+    the largest remainders, ties to the smallest key, so the split depends
+    only on its inputs and not on their order.
+    """
+    gross = sum(weights.values())
+    if gross == total:
+        return dict(weights)
+    if not gross:
+        return dict.fromkeys(weights, 0)
+    shares = {}
+    remainders = []
+    for key, weight in weights.items():
+        shares[key], remainder = divmod(total * weight, gross)
+        remainders.append((-remainder, key))
+    for _, key in sorted(remainders)[:total - sum(shares.values())]:
+        shares[key] += 1
+    return shares
@@ -0,0 +1,411 @@
+"""Durable ECommerce state: an append-only journal plus periodic snapshots.
+
+A data directory holds gzip-compressed JSON snapshots named
+``snapshot-<seq>.json.gz`` and journal segments named ``journal-<seq>.log``.
+Each journal line is ``[seq, operation, args]``. Recovery loads the newest
+snapshot, then replays only the journal records numbered after it.
+"""
+import contextlib
+import datetime
+import gzip
+import json
+import os
+import threading
+
+from ecommerce.ecommerce import Customer, ECommerce, LineItem, Order, _to_date
+from ecommerce.money import to_cents
+
+SNAPSHOT_PREFIX = "snapshot-"
+SNAPSHOT_SUFFIX = ".json.gz"
+JOURNAL_PREFIX = "journal-"
+JOURNAL_SUFFIX = ".log"
+
+
+def dump_state(ecommerce):
+    """Return the full state of ecommerce as JSON-serializable lists, with money in dollars as the API takes it."""
+    return {
+        "products": [[p.product_id, p.name, p.price, p.stock, p.category, p.is_featured, p.original_price]
+                     for p in ecommerce.products],
+        # Spend and purchased products also count orders moved to the archive, which are not listed here.
+        "customers": [[c.customer_id, c.name, c.email, c.phone_number, c.is_active, c.get_total_spent(),
+                       c._purchased_products] for c in ecommerce.customers],
+        "orders": [[o.order_id, o.customer.customer_id, o.order_date.isoformat(), o.total_cost, o.gift_message,
+                    [[item.product.product_id, item.quantity, item.price] for item in o.items]]
+                   for o in ecommerce.orders],
+    }
+
+
+def load_state(ecommerce, state):
+    """Load a dump_state() result into an empty ecommerce without touching stock."""
+    ecommerce._detach_indexes()
+    for product_id, name, price, stock, category, is_featured, original_price in state["products"]:
+        product = ecommerce._new_product(product_id, name, price, stock, category)
+        product.is_featured = is_featured
+        product.original_price = original_price
+        ecommerce.products.add(product)
+    for customer_id, name, email, phone_number, is_active, _, _ in state["customers"]:
+        customer = Customer(customer_id, name, email, phone_number)
+        customer.is_active = is_active
+        ecommerce.customers.add(customer)
+    for order_id, customer_id, order_date, total_cost, gift_message, items in state["orders"]:
+        customer = ecommerce.customers.get(customer_id)
+        order = Order(order_id, customer, datetime.date.fromisoformat(order_date))
+        order.items.extend(LineItem(ecommerce.products.get(product_id), quantity,
+                                    None if price is None else to_cents(price))
+                           for product_id, quantity, price in items)
+        order.total_cost = total_cost
+        order.gift_message = gift_message
+        customer.add_purchase(order)
+        ecommerce.orders.add(order)
+    for customer_id, *_, spent, purchased_products in state["customers"]:
+        customer = ecommerce.customers.get(customer_id)
+        customer._spent_cents = to_cents(spent)
+        customer._purchased_products = purchased_products
+    ecommerce._rebuild_indexes()
+
+
+def _sequence(filename, prefix, suffix):
+    if filename.startswith(prefix) and filename.endswith(suffix):
+        number = filename[len(prefix):-len(suffix)]
+        if number.isdigit():
+            return int(number)
+    return None
+
+
+def _fsync_directory(path):
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class Journal:
+    """Append-only journal segment with group commit.
+
+    Records are buffered and written out and fsynced in groups: once
+    batch_size records are pending, or within flush_interval seconds,
+    whichever comes first. A burst of orders therefore pays for one write and
+    one fsync per batch rather than one per order, and a crash loses at most
+    the records of the last flush_interval.
+    """
+
+    def __init__(self, path, batch_size=256, flush_interval=0.05):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._file = open(path, "ab")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stopped = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
+
+    def append(self, seq, operation, args):
+        line = json.dumps([seq, operation, args], separators=(",", ":")).encode("utf-8") + b"\n"
+        with self._lock:
+            self._file.write(line)
+            self._pending += 1
+            if self._pending >= self.batch_size:
+                self._sync_locked()
+
+    def sync(self):
+        with self._lock:
+            self._sync_locked()
+
+    def _sync_locked(self):
+        if self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+
+    def _flush_periodically(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.sync()
+
+    def close(self):
+        self._stopped.set()
+        self._flusher.join()
+        with self._lock:
+            self._sync_locked()
+            self._file.close()
+
+    @staticmethod
+    def read(path):
+        """Yield (seq, operation, args) records; a torn final line is ignored."""
+        with open(path, "rb") as handle:
+            lines = handle.read().split(b"\n")
+        if lines and not lines[-1]:
+            lines.pop()
+        for number, line in enumerate(lines, 1):
+            try:
+                seq, operation, args = json.loads(line)
+            except ValueError:
+                if number == len(lines):
+                    return
+                raise ValueError(f"Corrupt journal record at {path}:{number}.") from None
+            yield seq, operation, args
+
+
+class _MutationGate:
+    """Lets place_order calls run together while every other mutation runs alone.
+
+    Concurrent orders only take stock and add new orders, so they replay
+    correctly in whatever order they reach the journal. Restocks,
+    cancellations, discounts and snapshots wait for the orders in flight to
+    finish, and new orders wait behind them.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._shared = 0
+        self._exclusive = False
+        self._waiting = 0
+
+    @contextlib.contextmanager
+    def shared(self):
+        with self._condition:
+            while self._exclusive or self._waiting:
+                self._condition.wait()
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._shared -= 1
+                if not self._shared:
+                    self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        with self._condition:
+            self._waiting += 1
+            while self._exclusive or self._shared:
+                self._condition.wait()
+            self._waiting -= 1
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._exclusive = False
+                self._condition.notify_all()
+
+
+class DurableECommerce(ECommerce):
+    """ECommerce that journals every mutation and snapshots its state.
+
+    Mutations made through ECommerce methods are journaled. Orders are placed
+    and journaled concurrently, under the per-product stock locks only; every
+    other mutation runs alone (see _MutationGate), so replaying the journal
+    reproduces the same state. Changes made directly on entities, such as
+    Product.mark_as_featured rather than mark_product_featured, are captured
+    by the next snapshot only. archive_orders is journaled with its cutoff
+    once the archive holds the orders; replaying it drops them from memory
+    again without writing them a second time. A snapshot is written every
+    snapshot_every journaled mutations and after each bulk import, so recovery
+    replays at most that many records.
+    """
+
+    JOURNALED = ("add_product", "add_customer", "restock_product", "mark_product_featured",
+                 "apply_discount_to_category", "update_customer_email", "update_customer_phone",
+                 "deactivate_customer", "place_order", "cancel_order", "apply_order_discount", "archive_orders")
+
+    def __init__(self, data_dir, snapshot_every=10000, batch_size=256, flush_interval=0.05, **kwargs):
+        super().__init__(**kwargs)
+        self.data_dir = data_dir
+        self.snapshot_every = snapshot_every
+        self._journal_options = {"batch_size": batch_size, "flush_interval": flush_interval}
+        self._seq = 0
+        self._since_snapshot = 0
+        self._gate = _MutationGate()
+        # Numbers and appends journal records; held only for the append itself.
+        self._record_lock = threading.Lock()
+        os.makedirs(data_dir, exist_ok=True)
+        self._recover()
+        self._journal = self._open_segment()
+
+    def _files(self, prefix, suffix):
+        found = []
+        for filename in os.listdir(self.data_dir):
+            seq = _sequence(filename, prefix, suffix)
+            if seq is not None:
+                found.append((seq, os.path.join(self.data_dir, filename)))
+        return sorted(found)
+
+    def _recover(self):
+        snapshots = self._files(SNAPSHOT_PREFIX, SNAPSHOT_SUFFIX)
+        if snapshots:
+            self._seq, path = snapshots[-1]
+            with gzip.open(path, "rt", encoding="utf-8") as handle:
+                load_state(self, json.load(handle))
+        for _, path in self._files(JOURNAL_PREFIX, JOURNAL_SUFFIX):
+            for seq, operation, args in Journal.read(path):
+                if seq <= self._seq:
+                    continue
+                if operation not in self.JOURNALED:
+                    raise ValueError(f"Unknown journal operation '{operation}'.")
+                if operation == "archive_orders":
+                    self._replay_archive_orders(*args)
+                else:
+                    getattr(ECommerce, operation)(self, *args)
+                self._seq = seq
+                self._since_snapshot += 1
+
+    def _replay_archive_orders(self, before):
+        if self.archive is None:
+            raise ValueError("No order archive configured.")
+        before = datetime.date.fromisoformat(before)
+        # The archive already holds these orders and counts them in its totals.
+        self._drop_archived(list(self._orders_by_date.between(datetime.date.min, before - datetime.timedelta(days=1))),
+                            counted=True)
+
+    def _open_segment(self):
+        path = os.path.join(self.data_dir, f"{JOURNAL_PREFIX}{self._seq + 1:012d}{JOURNAL_SUFFIX}")
+        if os.path.exists(path):
+            # Only a torn first record can be left under this name; drop it.
+            os.truncate(path, 0)
+        return Journal(path, **self._journal_options)
+
+    def _record(self, operation, *args):
+        with self._record_lock:
+            self._seq += 1
+            self._journal.append(self._seq, operation, list(args))
+            self._since_snapshot += 1
+
+    def _snapshot_due(self):
+        return self.snapshot_every and self._since_snapshot >= self.snapshot_every
+
+    @contextlib.contextmanager
+    def _mutation(self, shared=False):
+        with self._gate.shared() if shared else self._gate.exclusive():
+            yield
+        if self._snapshot_due():
+            with self._gate.exclusive():
+                # Another mutation may have written one while this one waited.
+                if self._snapshot_due():
+                    self._write_snapshot()
+
+    def snapshot(self):
+        """Write a snapshot of the current state and drop the journal it supersedes."""
+        with self._gate.exclusive():
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        with self._lock:
+            self._journal.close()
+            path = os.path.join(self.data_dir, f"{SNAPSHOT_PREFIX}{self._seq:012d}{SNAPSHOT_SUFFIX}")
+            temporary = path + ".tmp"
+            with open(temporary, "wb") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as handle:
+                    handle.write(json.dumps(dump_state(self), separators=(",", ":")).encode("utf-8"))
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.replace(temporary, path)
+            _fsync_directory(self.data_dir)
+            for seq, old in self._files(SNAPSHOT_PREFIX, SNAPSHOT_SUFFIX):
+                if seq < self._seq:
+                    os.remove(old)
+            for _, old in self._files(JOURNAL_PREFIX, JOURNAL_SUFFIX):
+                os.remove(old)
+            self._since_snapshot = 0
+            self._journal = self._open_segment()
+
+    def sync(self):
+        """Force pending journal records to disk."""
+        self._journal.sync()
+
+    def close(self):
+        self._journal.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _bulk_import(self, rows, batch_size, insert_batch):
+        with self._gate.exclusive():
+            try:
+                return super()._bulk_import(rows, batch_size, insert_batch)
+            finally:
+                self._write_snapshot()
+
+    def add_product(self, product_id, name, price, stock, category):
+        with self._mutation():
+            super().add_product(product_id, name, price, stock, category)
+            self._record("add_product", product_id, name, price, stock, category)
+
+    def add_customer(self, customer_id, name, email, phone_number):
+        with self._mutation():
+            super().add_customer(customer_id, name, email, phone_number)
+            self._record("add_customer", customer_id, name, email, phone_number)
+
+    def restock_product(self, product_id, quantity):
+        with self._mutation():
+            result = super().restock_product(product_id, quantity)
+            self._record("restock_product", product_id, quantity)
+            return result
+
+    def mark_product_featured(self, product_id):
+        with self._mutation():
+            result = super().mark_product_featured(product_id)
+            self._record("mark_product_featured", product_id)
+            return result
+
+    def apply_discount_to_category(self, category, percentage):
+        with self._mutation():
+            result = super().apply_discount_to_category(category, percentage)
+            self._record("apply_discount_to_category", category, percentage)
+            return result
+
+    def update_customer_email(self, customer_id, new_email):
+        with self._mutation():
+            result = super().update_customer_email(customer_id, new_email)
+            self._record("update_customer_email", customer_id, new_email)
+            return result
+
+    def update_customer_phone(self, customer_id, new_phone):
+        with self._mutation():
+            result = super().update_customer_phone(customer_id, new_phone)
+            self._record("update_customer_phone", customer_id, new_phone)
+            return result
+
+    def deactivate_customer(self, customer_id):
+        with self._mutation():
+            result = super().deactivate_customer(customer_id)
+            self._record("deactivate_customer", customer_id)
+            return result
+
+    def place_order(self, order_id, customer_id, items, order_date=None):
+        with self._mutation(shared=True):
+            # Pin the date so replaying on a later day reproduces the same order.
+            order_date = datetime.date.today() if order_date is None else order_date
+            super().place_order(order_id, customer_id, items, order_date)
+            order_date = self.orders.get(order_id).order_date.isoformat()
+            self._record("place_order", order_id, customer_id, items, order_date)
+
+    def cancel_order(self, order_id):
+        with self._mutation():
+            result = super().cancel_order(order_id)
+            self._record("cancel_order", order_id)
+            return result
+
+    def apply_order_discount(self, order_id, percentage):
+        with self._mutation():
+            result = super().apply_order_discount(order_id, percentage)
+            self._record("apply_order_discount", order_id, percentage)
+            return result
+
+    def archive_orders(self, before=None):
+        with self._mutation():
+            # Pin the cutoff so replaying on a later day drops the same orders.
+            if before is None and self.archive is not None:
+                before = self.archive.cutoff()
+            moved = super().archive_orders(before)
+            if moved:
+                self._record("archive_orders", _to_date(before).isoformat())
+                # Replaying the orders without this record would put them in memory and the archive both.
+                self._journal.sync()
+            return moved
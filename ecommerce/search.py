@@ -0,0 +1,194 @@
+"""Type-ahead search over entity text fields.
+
+A SearchIndex maps entity keys to one or more text fields, e.g. a customer's
+name and email, and answers a query with the best matching entities:
+
+* Prefix matches come first. A field matches when one of its words starts
+  with the query; a word is a run of letters and digits, so "smi",
+  "john sm" and "example" all match "John Smith <john.smith@example.com>".
+  These are found in a SortedKeys of every word-start suffix of every field,
+  by bisecting to the query and reading forward; each suffix keeps its
+  entity keys sorted, so only about `limit` keys are read.
+* Substring matches fill any remaining places. Each field's character
+  trigrams map to posting lists; a query is checked against the fields in
+  the shortest posting list among its own trigrams. Queries shorter than
+  three characters only match at word starts.
+
+match_rank() defines the order, so stores that search without an index
+(e.g. SQLiteECommerce) or merge several indexes (ShardedECommerce) return
+the same results. Matching ignores case.
+"""
+import bisect
+import heapq
+import re
+
+from ecommerce.indexes import SortedKeys
+
+GRAM = 3
+# A letter or digit (a word character other than "_") not preceded by one.
+WORD_START = re.compile(r"(?<![^\W_])[^\W_]")
+
+
+def _word_starts(text):
+    return [match.start() for match in WORD_START.finditer(text)]
+
+
+def _grams(text):
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+def normalize(query):
+    return query.strip().casefold()
+
+
+def match_rank(query, texts):
+    """Sort key of the best match of a normalized query in texts, or None if none match.
+
+    Prefix matches rank (0, matched suffix) and substring matches (1, text),
+    so results are ordered alphabetically from where the query matched.
+    """
+    best = None
+    for text in texts:
+        text = text.casefold()
+        ranks = [(0, text[start:]) for start in _word_starts(text) if text.startswith(query, start)]
+        if not ranks and len(query) >= GRAM and query in text:
+            ranks = [(1, text)]
+        for rank in ranks:
+            best = rank if best is None else min(best, rank)
+    return best
+
+
+class SearchIndex:
+    """Prefix and substring search over the text fields of keyed entities."""
+
+    def __init__(self):
+        # key -> (item, normalized texts)
+        self._entries = {}
+        # word-start suffix -> sorted keys with a field ending in it, so ties cost nothing to order.
+        # Shared tails such as "example.com" collect many keys; past SortedKeys.CHUNK they move to a SortedKeys.
+        self._suffixes = SortedKeys()
+        self._keys_by_suffix = {}
+        # Each distinct normalized text gets an id; ids are never reused for another text.
+        self._text_ids = {}
+        self._texts = []
+        self._keys_by_text = []
+        # trigram -> ids of texts containing it, in id order. Unused texts stay listed and are skipped.
+        self._postings = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def _add(self, key, item, texts, new_suffixes, touched):
+        texts = tuple(dict.fromkeys(text.casefold() for text in texts))
+        suffixes = set()
+        for text in texts:
+            text_id = self._text_ids.get(text)
+            if text_id is None:
+                text_id = self._text_ids[text] = len(self._texts)
+                self._texts.append(text)
+                self._keys_by_text.append({})
+                for gram in _grams(text):
+                    self._postings.setdefault(gram, []).append(text_id)
+            self._keys_by_text[text_id][key] = item
+            suffixes.update(text[start:] for start in _word_starts(text))
+        for suffix in suffixes:
+            keys = self._keys_by_suffix.get(suffix)
+            if keys is None:
+                keys = self._keys_by_suffix[suffix] = []
+                new_suffixes.append(suffix)
+            if type(keys) is not list:
+                keys.add(key)
+            elif touched is not None:
+                keys.append(key)
+                touched.add(suffix)
+            else:
+                bisect.insort(keys, key)
+                if len(keys) > SortedKeys.CHUNK:
+                    self._keys_by_suffix[suffix] = SortedKeys()
+                    self._keys_by_suffix[suffix].update(keys)
+        self._entries[key] = (item, texts)
+
+    def add(self, key, item, *texts):
+        """Index item under key by texts, replacing whatever key was indexed by before."""
+        if key in self._entries:
+            self.remove(key)
+        new_suffixes = []
+        self._add(key, item, texts, new_suffixes, None)
+        for suffix in new_suffixes:
+            self._suffixes.add(suffix)
+
+    def update(self, entries):
+        """Index many (key, item, texts) entries, sorting each part of the prefix index once."""
+        new_suffixes = []
+        touched = set()
+
+        def flush():
+            for suffix in touched:
+                keys = self._keys_by_suffix[suffix]
+                keys.sort()
+                if len(keys) > SortedKeys.CHUNK:
+                    self._keys_by_suffix[suffix] = SortedKeys()
+                    self._keys_by_suffix[suffix].update(keys)
+            touched.clear()
+            self._suffixes.update(new_suffixes)
+            new_suffixes.clear()
+
+        for key, item, texts in entries:
+            if key in self._entries:
+                # Removing needs the prefix index in order.
+                flush()
+                self.remove(key)
+            self._add(key, item, texts, new_suffixes, touched)
+        flush()
+
+    def remove(self, key):
+        _, texts = self._entries.pop(key)
+        suffixes = set()
+        for text in texts:
+            del self._keys_by_text[self._text_ids[text]][key]
+            suffixes.update(text[start:] for start in _word_starts(text))
+        for suffix in suffixes:
+            keys = self._keys_by_suffix[suffix]
+            if type(keys) is list:
+                del keys[bisect.bisect_left(keys, key)]
+            else:
+                keys.remove(key)
+            if not keys:
+                del self._keys_by_suffix[suffix]
+                self._suffixes.remove(suffix)
+
+    def clear(self):
+        self.__init__()
+
+    def search(self, query, limit=10):
+        """Return up to limit (rank, key, item) triples, best match first; see match_rank for the order."""
+        query = normalize(query)
+        if not query or limit < 1:
+            return []
+        results = []
+        seen = set()
+        for suffix in self._suffixes.irange(query):
+            if not suffix.startswith(query) or len(results) == limit:
+                break
+            for key in self._keys_by_suffix[suffix]:
+                if key not in seen:
+                    seen.add(key)
+                    results.append(((0, suffix), key, self._entries[key][0]))
+                    if len(results) == limit:
+                        break
+        if len(results) == limit or len(query) < GRAM:
+            return results
+        # Every prefix match is in results, so anything else that matches is a substring match.
+        postings = min((self._postings.get(gram, ()) for gram in _grams(query)), key=len)
+        texts = self._texts
+        substrings = {}
+        for text_id in [text_id for text_id in postings if query in texts[text_id]]:
+            text = texts[text_id]
+            for key, item in self._keys_by_text[text_id].items():
+                if key not in seen:
+                    match = ((1, text), key, item)
+                    substrings[key] = min(substrings.get(key, match), match, key=lambda match: match[:2])
+        return results + heapq.nsmallest(limit - len(results), substrings.values(), key=lambda match: match[:2])
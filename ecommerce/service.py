@@ -0,0 +1,346 @@
+"""Asyncio HTTP/JSON front end for ECommerce.
+
+Endpoints::
+
+    GET    /products[?category=...|?q=...&limit=N]      POST /products
+    GET    /products/<id>                               POST /products/<id>/restock
+    GET    /customers[?loyalty=...|?q=...&limit=N]      POST /customers
+    GET    /customers/<id>
+    GET    /orders                       POST /orders
+    GET    /orders/<id>                  DELETE /orders/<id>
+    GET    /reports/sales[?start=&end=&granularity=day|week|month]
+           /reports/top-products[?k=N] | /reports/customer-spending
+           /reports/inventory-value | /reports/out-of-stock
+
+Connections are kept alive between requests (HTTP/1.1). Reads run in worker
+threads so a slow report does not stall the event loop. Order placements are
+queued and applied in micro-batches: one thread hop for many orders. The
+number of open connections, in-flight requests and queued orders are all
+bounded. When a limit is hit, clients get 503 instead of unbounded queueing.
+"""
+import asyncio
+import json
+import urllib.parse
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           408: "Request Timeout", 413: "Payload Too Large", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+MAX_BODY = 1 << 20
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def product_to_dict(product):
+    return {"product_id": product.product_id, "name": product.name, "price": product.price,
+            "stock": product.stock, "category": product.category}
+
+
+def customer_to_dict(customer):
+    return {"customer_id": customer.customer_id, "name": customer.name, "email": customer.email,
+            "phone_number": customer.phone_number, "total_spent": customer.get_total_spent(),
+            "loyalty": customer.get_loyalty_status()}
+
+
+def order_to_dict(order):
+    return {"order_id": order.order_id, "customer_id": order.customer.customer_id,
+            "order_date": order.order_date.isoformat(), "total_cost": order.total_cost,
+            "items": [{"product_id": item.product.product_id, "quantity": item.quantity} for item in order.items]}
+
+
+def _limit(query, name, default):
+    try:
+        return int(query.get(name, default))
+    except ValueError:
+        return default
+
+
+def _as_list(result):
+    # ECommerce queries return a message string instead of an empty list.
+    return result if isinstance(result, list) else []
+
+
+class OrderBatcher:
+    """Coalesces concurrent order placements into micro-batches."""
+
+    def __init__(self, ecommerce, max_batch=64, max_delay=0.002, max_pending=1024):
+        self.ecommerce = ecommerce
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = asyncio.Queue(max_pending)
+
+    def submit(self, payload):
+        """Queue an order and return a future for its (status, body); raises asyncio.QueueFull."""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((payload, future))
+        return future
+
+    def _drain(self, batch):
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+
+    async def run(self):
+        while True:
+            batch = [await self._queue.get()]
+            self._drain(batch)
+            if len(batch) < self.max_batch and self.max_delay:
+                await asyncio.sleep(self.max_delay)
+                self._drain(batch)
+            try:
+                results = await asyncio.to_thread(self._place_all, [payload for payload, _ in batch])
+            except Exception as e:
+                results = [(500, {"error": f"{type(e).__name__}: {e}"})] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _place_all(self, payloads):
+        results = []
+        for payload in payloads:
+            try:
+                results.append(self._place(payload))
+            except Exception as e:
+                # Earlier orders in the batch may already be placed, so only this one fails.
+                results.append((500, {"error": f"{type(e).__name__}: {e}"}))
+        return results
+
+    def _place(self, payload):
+        try:
+            items = payload["items"]
+            if not isinstance(items, dict) or not all(type(quantity) is int and quantity >= 1
+                                                      for quantity in items.values()):
+                raise TypeError("'items' must map product IDs to positive integer quantities")
+            self.ecommerce.place_order(payload["order_id"], payload["customer_id"], items, payload.get("order_date"))
+        except (KeyError, TypeError) as e:
+            return 400, {"error": f"Missing or invalid field: {e}"}
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        return 201, order_to_dict(self.ecommerce.orders.get(payload["order_id"]))
+
+
+class ECommerceService:
+    """HTTP/JSON server exposing an ECommerce instance."""
+
+    def __init__(self, ecommerce, host="127.0.0.1", port=8080, max_connections=1024, max_inflight=256,
+                 keepalive_timeout=15.0, order_batch_size=64, order_batch_delay=0.002, max_pending_orders=1024):
+        self.ecommerce = ecommerce
+        self.host = host
+        self.port = port
+        self.max_connections = max_connections
+        self.keepalive_timeout = keepalive_timeout
+        self._inflight = asyncio.Semaphore(max_inflight)
+        self._connections = 0
+        self._batcher = OrderBatcher(ecommerce, order_batch_size, order_batch_delay, max_pending_orders)
+        self._server = None
+        self._batcher_task = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._batcher_task = asyncio.create_task(self._batcher.run())
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        self._batcher_task.cancel()
+        try:
+            await self._batcher_task
+        except asyncio.CancelledError:
+            pass
+
+    # Connection handling
+    async def _handle_connection(self, reader, writer):
+        if self._connections >= self.max_connections:
+            await self._respond(writer, 503, {"error": "Too many connections."}, keep_alive=False)
+            writer.close()
+            return
+        self._connections += 1
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.keepalive_timeout)
+                except asyncio.TimeoutError:
+                    break
+                except HTTPError as e:
+                    await self._respond(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                async with self._inflight:
+                    try:
+                        status, payload = await self._dispatch(method, target, body)
+                    except Exception as e:
+                        status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                await self._respond(writer, status, payload, keep_alive)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections -= 1
+            writer.close()
+
+    async def _read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line.") from None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length.") from None
+        if length > MAX_BODY:
+            raise HTTPError(413, "Request body too large.")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, headers, body
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n")
+        if status == 503:
+            head += "Retry-After: 1\r\n"
+        writer.write(head.encode("latin-1") + b"\r\n" + body)
+        await writer.drain()
+
+    # Routing
+    async def _dispatch(self, method, target, body):
+        url = urllib.parse.urlsplit(target)
+        parts = [urllib.parse.unquote(part) for part in url.path.strip("/").split("/") if part]
+        query = dict(urllib.parse.parse_qsl(url.query))
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            return 400, {"error": "Request body is not valid JSON."}
+
+        if method == "POST" and parts == ["orders"]:
+            try:
+                future = self._batcher.submit(data)
+            except asyncio.QueueFull:
+                return 503, {"error": "Order queue is full."}
+            return await future
+        if method == "GET":
+            handler = self._read_handler(parts, query)
+            if handler is None:
+                return 404, {"error": "Not found."}
+            return await asyncio.to_thread(handler)
+        if method in ("POST", "DELETE"):
+            try:
+                return await asyncio.to_thread(self._write, method, parts, data)
+            except (KeyError, TypeError) as e:
+                return 400, {"error": f"Missing or invalid field: {e}"}
+            except ValueError as e:
+                return 400, {"error": str(e)}
+        return 405, {"error": f"Method {method} not allowed."}
+
+    def _read_handler(self, parts, query):
+        ecommerce = self.ecommerce
+        match parts:
+            case ["products"]:
+                if "q" in query:
+                    return lambda: (200, [product_to_dict(p) for p in
+                                          ecommerce.search_products(query["q"], _limit(query, "limit", 10))])
+                if "category" in query:
+                    return lambda: (200, [product_to_dict(p) for p in
+                                          _as_list(ecommerce.search_products_by_category(query["category"]))])
+                return lambda: (200, [product_to_dict(p) for p in ecommerce.products])
+            case ["products", product_id]:
+                return lambda: self._entity(ecommerce.products.get(product_id), product_to_dict, "Product")
+            case ["customers"]:
+                if "q" in query:
+                    return lambda: (200, [customer_to_dict(c) for c in
+                                          ecommerce.search_customers(query["q"], _limit(query, "limit", 10))])
+                if "loyalty" in query:
+                    return lambda: (200, [customer_to_dict(c)
+                                          for c in ecommerce.get_customers_by_loyalty(query["loyalty"])])
+                return lambda: (200, [customer_to_dict(c) for c in ecommerce.customers])
+            case ["customers", customer_id]:
+                return lambda: self._entity(ecommerce.customers.get(customer_id), customer_to_dict, "Customer")
+            case ["orders"]:
+                return lambda: (200, [order_to_dict(o) for o in ecommerce.orders])
+            case ["orders", order_id]:
+                return lambda: self._entity(ecommerce.orders.get(order_id), order_to_dict, "Order")
+            case ["reports", "sales"]:
+                if query.keys() & {"start", "end", "granularity"}:
+                    return lambda: self._sales_report(query)
+                return lambda: (200, {"report": ecommerce.generate_sales_report()})
+            case ["reports", "customer-spending"]:
+                return lambda: (200, {"report": ecommerce.generate_customer_spending_report()})
+            case ["reports", "inventory-value"]:
+                return lambda: (200, {"inventory_value": ecommerce.calculate_total_inventory_value()})
+            case ["reports", "out-of-stock"]:
+                return lambda: (200, [product_to_dict(p) for p in _as_list(ecommerce.list_out_of_stock_products())])
+            case ["reports", "top-products"]:
+                k = _limit(query, "k", 10)
+                return lambda: (200, [{"product": product_to_dict(p), "units_sold": units}
+                                      for p, units in ecommerce.top_selling_products(k)])
+        return None
+
+    def _sales_report(self, query):
+        try:
+            periods = self.ecommerce.sales_by_period(query.get("start"), query.get("end"),
+                                                     query.get("granularity", "day"))
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        return 200, [{"period": period.isoformat(), "revenue": revenue, "orders": orders, "units": units,
+                      "categories": categories} for period, revenue, orders, units, categories in periods]
+
+    @staticmethod
+    def _entity(entity, to_dict, label):
+        if entity is None:
+            return 404, {"error": f"{label} not found."}
+        return 200, to_dict(entity)
+
+    def _write(self, method, parts, data):
+        ecommerce = self.ecommerce
+        match method, parts:
+            case "POST", ["products"]:
+                ecommerce.add_product(data["product_id"], data["name"], float(data["price"]),
+                                      int(data["stock"]), data["category"])
+                return 201, product_to_dict(ecommerce.products.get(data["product_id"]))
+            case "POST", ["products", product_id, "restock"]:
+                if product_id not in ecommerce.products:
+                    return 404, {"error": "Product not found."}
+                return 200, {"message": ecommerce.restock_product(product_id, int(data["quantity"]))}
+            case "POST", ["customers"]:
+                ecommerce.add_customer(data["customer_id"], data["name"], data["email"], data["phone_number"])
+                return 201, customer_to_dict(ecommerce.customers.get(data["customer_id"]))
+            case "DELETE", ["orders", order_id]:
+                if order_id not in ecommerce.orders:
+                    return 404, {"error": "Order not found."}
+                return 200, {"message": ecommerce.cancel_order(order_id)}
+        return 404, {"error": "Not found."}
+
+
+async def serve(ecommerce, host="127.0.0.1", port=8080, **options):
+    service = await ECommerceService(ecommerce, host, port, **options).start()
+    print(f"Serving on http://{host}:{service.port}")
+    try:
+        await service.serve_forever()
+    finally:
+        await service.close()
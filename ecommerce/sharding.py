@@ -0,0 +1,594 @@
+"""ECommerce split across partitions, with a routing layer in front.
+
+Customers, and the orders they place, live in one of N partitions chosen by
+``crc32(customer_id) % N``. Products and their stock live in a single catalog
+store shared by every partition. Each partition holds a stockless replica of
+the catalog so that its orders can render product names and prices.
+
+An order first takes its stock from the catalog, all or nothing, and is then
+recorded in its customer's partition. If recording fails, the stock is given
+back. Queries keyed by a customer go to one partition. Queries that span
+customers are sent to every partition and their results are merged.
+
+With ``processes=True`` each partition runs in its own worker process and is
+driven over a pipe. Calls to all partitions are sent before any reply is
+read, so the partitions work in parallel.
+"""
+import heapq
+import itertools
+import multiprocessing
+import threading
+import types
+import zlib
+
+from ecommerce import importer
+from ecommerce.cache import combine_stats
+from ecommerce.ecommerce import Customer, ECommerce, _format_sales_report, _periods_in_dollars, _to_date
+from ecommerce.money import format_cents, to_dollars
+
+
+def _as_list(result):
+    # ECommerce queries return a message string instead of an empty list.
+    return result if isinstance(result, list) else []
+
+
+class OrderPartition(ECommerce):
+    """Customers and orders for one partition; stock is owned by the catalog."""
+
+    def _product_stock_changed(self, product):
+        # Replica stock is never read; stock-outs are tracked by the catalog.
+        return
+
+    def load_products(self, rows):
+        """Add catalog replicas for (product_id, name, price, category) rows."""
+        self._check_new_ids((row[0] for row in rows), self.products, "Product")
+        with self._lock:
+            for product_id, name, price, category in rows:
+                product = self._new_product(product_id, name, price, 0, category)
+                self.products.add(product)
+                self._index_product(product)
+
+    def check_new_customers(self, customer_ids):
+        self._check_new_ids(customer_ids, self.customers, "Customer")
+
+    def check_customers_exist(self, customer_ids):
+        for customer_id in customer_ids:
+            if customer_id not in self.customers:
+                raise ValueError(f"Customer {customer_id} not found.")
+
+    def record_order(self, order_id, customer_id, items, order_date=None):
+        """Add an order whose stock the catalog has already taken."""
+        customer = self.customers.get(customer_id)
+        if not customer:
+            raise ValueError("Customer not found.")
+        order = self._new_order(order_id, customer, self._resolve_items(items), order_date)
+        with self._lock:
+            if order_id in self.orders:
+                raise ValueError(f"Order {order_id} already exists.")
+            customer.add_purchase(order)
+            self.orders.add(order)
+            self._index_order(order)
+
+    def record_orders(self, batch):
+        """Bulk counterpart of record_order; indexes are rebuilt by the caller."""
+        for order_id, customer_id, items, order_date in batch:
+            customer = self.customers.get(customer_id)
+            order = self._new_order(order_id, customer, self._resolve_items(items), order_date)
+            customer.add_purchase(order)
+            self.orders.add(order)
+
+    def discard_orders(self, order_ids):
+        """Take back whichever of order_ids record_orders added; indexes are rebuilt by the caller."""
+        for order_id in order_ids:
+            order = self.orders.get(order_id)
+            if order is not None:
+                self.orders.remove(order_id)
+                order.customer.remove_purchase(order)
+
+    def remove_order(self, order_id):
+        """Remove an order and return its (product_id, quantity) lines for the catalog to restock."""
+        with self._lock:
+            order = self.orders.remove(order_id)
+            self._unindex_order(order)
+            order.customer.remove_purchase(order)
+        return [(item.product.product_id, item.quantity) for item in order.items]
+
+    def total_sales(self):
+        """All-time revenue of this partition, in cents."""
+        return self._sales_by_day.total
+
+    def period_totals(self, start_date, end_date, granularity):
+        """sales_by_period() with revenue in cents."""
+        return self._period_totals(start_date, end_date, granularity)
+
+    def product_units(self):
+        """Return {product_id: units sold} for this partition."""
+        return {product_id: self._product_sales.score(product_id) for product_id in self._product_sales.top()}
+
+    def spending(self):
+        """Return (name, total spent in cents) pairs, biggest spender first."""
+        return [(customer.name, customer._spent_cents)
+                for customer in map(self.customers.get, self._spend_ranking.top())]
+
+    def call_metrics(self):
+        """instrumentation.export() of the process this partition runs in."""
+        from ecommerce import instrumentation
+        return instrumentation.export()
+
+    def customer_matches(self, query, limit):
+        """Return this partition's best (rank, customer_id, customer) search matches, best first."""
+        with self._lock:
+            return self._customer_search.search(query, limit)
+
+
+def _invoke(store, method, args):
+    result = getattr(store, method)(*args)
+    # Generators cannot cross a pipe, so streamed results are materialized.
+    return list(result) if isinstance(result, types.GeneratorType) else result
+
+
+class _LocalPartition:
+    """Partition running in the calling process."""
+
+    def __init__(self):
+        self.store = OrderPartition()
+
+    def begin(self, method, args):
+        try:
+            result = _invoke(self.store, method, args)
+        except Exception as e:
+            error = e
+
+            def finish():
+                raise error
+            return finish
+        return lambda: result
+
+    def call(self, method, *args):
+        return _invoke(self.store, method, args)
+
+    def close(self):
+        pass
+
+
+def _serve_partition(connection):
+    store = OrderPartition()
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        method, args = request
+        try:
+            connection.send((True, _invoke(store, method, args)))
+        except Exception as e:
+            connection.send((False, e))
+    connection.close()
+
+
+class _ProcessPartition:
+    """Partition running in a worker process, driven over a pipe."""
+
+    def __init__(self, context):
+        self._connection, child = context.Pipe()
+        self._process = context.Process(target=_serve_partition, args=(child,), daemon=True)
+        self._process.start()
+        child.close()
+        # Held from sending a request until its reply is read.
+        self._lock = threading.Lock()
+
+    def begin(self, method, args):
+        self._lock.acquire()
+        try:
+            self._connection.send((method, args))
+        except BaseException:
+            self._lock.release()
+            raise
+
+        def finish():
+            try:
+                ok, value = self._connection.recv()
+            finally:
+                self._lock.release()
+            if not ok:
+                raise value
+            return value
+        return finish
+
+    def call(self, method, *args):
+        return self.begin(method, args)()
+
+    def close(self):
+        with self._lock:
+            self._connection.send(None)
+            self._connection.close()
+        self._process.join()
+
+
+class ShardedECommerce:
+    """ECommerce API over a shared catalog and N customer partitions."""
+
+    def __init__(self, partitions=4, processes=False, columnar=False):
+        """Set processes=True to run each partition in its own worker process."""
+        if partitions < 1:
+            raise ValueError("Partition count must be at least 1.")
+        self.catalog = ECommerce(columnar=columnar)
+        self.products = self.catalog.products
+        if processes:
+            context = multiprocessing.get_context()
+            self._partitions = [_ProcessPartition(context) for _ in range(partitions)]
+        else:
+            self._partitions = [_LocalPartition() for _ in range(partitions)]
+        # order_id -> partition index; also keeps order IDs unique across partitions.
+        self._order_partitions = {}
+        self._lock = threading.RLock()
+
+    def close(self):
+        for partition in self._partitions:
+            partition.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Routing
+    def _partition_index(self, customer_id):
+        return zlib.crc32(str(customer_id).encode("utf-8")) % len(self._partitions)
+
+    def _route(self, customer_id):
+        return self._partitions[self._partition_index(customer_id)]
+
+    def _gather(self, method, *args):
+        """Call method on every partition and return their results in partition order."""
+        return self._gather_each([(partition, args) for partition in self._partitions], method)
+
+    def _gather_each(self, calls, method):
+        pending = [partition.begin(method, args) for partition, args in calls]
+        results = []
+        error = None
+        for finish in pending:
+            # Every reply is read, even after a failure, so no pipe is left out of step.
+            try:
+                results.append(finish())
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+        return results
+
+    def _split(self, rows, customer_of):
+        """Group rows by partition; returns (partition, [rows]) pairs for non-empty groups."""
+        groups = {}
+        for row in rows:
+            groups.setdefault(self._partition_index(customer_of(row)), []).append(row)
+        return [(self._partitions[index], groups[index]) for index in sorted(groups)]
+
+    def _order_partition(self, order_id):
+        index = self._order_partitions.get(order_id)
+        if index is None:
+            raise ValueError("Order not found.")
+        return self._partitions[index]
+
+    # Product Management
+    def add_product(self, product_id, name, price, stock, category):
+        with self._lock:
+            self.catalog.add_product(product_id, name, price, stock, category)
+            self._gather("load_products", [(product_id, name, price, category)])
+
+    def list_products(self):
+        return self.catalog.list_products()
+
+    def restock_product(self, product_id, quantity):
+        return self.catalog.restock_product(product_id, quantity)
+
+    def mark_product_featured(self, product_id):
+        # Featured products are listed from the catalog, so the replicas are left as they are.
+        return self.catalog.mark_product_featured(product_id)
+
+    def search_products_by_category(self, category):
+        return self.catalog.search_products_by_category(category)
+
+    def apply_discount_to_category(self, category, percentage):
+        with self._lock:
+            result = self.catalog.apply_discount_to_category(category, percentage)
+            self._gather("apply_discount_to_category", category, percentage)
+        return result
+
+    def list_out_of_stock_products(self):
+        return self.catalog.list_out_of_stock_products()
+
+    def get_featured_products(self):
+        return self.catalog.get_featured_products()
+
+    def calculate_total_inventory_value(self):
+        return self.catalog.calculate_total_inventory_value()
+
+    def find_products_in_price_range(self, min_price, max_price):
+        return self.catalog.find_products_in_price_range(min_price, max_price)
+
+    def search_products(self, query, limit=10):
+        return self.catalog.search_products(query, limit)
+
+    # Customer Management
+    def add_customer(self, customer_id, name, email, phone_number):
+        self._route(customer_id).call("add_customer", customer_id, name, email, phone_number)
+
+    def list_customers(self):
+        return list(self.iter_customers())
+
+    def update_customer_email(self, customer_id, new_email):
+        return self._route(customer_id).call("update_customer_email", customer_id, new_email)
+
+    def update_customer_phone(self, customer_id, new_phone):
+        return self._route(customer_id).call("update_customer_phone", customer_id, new_phone)
+
+    def deactivate_customer(self, customer_id):
+        return self._route(customer_id).call("deactivate_customer", customer_id)
+
+    def search_customers(self, query, limit=10):
+        matches = heapq.merge(*self._gather("customer_matches", query, limit), key=lambda match: match[:2])
+        return [customer for _, _, customer in itertools.islice(matches, limit)]
+
+    def get_customers_by_loyalty(self, loyalty_level):
+        return list(itertools.chain.from_iterable(self._gather("get_customers_by_loyalty", loyalty_level)))
+
+    def find_customers_purchased_product(self, product_id):
+        return list(itertools.chain.from_iterable(self._gather("find_customers_purchased_product", product_id)))
+
+    def get_inactive_customers(self):
+        return list(itertools.chain.from_iterable(self._gather("get_inactive_customers")))
+
+    # Order Management
+    def place_order(self, order_id, customer_id, items, order_date=None):
+        index = self._partition_index(customer_id)
+        with self._lock:
+            if order_id in self._order_partitions:
+                raise ValueError(f"Order {order_id} already exists.")
+            # Claim the ID so a concurrent placement of the same order is refused.
+            self._order_partitions[order_id] = index
+        try:
+            lines = self.catalog._resolve_items(items)
+            self.catalog._reserve_stock(lines)
+            try:
+                self._partitions[index].call("record_order", order_id, customer_id, items, order_date)
+            except BaseException:
+                self.catalog._release_stock(lines)
+                raise
+        except BaseException:
+            with self._lock:
+                del self._order_partitions[order_id]
+            raise
+
+    def apply_order_discount(self, order_id, percentage):
+        return self._order_partition(order_id).call("apply_order_discount", order_id, percentage)
+
+    def list_orders(self):
+        return list(self.iter_orders())
+
+    def get_orders_in_date_range(self, start_date, end_date):
+        orders_in_range = list(heapq.merge(*map(_as_list, self._gather("get_orders_in_date_range", start_date,
+                                                                         end_date)),
+                                           key=lambda order: order.order_date))
+        return orders_in_range if orders_in_range else "No orders found in the given date range."
+
+    def cancel_order(self, order_id):
+        with self._lock:
+            partition = self._order_partition(order_id)
+            index = self._order_partitions.pop(order_id)
+        try:
+            lines = partition.call("remove_order", order_id)
+        except BaseException:
+            with self._lock:
+                self._order_partitions[order_id] = index
+            raise
+        self.catalog._release_stock([(self.products.get(product_id), quantity) for product_id, quantity in lines])
+        return f"Order {order_id} has been canceled and stock returned."
+
+    def find_orders_by_date(self, date_str):
+        return list(itertools.chain.from_iterable(self._gather("find_orders_by_date", date_str)))
+
+    def get_orders_by_customer(self, customer_id):
+        return self._route(customer_id).call("get_orders_by_customer", customer_id)
+
+    # Bulk Import
+    def import_products(self, path, batch_size=10000):
+        """Stream products into the catalog, then copy them to every partition's replica."""
+        with self._lock:
+            loaded = self.catalog.import_products(path, batch_size)
+            new_products = list(self.products)[len(self.products) - loaded:] if loaded else []
+            for batch in importer.batched(new_products, batch_size):
+                self._gather("load_products", [(product.product_id, product.name, product.price, product.category)
+                                               for product in batch])
+        return loaded
+
+    def import_customers(self, path, batch_size=10000):
+        return self._bulk_import(importer.iter_customers(path), batch_size, self._insert_customer_batch)
+
+    def import_orders(self, path, batch_size=10000):
+        """Stream orders into their partitions; a batch that fails validation changes nothing."""
+        return self._bulk_import(importer.iter_orders(path), batch_size, self._insert_order_batch)
+
+    def _bulk_import(self, rows, batch_size, insert_batch):
+        loaded = 0
+        with self._lock:
+            self._gather("_detach_indexes")
+            try:
+                for batch in importer.batched(rows, batch_size):
+                    insert_batch(batch)
+                    loaded += len(batch)
+            finally:
+                self._gather("_rebuild_indexes")
+        return loaded
+
+    def _insert_customer_batch(self, batch):
+        groups = self._split(batch, lambda row: row[0])
+        self._gather_each([(partition, ([row[0] for row in rows],)) for partition, rows in groups],
+                          "check_new_customers")
+        self._gather_each([(partition, (rows,)) for partition, rows in groups], "_insert_customer_batch")
+
+    def _insert_order_batch(self, batch):
+        seen = set()
+        for order_id, _, _, _ in batch:
+            if order_id in self._order_partitions or order_id in seen:
+                raise ValueError(f"Order {order_id} already exists.")
+            seen.add(order_id)
+        lines = []
+        for _, _, items, order_date in batch:
+            if order_date is not None:
+                _to_date(order_date)
+            lines.extend(self.catalog._resolve_items(items))
+        groups = self._split(batch, lambda row: row[1])
+        self._gather_each([(partition, ([row[1] for row in rows],)) for partition, rows in groups],
+                          "check_customers_exist")
+        self.catalog._reserve_stock(lines)
+        try:
+            self._gather_each([(partition, (rows,)) for partition, rows in groups], "record_orders")
+        except BaseException:
+            # Partitions that got part or all of the way through give their orders back.
+            self._gather_each([(partition, ([row[0] for row in rows],)) for partition, rows in groups],
+                              "discard_orders")
+            self.catalog._release_stock(lines)
+            raise
+        for order_id, customer_id, _, _ in batch:
+            self._order_partitions[order_id] = self._partition_index(customer_id)
+
+    # Reports and Analytics
+    def generate_sales_report(self, start_date=None, end_date=None, granularity=None):
+        if start_date is None and end_date is None and granularity is None:
+            return f"Total Sales: ${to_dollars(sum(self._gather('total_sales')))}"
+        granularity = granularity or "day"
+        return _format_sales_report(self._period_totals(start_date, end_date, granularity), granularity)
+
+    def sales_by_period(self, start_date=None, end_date=None, granularity="day"):
+        return _periods_in_dollars(self._period_totals(start_date, end_date, granularity))
+
+    def _period_totals(self, start_date, end_date, granularity):
+        # Partitions report cents, so the merged sums are exact.
+        merged = {}
+        for periods in self._gather("period_totals", start_date, end_date, granularity):
+            for period, revenue, orders, units, categories in periods:
+                entry = merged.setdefault(period, [period, 0, 0, 0, {}])
+                entry[1] += revenue
+                entry[2] += orders
+                entry[3] += units
+                for category, amount in categories.items():
+                    entry[4][category] = entry[4].get(category, 0) + amount
+        return [tuple(merged[period]) for period in sorted(merged)]
+
+    def customer_purchase_history(self, customer_id):
+        return self._route(customer_id).call("customer_purchase_history", customer_id)
+
+    def get_highest_spending_customer(self):
+        results = self._gather("get_highest_spending_customer")
+        spenders = [result for result in results if isinstance(result, Customer)]
+        if spenders:
+            return max(spenders, key=Customer.get_total_spent)
+        if all(result == "No customers available." for result in results):
+            return "No customers available."
+        return "No purchases yet."
+
+    def _product_units(self):
+        units = {}
+        for partial in self._gather("product_units"):
+            for product_id, quantity in partial.items():
+                units[product_id] = units.get(product_id, 0) + quantity
+        return sorted(units.items(), key=lambda entry: entry[1], reverse=True)
+
+    def top_selling_products(self, k=10):
+        """Return up to k (product, units sold) pairs, best seller first."""
+        return [(self.products.get(product_id), units) for product_id, units in self._product_units()[:k]]
+
+    def find_top_selling_product(self):
+        top = self._product_units()
+        if not top:
+            return "No sales data available."
+        product_id, units = top[0]
+        top_product = self.products.get(product_id)
+        return f"Top Selling Product: {top_product.name} (Sold: {units} units)" if top_product else "No products found."
+
+    def find_customers_with_high_spending(self, threshold):
+        return list(heapq.merge(*self._gather("find_customers_with_high_spending", threshold),
+                                key=Customer.get_total_spent, reverse=True))
+
+    def find_most_purchased_product(self):
+        top = self._product_units()
+        if not top:
+            return "No products have been purchased yet."
+        most_purchased = self.products.get(top[0][0])
+        return most_purchased if most_purchased else "Error finding the most purchased product."
+
+    def generate_customer_spending_report(self):
+        spending = heapq.merge(*self._gather("spending"), key=lambda entry: entry[1], reverse=True)
+        return "Customer Spending Report:\n" + "\n".join(f"{name}: ${format_cents(spent)}" for name, spent in spending)
+
+    def generate_customer_order_history(self, customer_id):
+        return self._route(customer_id).call("generate_customer_order_history", customer_id)
+
+    def stats(self):
+        """Call metrics of this process merged with those of any worker-process partitions.
+
+        In-process partitions share this process's metrics. Worker processes
+        only have metrics if instrumentation was enabled before they started.
+        """
+        from ecommerce import instrumentation
+        workers = [(partition, ()) for partition in self._partitions if isinstance(partition, _ProcessPartition)]
+        return instrumentation.snapshot(self._gather_each(workers, "call_metrics"))
+
+    def cache_stats(self):
+        """Rendered-string cache counts summed over the catalog and every partition."""
+        return combine_stats([self.catalog.cache_stats(), *self._gather("cache_stats")])
+
+    # Streaming and Pagination
+    def _iter_pages(self, method, page_size=1000):
+        for partition in self._partitions:
+            token = None
+            while True:
+                items, token = partition.call(method, page_size, token)
+                yield from items
+                if token is None:
+                    break
+
+    def _page(self, method, page_size, token):
+        """Fill a page across partitions; tokens are '<partition>:<partition token>'."""
+        if page_size < 1:
+            raise ValueError("Page size must be at least 1.")
+        index, inner = 0, None
+        if token is not None:
+            position, _, inner = token.partition(":")
+            if not position.isdigit() or int(position) >= len(self._partitions):
+                raise ValueError("Invalid continuation token.")
+            index, inner = int(position), inner or None
+        page = []
+        while index < len(self._partitions) and len(page) < page_size:
+            items, inner = self._partitions[index].call(method, page_size - len(page), inner)
+            page.extend(items)
+            if inner is None:
+                index += 1
+        if index >= len(self._partitions):
+            return page, None
+        return page, f"{index}:{inner or ''}"
+
+    def iter_products(self):
+        return self.catalog.iter_products()
+
+    def iter_customers(self):
+        return self._iter_pages("page_customers")
+
+    def iter_orders(self):
+        return self._iter_pages("page_orders")
+
+    def page_products(self, page_size=100, token=None):
+        return self.catalog.page_products(page_size, token)
+
+    def page_customers(self, page_size=100, token=None):
+        return self._page("page_customers", page_size, token)
+
+    def page_orders(self, page_size=100, token=None):
+        return self._page("page_orders", page_size, token)
+
+    def iter_customer_purchase_history(self, customer_id):
+        return iter(self._route(customer_id).call("iter_customer_purchase_history", customer_id))
+
+    def iter_customer_order_history(self, customer_id):
+        return iter(self._route(customer_id).call("iter_customer_order_history", customer_id))
@@ -0,0 +1,280 @@
+"""Approximate order analytics in bounded memory.
+
+CountMinSketch estimates per-key counts and HeavyHitters keeps the keys with
+the largest estimates. HyperLogLog estimates how many distinct keys it has
+seen. OrderSketches combines them: units sold per product, the best sellers,
+and distinct buyers per product and per category. These complement the
+exact ECommerce queries. Their memory is fixed by their error bounds rather
+than by order volume.
+
+Keys are hashed with BLAKE2b rather than hash(), so two processes build
+identical sketches from identical input. Any two sketches with the same
+settings can therefore be merged, e.g. one per worker or one per hour.
+Every sketch pickles, so it can be sent between processes.
+"""
+import array
+import bisect
+import hashlib
+import heapq
+import math
+import operator
+import threading
+
+
+def _hash64(key):
+    return int.from_bytes(hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class CountMinSketch:
+    """Per-key count estimates that never undercount.
+
+    An estimate exceeds the true count by more than epsilon * total with
+    probability at most delta. The table holds ceil(e / epsilon) counters
+    in each of ceil(ln(1 / delta)) rows.
+    """
+
+    def __init__(self, epsilon=0.001, delta=0.01):
+        if not 0 < epsilon < 1 or not 0 < delta < 1:
+            raise ValueError("Error bounds must be in (0, 1).")
+        self.epsilon = epsilon
+        self.delta = delta
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1 / delta))
+        self.total = 0
+        self._rows = [array.array("q", bytes(8 * self.width)) for _ in range(self.depth)]
+
+    def _columns(self, key_hash):
+        # Row i uses h1 + i * h2 (Kirsch-Mitzenmacher), so one 64-bit hash serves every row.
+        h1, h2 = key_hash & 0xFFFFFFFF, (key_hash >> 32) | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, key, count=1):
+        """Count key and return its new estimate."""
+        estimate = None
+        for row, column in zip(self._rows, self._columns(_hash64(key))):
+            row[column] += count
+            if estimate is None or row[column] < estimate:
+                estimate = row[column]
+        self.total += count
+        return estimate
+
+    def estimate(self, key):
+        return min(row[column] for row, column in zip(self._rows, self._columns(_hash64(key))))
+
+    def merge(self, other):
+        """Add other's counts into this sketch; both must have the same dimensions."""
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("Cannot merge sketches with different dimensions.")
+        self._rows = [array.array("q", map(operator.add, mine, theirs))
+                      for mine, theirs in zip(self._rows, other._rows)]
+        self.total += other.total
+        return self
+
+
+class HeavyHitters:
+    """The k keys with the highest Count-Min estimates, kept in a min-heap.
+
+    A key enters once its estimate beats the smallest tracked one, so any
+    key whose true count exceeds total / k plus the sketch error is tracked.
+    """
+
+    def __init__(self, k=100, epsilon=0.001, delta=0.01):
+        if k < 1:
+            raise ValueError("k must be at least 1.")
+        self.k = k
+        self.sketch = CountMinSketch(epsilon, delta)
+        self._top = {}
+        # (estimate, key) pairs; entries whose estimate is out of date are skipped when popped.
+        self._heap = []
+
+    def add(self, key, count=1):
+        self._offer(key, self.sketch.add(key, count))
+
+    def _offer(self, key, estimate):
+        if key not in self._top and len(self._top) >= self.k:
+            while self._top.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            if estimate <= self._heap[0][0]:
+                return
+            del self._top[heapq.heappop(self._heap)[1]]
+        self._top[key] = estimate
+        heapq.heappush(self._heap, (estimate, key))
+        if len(self._heap) > 2 * self.k + 64:
+            self._heap = [(value, item) for item, value in self._top.items()]
+            heapq.heapify(self._heap)
+
+    def top(self, n=None):
+        """Return up to n (key, estimated count) pairs, highest first."""
+        ranked = sorted(((key, self.sketch.estimate(key)) for key in self._top), key=lambda entry: entry[1],
+                        reverse=True)
+        return ranked if n is None else ranked[:n]
+
+    def merge(self, other):
+        if self.k != other.k:
+            raise ValueError("Cannot merge sketches with different dimensions.")
+        self.sketch.merge(other.sketch)
+        candidates = set(self._top) | set(other._top)
+        self._top = {}
+        self._heap = []
+        for key in candidates:
+            self._offer(key, self.sketch.estimate(key))
+        return self
+
+
+class HyperLogLog:
+    """Distinct-key count estimate with relative standard error about 1.04 / sqrt(2 ** precision).
+
+    Starts sparse, storing only the registers set so far at 4 bytes each.
+    Once more than 2 ** precision / 8 are set it switches to one byte per
+    register, 2 ** precision bytes in all. A sketch that has seen n keys
+    thus holds at most min(4 * n, 2 ** precision) bytes of registers, and
+    both forms give the same estimates.
+    """
+
+    def __init__(self, precision=10):
+        if not 4 <= precision <= 16:
+            raise ValueError("Precision must be between 4 and 16.")
+        self.precision = precision
+        # Sorted (index << 8 | rank) entries while sparse, else None.
+        self._sparse = array.array("I")
+        self._registers = None
+
+    @property
+    def standard_error(self):
+        return 1.04 / math.sqrt(1 << self.precision)
+
+    def add(self, key):
+        self.add_hash(_hash64(key))
+
+    def add_hash(self, key_hash):
+        """Add a key by its 64-bit hash, for callers feeding one key into several sketches."""
+        bits = 64 - self.precision
+        self._set(key_hash >> bits, bits - (key_hash & ((1 << bits) - 1)).bit_length() + 1)
+
+    def _set(self, index, rank):
+        """Raise register index to rank if it is lower."""
+        if self._registers is not None:
+            if rank > self._registers[index]:
+                self._registers[index] = rank
+            return
+        sparse = self._sparse
+        position = bisect.bisect_left(sparse, index << 8)
+        if position < len(sparse) and sparse[position] >> 8 == index:
+            if rank > sparse[position] & 0xFF:
+                sparse[position] = index << 8 | rank
+        else:
+            sparse.insert(position, index << 8 | rank)
+            if len(sparse) > (1 << self.precision) // 8:
+                self._densify()
+
+    def _densify(self):
+        self._registers = bytearray(1 << self.precision)
+        for entry in self._sparse:
+            self._registers[entry >> 8] = entry & 0xFF
+        self._sparse = None
+
+    def count(self):
+        m = 1 << self.precision
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        if self._registers is None:
+            zeros = m - len(self._sparse)
+            harmonic = zeros + sum(2.0 ** -(entry & 0xFF) for entry in self._sparse)
+        else:
+            zeros = self._registers.count(0)
+            harmonic = sum(2.0 ** -register for register in self._registers)
+        estimate = alpha * m * m / harmonic
+        if zeros and estimate <= 2.5 * m:
+            # Small-range correction: linear counting is more accurate while registers are still empty.
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+    def merge(self, other):
+        if self.precision != other.precision:
+            raise ValueError("Cannot merge sketches with different dimensions.")
+        if other._registers is None:
+            for entry in other._sparse:
+                self._set(entry >> 8, entry & 0xFF)
+        else:
+            if self._registers is None:
+                self._densify()
+            self._registers = bytearray(map(max, self._registers, other._registers))
+        return self
+
+
+class OrderSketches:
+    """Approximate units sold and distinct buyers, fed with each placed order.
+
+    epsilon and delta bound the units estimates (see CountMinSketch), top_k is
+    how many best sellers are tracked, and precision sets the HyperLogLog
+    error. Memory is one Count-Min table plus one HyperLogLog per product and
+    per category that has sold. Each holds min(4 * buyers, 2 ** precision)
+    bytes of registers, so a long tail of rarely bought products costs a few
+    bytes per buyer. The total is bounded by 4 bytes per recorded line item
+    and by 2 ** precision bytes per sold product or category. Canceled orders
+    are not taken back out: the sketches count placements.
+    """
+
+    def __init__(self, epsilon=0.001, delta=0.01, top_k=100, precision=10):
+        self.units = HeavyHitters(top_k, epsilon, delta)
+        self.precision = precision
+        self.orders = 0
+        self._buyers_by_product = {}
+        self._buyers_by_category = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _buyers(self, sketches, key):
+        sketch = sketches.get(key)
+        if sketch is None:
+            sketch = sketches[key] = HyperLogLog(self.precision)
+        return sketch
+
+    def record(self, order):
+        customer_hash = _hash64(order.customer.customer_id)
+        with self._lock:
+            self.orders += 1
+            for item in order.items:
+                product = item.product
+                self.units.add(product.product_id, item.quantity)
+                self._buyers(self._buyers_by_product, product.product_id).add_hash(customer_hash)
+                self._buyers(self._buyers_by_category, product.category.casefold()).add_hash(customer_hash)
+
+    def heavy_hitters(self, k=10):
+        """Return up to k (product_id, estimated units) pairs, best seller first."""
+        with self._lock:
+            return self.units.top(k)
+
+    def estimated_units(self, product_id):
+        with self._lock:
+            return self.units.sketch.estimate(product_id)
+
+    def distinct_buyers(self, product_id):
+        with self._lock:
+            sketch = self._buyers_by_product.get(product_id)
+            return sketch.count() if sketch is not None else 0
+
+    def distinct_buyers_in_category(self, category):
+        with self._lock:
+            sketch = self._buyers_by_category.get(category.casefold())
+            return sketch.count() if sketch is not None else 0
+
+    def merge(self, other):
+        """Fold in sketches built elsewhere with the same settings, e.g. by another process."""
+        if self.precision != other.precision:
+            raise ValueError("Cannot merge sketches with different dimensions.")
+        with self._lock:
+            self.units.merge(other.units)
+            self.orders += other.orders
+            for mine, theirs in ((self._buyers_by_product, other._buyers_by_product),
+                                 (self._buyers_by_category, other._buyers_by_category)):
+                for key, sketch in theirs.items():
+                    self._buyers(mine, key).merge(sketch)
+        return self
@@ -0,0 +1,765 @@
+"""ECommerce kept in SQLite instead of in-memory collections.
+
+SQLiteECommerce has the same public methods as ECommerce. Products,
+customers and orders live in SQLite tables, so the store can outgrow RAM
+and a restart reopens the database instead of reloading it. Lookups go
+through indexes on the IDs, category, price, order date and customer.
+Reports such as the sales and spending reports and the top sellers are
+aggregated by SQLite. Bulk imports write each batch with executemany in a
+single transaction.
+
+Every statement is a constant SQL string with ? parameters. Each
+connection compiles a statement once and reuses it from its statement
+cache. Writes go through one connection, one transaction per call, so a
+call either fully applies or changes nothing. A file database runs in WAL
+mode with a pool of read-only connections. A read borrows a pooled
+connection and sees the last committed state, so reports never wait for,
+or hold up, order intake. An in-memory database (":memory:") has no pool,
+and its reads share the writer connection.
+
+Queries return Product, Customer and Order objects built from the rows.
+These are detached copies: changing one directly does not change the store.
+Customer.purchase_history is not loaded; use the store's history methods.
+"""
+import contextlib
+import datetime
+import heapq
+import json
+import queue
+import sqlite3
+import threading
+
+from ecommerce import importer, search
+from ecommerce.ecommerce import (Customer, LineItem, Order, Product, _format_sales_report, _periods_in_dollars,
+                                 _sales_periods, _to_date)
+from ecommerce.indexes import DayTotals
+from ecommerce.money import format_cents, percent_off, split_cents, to_cents, to_dollars
+
+CACHED_STATEMENTS = 256
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    seq INTEGER PRIMARY KEY,
+    product_id TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    price INTEGER NOT NULL,
+    stock INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    category_key TEXT NOT NULL,
+    is_featured INTEGER NOT NULL DEFAULT 0,
+    original_price INTEGER
+);
+CREATE INDEX IF NOT EXISTS products_by_category ON products (category_key);
+CREATE INDEX IF NOT EXISTS products_by_price ON products (price);
+CREATE INDEX IF NOT EXISTS products_out_of_stock ON products (seq) WHERE stock = 0;
+
+CREATE TABLE IF NOT EXISTS customers (
+    seq INTEGER PRIMARY KEY,
+    customer_id TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    phone_number TEXT NOT NULL,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    total_spent INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS customers_by_spend ON customers (total_spent DESC, seq);
+
+CREATE TABLE IF NOT EXISTS orders (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id TEXT NOT NULL UNIQUE,
+    customer_id TEXT NOT NULL,
+    order_date TEXT NOT NULL,
+    total_cost INTEGER NOT NULL,
+    subtotal INTEGER NOT NULL,
+    gift_message TEXT
+);
+CREATE INDEX IF NOT EXISTS orders_by_date ON orders (order_date);
+CREATE INDEX IF NOT EXISTS orders_by_customer ON orders (customer_id);
+
+CREATE TABLE IF NOT EXISTS order_items (
+    order_id TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    product_id TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    price INTEGER NOT NULL,
+    PRIMARY KEY (order_id, line)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS order_items_by_product ON order_items (product_id, quantity);
+"""
+# Money columns hold integer cents, as ECommerce does.
+
+PRODUCT_COLUMNS = "product_id, name, price, stock, category, is_featured, original_price"
+CUSTOMER_COLUMNS = "customer_id, name, email, phone_number, is_active, total_spent"
+ORDER_COLUMNS = "order_id, customer_id, order_date, total_cost, gift_message"
+
+# Spend bounds in cents (exclusive, inclusive) per tier; these mirror _loyalty_status.
+LOYALTY_BOUNDS = {"platinum": (500000, float("inf")), "gold": (200000, 500000), "silver": (100000, 200000),
+                  "bronze": (float("-inf"), 100000)}
+
+
+def _casefold(text):
+    return text.casefold()
+
+
+def _best_matches(query, entities, limit, key, texts):
+    """The limit entities that match a normalized query best, ordered as SearchIndex orders them."""
+    ranked = ((search.match_rank(query, texts(entity)), key(entity), entity) for entity in entities)
+    return [entity for _, _, entity in heapq.nsmallest(limit, (match for match in ranked if match[0] is not None),
+                                                       key=lambda match: match[:2])]
+
+
+def _ids(values):
+    """Bind a list of IDs as one parameter, read back with json_each(), so the SQL text never varies."""
+    return json.dumps(list(values))
+
+
+def _product(row):
+    product = Product(row[0], row[1], 0, row[3], row[4])
+    product.price_cents = row[2]
+    product.is_featured = bool(row[5])
+    product.original_price_cents = row[6]
+    return product
+
+
+def _customer(row):
+    customer = Customer(*row[:4])
+    customer.is_active = bool(row[4])
+    customer._spent_cents = row[5]
+    return customer
+
+
+def _products(db, rows):
+    return [_product(row) for row in rows]
+
+
+def _customers(db, rows):
+    return [_customer(row) for row in rows]
+
+
+def _orders(db, rows):
+    """Build Order objects for order rows, loading their customers, lines and products in three queries."""
+    rows = list(rows)
+    if not rows:
+        return []
+    customers = {row[0]: _customer(row) for row in db.execute(
+        f"SELECT {CUSTOMER_COLUMNS} FROM customers WHERE customer_id IN (SELECT value FROM json_each(?))",
+        (_ids({row[1] for row in rows}),))}
+    lines = {}
+    for order_id, product_id, quantity, price in db.execute(
+            "SELECT order_id, product_id, quantity, price FROM order_items "
+            "WHERE order_id IN (SELECT value FROM json_each(?)) ORDER BY order_id, line",
+            (_ids(row[0] for row in rows),)):
+        lines.setdefault(order_id, []).append((product_id, quantity, price))
+    products = {row[0]: _product(row) for row in db.execute(
+        f"SELECT {PRODUCT_COLUMNS} FROM products WHERE product_id IN (SELECT value FROM json_each(?))",
+        (_ids({line[0] for order_lines in lines.values() for line in order_lines}),))}
+    orders = []
+    for order_id, customer_id, order_date, total_cost, gift_message in rows:
+        order = Order(order_id, customers[customer_id], datetime.date.fromisoformat(order_date))
+        order.items.extend(LineItem(products[product_id], quantity, price)
+                           for product_id, quantity, price in lines.get(order_id, ()))
+        order.total_cents = total_cost
+        order.gift_message = gift_message
+        orders.append(order)
+    return orders
+
+
+class _Table:
+    """Read-only, collection-style view of one table: get, in, len, iteration, paging and positions."""
+
+    def __init__(self, store, table, key, columns, build):
+        self._store = store
+        self._build = build
+        self._get = f"SELECT {columns} FROM {table} WHERE {key} = ?"
+        self._exists = f"SELECT 1 FROM {table} WHERE {key} = ?"
+        self._count = f"SELECT count(*) FROM {table}"
+        self._page = f"SELECT seq, {columns} FROM {table} WHERE seq > ? ORDER BY seq LIMIT ?"
+        self._first = f"SELECT {columns} FROM {table} ORDER BY seq LIMIT 1 OFFSET ?"
+        self._last = f"SELECT {columns} FROM {table} ORDER BY seq DESC LIMIT 1 OFFSET ?"
+
+    def get(self, item_id, default=None):
+        with self._store._reading() as db:
+            items = self._build(db, db.execute(self._get, (item_id,)).fetchall())
+        return items[0] if items else default
+
+    def __contains__(self, item_id):
+        with self._store._reading() as db:
+            return db.execute(self._exists, (item_id,)).fetchone() is not None
+
+    def __len__(self):
+        with self._store._reading() as db:
+            return db.execute(self._count).fetchone()[0]
+
+    def page(self, page_size, token=None):
+        """Return (items, next_token) for up to page_size items after token; None once the end is reached.
+
+        Tokens hold the last row's sequence number, so they survive adds and removes.
+        """
+        if page_size < 1:
+            raise ValueError("Page size must be at least 1.")
+        if token is not None and not token.isdigit():
+            raise ValueError("Invalid continuation token.")
+        with self._store._reading() as db:
+            rows = db.execute(self._page, (int(token or 0), page_size + 1)).fetchall()
+            items = self._build(db, [row[1:] for row in rows[:page_size]])
+        return items, (str(rows[page_size - 1][0]) if len(rows) > page_size else None)
+
+    def __iter__(self):
+        items, token = self.page(1000)
+        while True:
+            yield from items
+            if token is None:
+                return
+            items, token = self.page(1000, token)
+
+    def __getitem__(self, position):
+        """Positional access in insertion order, kept for list-style callers."""
+        query, offset = (self._last, -position - 1) if position < 0 else (self._first, position)
+        with self._store._reading() as db:
+            items = self._build(db, db.execute(query, (offset,)).fetchall())
+        if not items:
+            raise IndexError("position out of range")
+        return items[0]
+
+
+class SQLiteECommerce:
+    """ECommerce API over a SQLite database."""
+
+    def __init__(self, path=":memory:", readers=4):
+        """Open or create the store at path; readers is the size of the read connection pool."""
+        if readers < 0:
+            raise ValueError("Reader pool size cannot be negative.")
+        self.path = path
+        self._lock = threading.RLock()
+        self._writer = self._connect()
+        in_memory = path in (":memory:", "")
+        if not in_memory:
+            self._writer.execute("PRAGMA journal_mode = WAL")
+            self._writer.execute("PRAGMA synchronous = NORMAL")
+        self._writer.executescript(SCHEMA)
+        self._connections = [self._writer]
+        self._readers = None
+        if readers and not in_memory:
+            self._readers = queue.SimpleQueue()
+            for _ in range(readers):
+                connection = self._connect()
+                connection.execute("PRAGMA query_only = ON")
+                self._connections.append(connection)
+                self._readers.put(connection)
+        self.products = _Table(self, "products", "product_id", PRODUCT_COLUMNS, _products)
+        self.customers = _Table(self, "customers", "customer_id", CUSTOMER_COLUMNS, _customers)
+        self.orders = _Table(self, "orders", "order_id", ORDER_COLUMNS, _orders)
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                                     cached_statements=CACHED_STATEMENTS)
+        # Python's casefold, so search matches exactly what ecommerce.search matches.
+        connection.create_function("casefold", 1, _casefold, deterministic=True)
+        return connection
+
+    def close(self):
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @contextlib.contextmanager
+    def _writing(self):
+        """Yield the writer connection inside a transaction; an exception rolls the whole call back."""
+        with self._lock:
+            self._writer.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._writer
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                raise
+            self._writer.execute("COMMIT")
+
+    @contextlib.contextmanager
+    def _reading(self):
+        """Yield a connection whose queries all see one committed snapshot."""
+        if self._readers is None:
+            with self._lock:
+                yield self._writer
+            return
+        connection = self._readers.get()
+        try:
+            connection.execute("BEGIN")
+            try:
+                yield connection
+            finally:
+                connection.execute("COMMIT")
+        finally:
+            self._readers.put(connection)
+
+    def _select(self, build, query, parameters=()):
+        with self._reading() as db:
+            return build(db, db.execute(query, parameters).fetchall())
+
+    # Product Management
+    def add_product(self, product_id, name, price, stock, category):
+        with self._writing() as db:
+            self._insert_products(db, [(product_id, name, price, stock, category)])
+
+    def _insert_products(self, db, rows):
+        self._check_new_ids(db, "products", "product_id", [row[0] for row in rows], "Product")
+        db.executemany("INSERT INTO products (product_id, name, price, stock, category, category_key) "
+                       "VALUES (?, ?, ?, ?, ?, ?)",
+                       [(product_id, name, to_cents(price), stock, category, category.casefold())
+                        for product_id, name, price, stock, category in rows])
+
+    def list_products(self):
+        return list(self.iter_products())
+
+    def restock_product(self, product_id, quantity):
+        with self._writing() as db:
+            row = db.execute("SELECT name FROM products WHERE product_id = ?", (product_id,)).fetchone()
+            if row is None:
+                raise ValueError("Product not found.")
+            if quantity < 0:
+                raise ValueError("Cannot restock with negative quantity.")
+            db.execute("UPDATE products SET stock = stock + ? WHERE product_id = ?", (quantity, product_id))
+        return f"{quantity} units added to {row[0]}."
+
+    def mark_product_featured(self, product_id):
+        with self._writing() as db:
+            row = db.execute("SELECT name FROM products WHERE product_id = ?", (product_id,)).fetchone()
+            if row is None:
+                raise ValueError("Product not found.")
+            db.execute("UPDATE products SET is_featured = 1 WHERE product_id = ?", (product_id,))
+        return f"Product {row[0]} is now marked as featured."
+
+    def search_products_by_category(self, category):
+        results = self._select(_products, f"SELECT {PRODUCT_COLUMNS} FROM products WHERE category_key = ? "
+                                          "ORDER BY seq", (category.casefold(),))
+        return results if results else f"No products found in category '{category}'."
+
+    def apply_discount_to_category(self, category, percentage):
+        if percentage < 0 or percentage > 100:
+            raise ValueError("Invalid discount percentage.")
+        with self._writing() as db:
+            prices = db.execute("SELECT seq, price FROM products WHERE category_key = ?",
+                                (category.casefold(),)).fetchall()
+            if not prices:
+                raise ValueError(f"No products found in category '{category}'.")
+            # Rounded in Python so prices match Product.apply_discount exactly.
+            db.executemany("UPDATE products SET price = ? WHERE seq = ?",
+                           [(percent_off(price, percentage), seq) for seq, price in prices])
+        return f"Discount applied to {len(prices)} product(s) in category '{category}'."
+
+    def search_products(self, query, limit=10):
+        """Products whose name matches query, ranked as ECommerce ranks them. Scans the table."""
+        query = search.normalize(query)
+        if not query or limit < 1:
+            return []
+        products = self._select(_products, f"SELECT {PRODUCT_COLUMNS} FROM products WHERE instr(casefold(name), ?)",
+                                (query,))
+        return _best_matches(query, products, limit, lambda product: product.product_id,
+                             lambda product: (product.name,))
+
+    def list_out_of_stock_products(self):
+        """List all products that are out of stock."""
+        out_of_stock = self._select(_products, f"SELECT {PRODUCT_COLUMNS} FROM products WHERE stock = 0 ORDER BY seq")
+        return out_of_stock if out_of_stock else "No out-of-stock products found."
+
+    # Customer Management
+    def add_customer(self, customer_id, name, email, phone_number):
+        with self._writing() as db:
+            self._insert_customers(db, [(customer_id, name, email, phone_number)])
+
+    def _insert_customers(self, db, rows):
+        self._check_new_ids(db, "customers", "customer_id", [row[0] for row in rows], "Customer")
+        db.executemany("INSERT INTO customers (customer_id, name, email, phone_number) VALUES (?, ?, ?, ?)", rows)
+
+    def list_customers(self):
+        return list(self.iter_customers())
+
+    def update_customer_email(self, customer_id, new_email):
+        with self._writing() as db:
+            row = db.execute("SELECT name FROM customers WHERE customer_id = ?", (customer_id,)).fetchone()
+            if row is None:
+                raise ValueError("Customer not found.")
+            db.execute("UPDATE customers SET email = ? WHERE customer_id = ?", (new_email, customer_id))
+        return f"Email for {row[0]} updated to {new_email}."
+
+    def update_customer_phone(self, customer_id, new_phone):
+        with self._writing() as db:
+            row = db.execute("SELECT name FROM customers WHERE customer_id = ?", (customer_id,)).fetchone()
+            if row is None:
+                raise ValueError("Customer not found.")
+            if not new_phone.isdigit() or len(new_phone) != 10:
+                raise ValueError("Invalid phone number format.")
+            db.execute("UPDATE customers SET phone_number = ? WHERE customer_id = ?", (new_phone, customer_id))
+        return f"Phone number for {row[0]} updated to {new_phone}."
+
+    def deactivate_customer(self, customer_id):
+        with self._writing() as db:
+            row = db.execute("SELECT name FROM customers WHERE customer_id = ?", (customer_id,)).fetchone()
+            if row is None:
+                raise ValueError("Customer not found.")
+            db.execute("UPDATE customers SET is_active = 0 WHERE customer_id = ?", (customer_id,))
+        return f"Customer {row[0]}'s account has been deactivated."
+
+    def search_customers(self, query, limit=10):
+        """Customers whose name or email matches query, ranked as ECommerce ranks them. Scans the table."""
+        query = search.normalize(query)
+        if not query or limit < 1:
+            return []
+        customers = self._select(_customers, f"SELECT {CUSTOMER_COLUMNS} FROM customers "
+                                             "WHERE instr(casefold(name), ?) OR instr(casefold(email), ?)",
+                                 (query, query))
+        return _best_matches(query, customers, limit, lambda customer: customer.customer_id,
+                             lambda customer: (customer.name, customer.email))
+
+    def get_customers_by_loyalty(self, loyalty_level):
+        bounds = LOYALTY_BOUNDS.get(loyalty_level.casefold())
+        if bounds is None:
+            return []
+        return self._select(_customers, f"SELECT {CUSTOMER_COLUMNS} FROM customers "
+                                        "WHERE total_spent > ? AND total_spent <= ? ORDER BY seq", bounds)
+
+    def find_customers_purchased_product(self, product_id):
+        """Find all customers who have purchased a specific product."""
+        return self._select(_customers, f"SELECT {CUSTOMER_COLUMNS} FROM customers WHERE customer_id IN "
+                                        "(SELECT o.customer_id FROM order_items AS i "
+                                        "JOIN orders AS o ON o.order_id = i.order_id WHERE i.product_id = ?) "
+                                        "ORDER BY seq", (product_id,))
+
+    # Order Management
+    def place_order(self, order_id, customer_id, items, order_date=None):
+        with self._writing() as db:
+            if db.execute("SELECT 1 FROM customers WHERE customer_id = ?", (customer_id,)).fetchone() is None:
+                raise ValueError("Customer not found.")
+            if db.execute("SELECT 1 FROM orders WHERE order_id = ?", (order_id,)).fetchone() is not None:
+                raise ValueError(f"Order {order_id} already exists.")
+            self._insert_orders(db, [(order_id, customer_id, items, order_date)])
+
+    def _insert_orders(self, db, batch):
+        """Take stock for and insert (order_id, customer_id, items, order_date) rows.
+
+        Raises before writing anything if a product is missing or short of
+        stock; the caller's transaction makes the batch all or nothing.
+        """
+        products = {row[0]: row[1:] for row in db.execute(
+            "SELECT product_id, name, price, stock FROM products WHERE product_id IN (SELECT value FROM json_each(?))",
+            (_ids({product_id for _, _, items, _ in batch for product_id in items}),))}
+        demand = {}
+        orders = []
+        lines = []
+        spending = {}
+        for order_id, customer_id, items, order_date in batch:
+            total = 0
+            for line, (product_id, quantity) in enumerate(items.items()):
+                if product_id not in products:
+                    raise ValueError(f"Product {product_id} not found.")
+                if quantity < 1:
+                    raise ValueError(f"Invalid quantity for product {product_id}.")
+                price = products[product_id][1]
+                total += price * quantity
+                demand[product_id] = demand.get(product_id, 0) + quantity
+                lines.append((order_id, line, product_id, quantity, price))
+            order_date = datetime.date.today() if order_date is None else _to_date(order_date)
+            orders.append((order_id, customer_id, order_date.isoformat(), total, total))
+            spending[customer_id] = spending.get(customer_id, 0) + total
+        for product_id, quantity in demand.items():
+            name, _, stock = products[product_id]
+            if stock < quantity:
+                raise ValueError(f"Not enough stock for product {name}.")
+        db.executemany("UPDATE products SET stock = stock - ? WHERE product_id = ?",
+                       [(quantity, product_id) for product_id, quantity in demand.items()])
+        db.executemany("INSERT INTO orders (order_id, customer_id, order_date, total_cost, subtotal) "
+                       "VALUES (?, ?, ?, ?, ?)", orders)
+        db.executemany("INSERT INTO order_items (order_id, line, product_id, quantity, price) VALUES (?, ?, ?, ?, ?)",
+                       lines)
+        db.executemany("UPDATE customers SET total_spent = total_spent + ? WHERE customer_id = ?",
+                       [(total, customer_id) for customer_id, total in spending.items()])
+
+    def apply_order_discount(self, order_id, percentage):
+        with self._writing() as db:
+            row = db.execute("SELECT customer_id, total_cost FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+            if row is None:
+                raise ValueError("Order not found.")
+            if percentage < 0 or percentage > 100:
+                raise ValueError("Invalid discount percentage.")
+            customer_id, previous = row
+            total = percent_off(previous, percentage)
+            db.execute("UPDATE orders SET total_cost = ? WHERE order_id = ?", (total, order_id))
+            db.execute("UPDATE customers SET total_spent = total_spent + ? WHERE customer_id = ?",
+                       (total - previous, customer_id))
+        return f"Discount applied to order {order_id}."
+
+    def list_orders(self):
+        return list(self.iter_orders())
+
+    def get_orders_in_date_range(self, start_date, end_date):
+        orders_in_range = self._select(_orders, f"SELECT {ORDER_COLUMNS} FROM orders WHERE order_date BETWEEN ? AND ? "
+                                                "ORDER BY order_date, seq",
+                                       (_to_date(start_date).isoformat(), _to_date(end_date).isoformat()))
+        return orders_in_range if orders_in_range else "No orders found in the given date range."
+
+    def cancel_order(self, order_id):
+        with self._writing() as db:
+            row = db.execute("SELECT customer_id, total_cost FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+            if row is None:
+                raise ValueError("Order not found.")
+            db.executemany("UPDATE products SET stock = stock + ? WHERE product_id = ?",
+                           db.execute("SELECT quantity, product_id FROM order_items WHERE order_id = ?",
+                                      (order_id,)).fetchall())
+            db.execute("DELETE FROM order_items WHERE order_id = ?", (order_id,))
+            db.execute("DELETE FROM orders WHERE order_id = ?", (order_id,))
+            db.execute("UPDATE customers SET total_spent = total_spent - ? WHERE customer_id = ?",
+                       (row[1], row[0]))
+        return f"Order {order_id} has been canceled and stock returned."
+
+    # Bulk Import
+    def import_products(self, path, batch_size=10000):
+        """Stream products from a CSV or JSONL file; returns the number loaded."""
+        return self._bulk_import(importer.iter_products(path), batch_size, self._insert_products)
+
+    def import_customers(self, path, batch_size=10000):
+        """Stream customers from a CSV or JSONL file; returns the number loaded."""
+        return self._bulk_import(importer.iter_customers(path), batch_size, self._insert_customers)
+
+    def import_orders(self, path, batch_size=10000):
+        """Stream orders from a CSV or JSONL file; returns the number placed.
+
+        Each batch is one transaction, so a batch with an unknown ID or too
+        little stock for its orders changes nothing.
+        """
+        return self._bulk_import(importer.iter_orders(path), batch_size, self._insert_order_batch)
+
+    def _bulk_import(self, rows, batch_size, insert_batch):
+        loaded = 0
+        for batch in importer.batched(rows, batch_size):
+            with self._writing() as db:
+                insert_batch(db, batch)
+            loaded += len(batch)
+        return loaded
+
+    def _check_new_ids(self, db, table, key, ids, label):
+        seen = set()
+        for item_id in ids:
+            if item_id in seen:
+                raise ValueError(f"{label} {item_id} already exists.")
+            seen.add(item_id)
+        existing = db.execute(f"SELECT {key} FROM {table} WHERE {key} IN (SELECT value FROM json_each(?)) LIMIT 1",
+                              (_ids(ids),)).fetchone()
+        if existing is not None:
+            raise ValueError(f"{label} {existing[0]} already exists.")
+
+    def _insert_order_batch(self, db, batch):
+        self._check_new_ids(db, "orders", "order_id", [row[0] for row in batch], "Order")
+        customer_ids = {row[1] for row in batch}
+        known = {row[0] for row in db.execute(
+            "SELECT customer_id FROM customers WHERE customer_id IN (SELECT value FROM json_each(?))",
+            (_ids(customer_ids),))}
+        for _, customer_id, _, _ in batch:
+            if customer_id not in known:
+                raise ValueError(f"Customer {customer_id} not found.")
+        self._insert_orders(db, batch)
+
+    # Reports and Analytics
+    def generate_sales_report(self, start_date=None, end_date=None, granularity=None):
+        """All-time total with no arguments; otherwise revenue per day, week or month within [start, end]."""
+        if start_date is None and end_date is None and granularity is None:
+            with self._reading() as db:
+                total = db.execute("SELECT coalesce(sum(total_cost), 0) FROM orders").fetchone()[0]
+            return f"Total Sales: ${to_dollars(total)}"
+        granularity = granularity or "day"
+        return _format_sales_report(self._period_totals(start_date, end_date, granularity), granularity)
+
+    def sales_by_period(self, start_date=None, end_date=None, granularity="day"):
+        """Return (period start, revenue, orders, units, {category: revenue}) tuples, oldest first.
+
+        Days are totalled by SQLite; category revenue splits each order's
+        total across categories in proportion to line value, as ECommerce does.
+        """
+        return _periods_in_dollars(self._period_totals(start_date, end_date, granularity))
+
+    def _period_totals(self, start_date, end_date, granularity):
+        """sales_by_period() with revenue in cents."""
+        bounds = ("" if start_date is None else _to_date(start_date).isoformat(),
+                  "9999-12-31" if end_date is None else _to_date(end_date).isoformat())
+        days = {}
+        discounted = {}
+        with self._reading() as db:
+            for day, revenue, orders in db.execute(
+                    "SELECT order_date, sum(total_cost), count(*) FROM orders WHERE order_date BETWEEN ? AND ? "
+                    "GROUP BY order_date", bounds):
+                totals = days[day] = DayTotals()
+                totals.revenue = revenue
+                totals.orders = orders
+            # Undiscounted orders add line value as is; each discounted order is split on its own in Python,
+            # with the same whole-cent split as ECommerce.
+            for day, category, units, value, order_id, total in db.execute(
+                    "SELECT o.order_date, p.category, sum(i.quantity), sum(i.price * i.quantity), "
+                    "CASE WHEN o.total_cost = o.subtotal THEN NULL ELSE o.order_id END AS discounted, o.total_cost "
+                    "FROM orders AS o JOIN order_items AS i ON i.order_id = o.order_id "
+                    "JOIN products AS p ON p.product_id = i.product_id "
+                    "WHERE o.order_date BETWEEN ? AND ? GROUP BY o.order_date, p.category, discounted", bounds):
+                totals = days[day]
+                totals.units += units
+                if order_id is None:
+                    totals.categories[category] = totals.categories.get(category, 0) + value
+                else:
+                    discounted.setdefault(order_id, (totals, total, {}))[2][category] = value
+        for totals, total, values in discounted.values():
+            for category, amount in split_cents(total, values).items():
+                totals.categories[category] = totals.categories.get(category, 0) + amount
+        for totals in days.values():
+            totals.categories = {category: amount for category, amount in totals.categories.items() if amount}
+        return _sales_periods(((datetime.date.fromisoformat(day), days[day]) for day in sorted(days)), granularity)
+
+    def customer_purchase_history(self, customer_id):
+        return "".join(self.iter_customer_purchase_history(customer_id))
+
+    def get_featured_products(self):
+        featured_products = self._select(_products, f"SELECT {PRODUCT_COLUMNS} FROM products WHERE is_featured "
+                                                    "ORDER BY seq")
+        return featured_products if featured_products else "No featured products available."
+
+    def get_inactive_customers(self):
+        return self._select(_customers, f"SELECT {CUSTOMER_COLUMNS} FROM customers WHERE NOT is_active ORDER BY seq")
+
+    def get_highest_spending_customer(self):
+        top = self._select(_customers, f"SELECT {CUSTOMER_COLUMNS} FROM customers "
+                                       "ORDER BY total_spent DESC, seq LIMIT 1")
+        return top[0] if top else "No customers available."
+
+    def get_orders_by_customer(self, customer_id):
+        customer_orders = self._select(_orders, f"SELECT {ORDER_COLUMNS} FROM orders WHERE customer_id = ? "
+                                                "ORDER BY seq", (customer_id,))
+        return customer_orders if customer_orders else f"No orders found for customer ID {customer_id}."
+
+    def calculate_total_inventory_value(self):
+        with self._reading() as db:
+            return to_dollars(db.execute("SELECT coalesce(sum(stock * price), 0) FROM products").fetchone()[0])
+
+    def find_products_in_price_range(self, min_price, max_price):
+        return self._select(_products, f"SELECT {PRODUCT_COLUMNS} FROM products WHERE price BETWEEN ? AND ? "
+                                       "ORDER BY seq", (to_cents(min_price), to_cents(max_price)))
+
+    def top_selling_products(self, k=10):
+        """Return up to k (product, units sold) pairs, best seller first."""
+        with self._reading() as db:
+            rows = db.execute(f"SELECT {PRODUCT_COLUMNS}, s.units FROM "
+                              "(SELECT product_id, sum(quantity) AS units FROM order_items GROUP BY product_id) AS s "
+                              "JOIN products USING (product_id) ORDER BY s.units DESC, seq LIMIT ?",
+                              (-1 if k is None else k,)).fetchall()
+        return [(_product(row), row[-1]) for row in rows]
+
+    def find_top_selling_product(self):
+        top = self.top_selling_products(1)
+        if not top:
+            return "No sales data available."
+        top_product, units = top[0]
+        return f"Top Selling Product: {top_product.name} (Sold: {units} units)"
+
+    def find_customers_with_high_spending(self, threshold):
+        return self._select(_customers, f"SELECT {CUSTOMER_COLUMNS} FROM customers WHERE total_spent > ? "
+                                        "ORDER BY total_spent DESC, seq", (to_cents(threshold),))
+
+    def find_orders_by_date(self, date_str):
+        return self._select(_orders, f"SELECT {ORDER_COLUMNS} FROM orders WHERE order_date = ? ORDER BY seq",
+                            (_to_date(date_str).isoformat(),))
+
+    def find_most_purchased_product(self):
+        top = self.top_selling_products(1)
+        return top[0][0] if top else "No products have been purchased yet."
+
+    def generate_customer_spending_report(self):
+        with self._reading() as db:
+            rows = db.execute("SELECT name, total_spent FROM customers ORDER BY total_spent DESC, seq").fetchall()
+        return "Customer Spending Report:\n" + "\n".join(f"{name}: ${format_cents(spent)}" for name, spent in rows)
+
+    def generate_customer_order_history(self, customer_id):
+        return "".join(self.iter_customer_order_history(customer_id))
+
+    def stats(self):
+        """Snapshot of the opt-in call metrics; empty unless instrumentation.enable() was called."""
+        from ecommerce import instrumentation
+        return instrumentation.snapshot()
+
+    def cache_stats(self):
+        """Always empty: entities are rebuilt from rows on every query, so there are no rendered strings to reuse."""
+        return {}
+
+    # Streaming and Pagination
+    def _iter_rendered(self, table, page_size=1000):
+        items, token = table.page(page_size)
+        while True:
+            for item in items:
+                yield str(item)
+            if token is None:
+                return
+            items, token = table.page(page_size, token)
+
+    def iter_products(self):
+        """Yield rendered products lazily, in insertion order."""
+        return self._iter_rendered(self.products)
+
+    def iter_customers(self):
+        return self._iter_rendered(self.customers)
+
+    def iter_orders(self):
+        return self._iter_rendered(self.orders)
+
+    def page_products(self, page_size=100, token=None):
+        """Return (rendered products, next_token); pass next_token back to get the next page."""
+        products, token = self.products.page(page_size, token)
+        return [str(product) for product in products], token
+
+    def page_customers(self, page_size=100, token=None):
+        customers, token = self.customers.page(page_size, token)
+        return [str(customer) for customer in customers], token
+
+    def page_orders(self, page_size=100, token=None):
+        orders, token = self.orders.page(page_size, token)
+        return [str(order) for order in orders], token
+
+    def _history(self, customer_id):
+        """Return (customer, orders in placement order) from one snapshot, or (None, []) if unknown."""
+        with self._reading() as db:
+            customers = _customers(db, db.execute(f"SELECT {CUSTOMER_COLUMNS} FROM customers WHERE customer_id = ?",
+                                                  (customer_id,)).fetchall())
+            if not customers:
+                return None, []
+            return customers[0], _orders(db, db.execute(f"SELECT {ORDER_COLUMNS} FROM orders "
+                                                        "WHERE customer_id = ? ORDER BY seq", (customer_id,)))
+
+    def iter_customer_purchase_history(self, customer_id):
+        """Yield the customer_purchase_history text in chunks, one bill at a time."""
+        customer, orders = self._history(customer_id)
+        if customer is None:
+            yield "Customer not found."
+            return
+        if not orders:
+            yield "No purchases found."
+            return
+        yield f"Purchase History for {customer.name}:\n"
+        for position, order in enumerate(orders):
+            yield ("\n" if position else "") + order.get_itemized_bill()
+
+    def iter_customer_order_history(self, customer_id):
+        """Yield the generate_customer_order_history report in chunks, one order at a time."""
+        customer, orders = self._history(customer_id)
+        if customer is None:
+            yield f"No customer found with ID {customer_id}."
+            return
+        if not orders:
+            yield f"No orders found for customer {customer.name}."
+            return
+        yield f"Order History for {customer.name} (ID: {customer.customer_id}):\n\n"
+        for order in orders:
+            items_summary = ", ".join([f"{item.quantity}x {item.product.name}" for item in order.items])
+            yield (
+                f"Order ID: {order.order_id}\n"
+                f"Date: {order.order_date}\n"
+                f"Total: ${format_cents(order.total_cents)}\n"
+                f"Items: {items_summary}\n\n"
+            )
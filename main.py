@@ -1,6 +1,44 @@
+import argparse
+import asyncio
+import sys
+
 from ecommerce.ecommerce import ECommerce
+from ecommerce.persistence import DurableECommerce
+from ecommerce.service import serve
+
+
+def run_import(args):
+    ecommerce = DurableECommerce(args.data_dir) if args.data_dir else ECommerce()
+    try:
+        if args.products:
+            print(f"Imported {ecommerce.import_products(args.products, args.batch_size)} product(s).")
+        if args.customers:
+            print(f"Imported {ecommerce.import_customers(args.customers, args.batch_size)} customer(s).")
+        if args.orders:
+            print(f"Imported {ecommerce.import_orders(args.orders, args.batch_size)} order(s).")
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if args.data_dir:
+            ecommerce.close()
+    return 0
+
+
+def run_service(args):
+    ecommerce = DurableECommerce(args.data_dir) if args.data_dir else ECommerce()
+    try:
+        asyncio.run(serve(ecommerce, args.host, args.port, max_connections=args.max_connections,
+                          max_pending_orders=args.max_pending_orders))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.data_dir:
+            ecommerce.close()
+    return 0
+
 
-def main():
+def run_menu():
     print("Welcome to the E-Commerce Management System!")
     ecommerce = ECommerce()
 
@@ -84,5 +122,32 @@ def main():
         else:
             print("Invalid choice. Please try again.")
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="E-Commerce Management System")
+    subcommands = parser.add_subparsers(dest="command")
+
+    import_parser = subcommands.add_parser("import", help="bulk load CSV or JSONL files")
+    import_parser.add_argument("--products", help="product file (product_id,name,price,stock,category)")
+    import_parser.add_argument("--customers", help="customer file (customer_id,name,email,phone_number)")
+    import_parser.add_argument("--orders", help="order file (order_id,customer_id,product_id,quantity[,order_date])")
+    import_parser.add_argument("--batch-size", type=int, default=10000)
+    import_parser.add_argument("--data-dir", help="persist the imported state to this directory")
+
+    serve_parser = subcommands.add_parser("serve", help="run the HTTP/JSON service")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8080)
+    serve_parser.add_argument("--data-dir", help="load and persist state in this directory")
+    serve_parser.add_argument("--max-connections", type=int, default=1024)
+    serve_parser.add_argument("--max-pending-orders", type=int, default=1024)
+
+    args = parser.parse_args(argv)
+    if args.command == "import":
+        return run_import(args)
+    if args.command == "serve":
+        return run_service(args)
+    run_menu()
+    return 0
+
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import datetime
+import random
+import tempfile
+import unittest
+
+from ecommerce.analytics import AnalyticsEngine, aggregate_shard, encode_shard
+from ecommerce.archive import OrderArchive
+from ecommerce.ecommerce import ECommerce
+
+
+class TestAnalyticsEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.ecommerce = ECommerce()
+        for i in range(20):
+            self.ecommerce.add_product(f"P{i}", f"Product {i}", 5 * (i + 1), 10 ** 6, "Misc")
+        for i in range(15):
+            self.ecommerce.add_customer(f"C{i}", f"Customer {i}", f"c{i}@example.com", "5555555555")
+        rng = random.Random(7)
+        self.first_day = datetime.date(2024, 1, 1)
+        for n in range(300):
+            items = {f"P{i}": rng.randint(1, 5) for i in rng.sample(range(20), rng.randint(1, 4))}
+            self.ecommerce.place_order(f"O{n}", f"C{rng.randrange(15)}", items,
+                                       order_date=self.first_day + datetime.timedelta(days=n % 30))
+
+    def test_parallel_matches_ecommerce(self):
+        engine = AnalyticsEngine(self.ecommerce, workers=2, shard_size=64)
+        self.addCleanup(engine.close)
+        aggregates = engine.aggregate()
+        self.assertEqual(aggregates.order_count, 300)
+        self.assertAlmostEqual(aggregates.total_sales, sum(o.total_cost for o in self.ecommerce.orders))
+        for customer in self.ecommerce.customers:
+            self.assertAlmostEqual(aggregates.customer_spend.get(customer.customer_id, 0),
+                                   customer.get_total_spent())
+        expected_units = {product.product_id: units
+                          for product, units in self.ecommerce.top_selling_products(20)}
+        self.assertEqual(aggregates.product_units, expected_units)
+        self.assertEqual(len(aggregates.daily_revenue), 30)
+        pool = engine._pool
+        self.assertEqual(engine.aggregate().order_count, 300)
+        self.assertIs(engine._pool, pool)
+
+    def test_tracks_orders_changed_after_construction(self):
+        engine = AnalyticsEngine(self.ecommerce, workers=1, shard_size=64)
+        self.addCleanup(engine.close)
+        self.ecommerce.add_customer("C99", "Newcomer", "new@example.com", "5555555555")
+        self.ecommerce.place_order("O999", "C99", {"P3": 2}, order_date=self.first_day)
+        self.ecommerce.apply_order_discount("O5", 50)
+        self.ecommerce.orders.get("O7").order_date = self.first_day + datetime.timedelta(days=40)
+        for n in range(0, 300, 2):
+            self.ecommerce.cancel_order(f"O{n}")
+        aggregates = engine.aggregate()
+        self.assertEqual(aggregates.order_count, 151)
+        self.assertEqual(aggregates.total_sales, sum(o.total_cost for o in self.ecommerce.orders))
+        self.assertEqual(aggregates.customer_spend["C99"], 40)
+        self.assertEqual(aggregates.product_units,
+                         {product.product_id: units for product, units in self.ecommerce.top_selling_products(20)})
+        self.assertIn(self.first_day + datetime.timedelta(days=40), aggregates.daily_revenue)
+        engine.columns._compact()
+        self.assertEqual(vars(engine.aggregate()), vars(aggregates))
+
+        engine.close()
+        self.ecommerce.cancel_order("O999")
+        self.assertEqual(engine.aggregate().order_count, 151)
+
+    def test_date_range_and_reports(self):
+        engine = AnalyticsEngine(self.ecommerce, workers=1, shard_size=50)
+        start, end = self.first_day, self.first_day + datetime.timedelta(days=4)
+        orders = self.ecommerce.get_orders_in_date_range(start, end)
+        aggregates = engine.aggregate(start, end.isoformat())
+        self.assertEqual(aggregates.order_count, len(orders))
+        self.assertEqual(list(aggregates.daily_revenue), [start + datetime.timedelta(days=d) for d in range(5)])
+        self.assertAlmostEqual(aggregates.total_sales, sum(o.total_cost for o in orders))
+
+        self.assertEqual(engine.find_top_selling_product(), self.ecommerce.find_top_selling_product())
+        for i in (97, 98):
+            self.ecommerce.add_customer(f"C{i}", f"Customer {i}", f"c{i}@example.com", "5555555555")
+        self.assertEqual(engine.generate_customer_spending_report(),
+                         self.ecommerce.generate_customer_spending_report())
+        self.assertTrue(engine.generate_customer_spending_report(start, end).endswith("Customer 98: $0.00"))
+        self.assertEqual(AnalyticsEngine(ECommerce()).find_top_selling_product(), "No sales data available.")
+
+    def test_counts_archived_orders(self):
+        engine = AnalyticsEngine(self.ecommerce, workers=1, shard_size=64)
+        days = [self.first_day + datetime.timedelta(days=offset) for offset in range(30)]
+        ranges = [(None, None), (days[3], days[9]), (days[12], None)]
+        expected_aggregates = [engine.aggregate(*dates) for dates in ranges]
+        with tempfile.TemporaryDirectory() as directory:
+            self.ecommerce.archive = OrderArchive(directory, partition="week")
+            self.assertGreater(self.ecommerce.archive_orders(days[15]), 0)
+            for dates, expected in zip(ranges, expected_aggregates):
+                aggregates = engine.aggregate(*dates)
+                self.assertEqual(aggregates.order_count, expected.order_count)
+                self.assertEqual(aggregates.total_sales, expected.total_sales)
+                self.assertEqual(aggregates.customer_spend, expected.customer_spend)
+                self.assertEqual(aggregates.product_units, expected.product_units)
+                self.assertEqual(aggregates.daily_revenue, expected.daily_revenue)
+
+    def test_shard_round_trip(self):
+        orders = list(self.ecommerce.orders)[:3]
+        shard = encode_shard(orders, {f"C{i}": i for i in range(15)}, {f"P{i}": i for i in range(20)})
+        self.assertTrue(all(isinstance(column, bytes) for column in shard))
+        total, count, _, units, _ = aggregate_shard(shard)
+        self.assertEqual(count, 3)
+        self.assertEqual(total, sum(o.total_cents for o in orders))
+        self.assertEqual(sum(units.values()), sum(item.quantity for o in orders for item in o.items))
+
+
+if __name__ == "__main__":
+    unittest.main()
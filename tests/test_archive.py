@@ -0,0 +1,113 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+from ecommerce.archive import OrderArchive
+from ecommerce.ecommerce import ECommerce
+
+DAY = datetime.date(2024, 1, 3)
+CUTOFF = DAY + datetime.timedelta(days=200)
+
+
+def populate(store, orders=40):
+    store.add_product("P1", "Laptop", 1000, 500, "Electronics")
+    store.add_product("P2", "Phone", 499.99, 500, "Electronics")
+    store.add_product("P3", "Shirt", 20, 500, "Clothing")
+    for i in range(6):
+        store.add_customer(f"C{i}", f"Customer {i}", f"c{i}@example.com", "5555555555")
+    for i in range(orders):
+        items = {"P1": 1, "P3": i % 4 + 1} if i % 3 else {"P2": 2}
+        store.place_order(f"O{i}", f"C{i % 6}", items, order_date=DAY + datetime.timedelta(days=9 * i))
+
+
+class TestOrderArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.reference = ECommerce()
+        self.store = ECommerce(archive=OrderArchive(self.directory.name, cached_segments=0))
+        populate(self.reference)
+        populate(self.store)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_queries_span_both_tiers(self):
+        archived = self.store.archive_orders(CUTOFF)
+        self.assertEqual(archived, 23)
+        self.assertEqual(len(self.store.orders), 17)
+        self.assertEqual(len(self.store.archive), 23)
+        self.assertTrue(os.path.exists(os.path.join(self.directory.name, "manifest.json")))
+        for method, args in (("generate_sales_report", ()),
+                             ("generate_sales_report", (DAY, CUTOFF, "month")),
+                             ("sales_by_period", (None, None, "week")),
+                             ("generate_customer_spending_report", ()), ("find_top_selling_product", ()),
+                             ("customer_purchase_history", ("C1",)), ("generate_customer_order_history", ("C2",)),
+                             ("get_orders_by_customer", ("nobody",))):
+            self.assertEqual(getattr(self.store, method)(*args), getattr(self.reference, method)(*args), method)
+        start, end = CUTOFF - datetime.timedelta(days=40), CUTOFF + datetime.timedelta(days=40)
+        for method, args in (("get_orders_in_date_range", (start, end)), ("get_orders_by_customer", ("C3",)),
+                             ("find_orders_by_date", (DAY + datetime.timedelta(days=45),))):
+            self.assertEqual([str(order) for order in getattr(self.store, method)(*args)],
+                             [str(order) for order in getattr(self.reference, method)(*args)], method)
+        self.assertEqual(sorted(c.customer_id for c in self.store.find_customers_purchased_product("P2")),
+                         sorted(c.customer_id for c in self.reference.find_customers_purchased_product("P2")))
+        self.assertEqual(self.store.list_orders(), self.reference.list_orders()[23:])
+        self.assertEqual(self.store.archive_orders(CUTOFF), 0)
+
+    def test_hot_orders_stay_mutable(self):
+        self.store.archive_orders(CUTOFF)
+        with self.assertRaisesRegex(ValueError, "Order not found."):
+            self.store.apply_order_discount("O0", 10)
+        for store in (self.store, self.reference):
+            store.cancel_order("O39")
+            store.apply_order_discount("O30", 50)
+        self.assertEqual(self.store.generate_sales_report(), self.reference.generate_sales_report())
+        self.assertEqual(self.store.generate_customer_spending_report(),
+                         self.reference.generate_customer_spending_report())
+
+    def test_queries_only_open_matching_segments(self):
+        self.store.archive_orders(CUTOFF)
+        archive = self.store.archive
+        self.assertEqual(len(archive._segments), 7)
+        archive.segments_read = 0
+        self.assertEqual(len(self.store.get_orders_in_date_range(datetime.date(2024, 3, 1),
+                                                                 datetime.date(2024, 3, 31))), 3)
+        self.assertEqual(archive.segments_read, 1)
+        archive.segments_read = 0
+        self.assertEqual(len(self.store.get_orders_by_customer("C0")), 7)
+        self.assertEqual(archive.segments_read, 4)
+
+        cached = OrderArchive(self.directory.name, cached_segments=2)
+        store = ECommerce(archive=cached)
+        populate(store, orders=0)
+        store.get_orders_in_date_range(DAY, CUTOFF)
+        store.get_orders_in_date_range(datetime.date(2024, 7, 1), CUTOFF)
+        self.assertEqual(cached.segments_read, 7)
+
+    def test_reopened_archive_keeps_reports_whole(self):
+        self.store.archive_orders()
+        self.assertEqual(len(self.store.orders), 0)
+        store = ECommerce(archive=OrderArchive(self.directory.name, partition="week"))
+        populate(store, orders=0)
+        self.assertEqual(store.generate_sales_report(), self.reference.generate_sales_report())
+        self.assertEqual(store.find_top_selling_product(), self.reference.find_top_selling_product())
+        self.assertEqual(store.customer_purchase_history("C4"), self.reference.customer_purchase_history("C4"))
+        # Bulk imports rebuild every index; the archived totals must come back with them.
+        path = os.path.join(self.directory.name, "products.csv")
+        with open(path, "w") as handle:
+            handle.write("product_id,name,price,stock,category\nP4,Pen,2,10,Office\n")
+        store.import_products(path)
+        self.assertEqual(store.sales_by_period(None, None, "month"),
+                         self.reference.sales_by_period(None, None, "month"))
+
+    def test_rejects_bad_configuration(self):
+        with self.assertRaisesRegex(ValueError, "No order archive configured."):
+            self.reference.archive_orders()
+        with self.assertRaisesRegex(ValueError, "Unsupported partition 'year'."):
+            OrderArchive(self.directory.name, partition="year")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+
+from ecommerce.cache import RenderCache
+from ecommerce.ecommerce import ECommerce, Product
+
+
+class TestRenderCache(unittest.TestCase):
+
+    def test_lru_eviction_and_version_check(self):
+        cache = RenderCache(maxsize=2)
+        products = [Product(f"P{i}", f"Product {i}", 10, 5, "Misc") for i in range(3)]
+        for product in products:
+            cache.render(product)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(cache.render(products[2]), str(products[2]))
+        products[2].apply_discount(50)
+        self.assertEqual(cache.render(products[2]), str(products[2]))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 4, 2))
+        self.assertAlmostEqual(stats["hit_rate"], 0.2)
+        with self.assertRaisesRegex(ValueError, "Cache size"):
+            RenderCache(0)
+
+
+class TestECommerceRenderCache(unittest.TestCase):
+
+    def setUp(self):
+        self.ecommerce = ECommerce()
+        self.ecommerce.add_product("P1", "Laptop", 1000, 10, "Electronics")
+        self.ecommerce.add_product("P2", "Shirt", 20, 10, "Clothing")
+        self.ecommerce.add_customer("C1", "Alice", "alice@example.com", "5555555555")
+        self.ecommerce.place_order("O1", "C1", {"P1": 1})
+
+    def assert_fresh(self):
+        for listing, collection in (("list_products", "products"), ("list_customers", "customers"),
+                                    ("list_orders", "orders")):
+            self.assertEqual(getattr(self.ecommerce, listing)(),
+                             [str(entity) for entity in getattr(self.ecommerce, collection)])
+
+    def test_listings_are_reused_until_something_changes(self):
+        first = self.ecommerce.list_products()
+        first.append("caller's own copy")
+        self.assertEqual(len(self.ecommerce.list_products()), 2)
+        self.assertEqual(self.ecommerce.cache_stats()["listing_hits"], 1)
+        self.ecommerce.restock_product("P2", 5)
+        self.assertIn("Stock: 15", self.ecommerce.list_products()[1])
+        self.assertEqual(self.ecommerce.cache_stats()["listing_hits"], 1)
+        # Only the restocked product had to be rendered again.
+        self.assertEqual(self.ecommerce.cache_stats()["hits"], 1)
+
+    def test_every_mutator_invalidates(self):
+        self.assert_fresh()
+        self.ecommerce.products.get("P1").apply_discount(10)
+        self.ecommerce.products.get("P2").mark_as_featured()
+        self.ecommerce.products.get("P2").update_stock(1)
+        self.assert_fresh()
+        self.ecommerce.products.get("P1").price = 899.5
+        self.assertIn("Price: $899.5", self.ecommerce.list_products()[0])
+        self.assertIn("Price: $899.5", self.ecommerce.page_products()[0][0])
+        self.ecommerce.orders.get("O1").total_cost = 899.5
+        self.assertIn("Total: $899.5", self.ecommerce.list_orders()[0])
+        self.assert_fresh()
+        customer = self.ecommerce.customers.get("C1")
+        customer.update_phone_number("1234567890")
+        self.ecommerce.update_customer_email("C1", "alice@new.com")
+        self.assert_fresh()
+        self.ecommerce.place_order("O2", "C1", {"P1": 2})
+        self.assertIn("Loyalty: Gold", self.ecommerce.list_customers()[0])
+        self.ecommerce.apply_order_discount("O2", 50)
+        self.assert_fresh()
+        self.ecommerce.apply_discount_to_category("Clothing", 50)
+        self.ecommerce.cancel_order("O1")
+        self.ecommerce.add_customer("C2", "Bob", "bob@example.com", "5555555555")
+        self.assert_fresh()
+        self.assertGreater(self.ecommerce.cache_stats()["hit_rate"], 0)
+
+    def test_cache_can_be_disabled(self):
+        ecommerce = ECommerce(render_cache_size=0)
+        ecommerce.add_product("P1", "Laptop", 1000, 10, "Electronics")
+        self.assertEqual(ecommerce.list_products(), [str(ecommerce.products.get("P1"))])
+        self.assertEqual(ecommerce.cache_stats(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+from ecommerce.ecommerce import ECommerce
+from tests import test_ecommerce
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+@unittest.skipUnless(np, "numpy is not installed")
+class TestColumnarECommerce(test_ecommerce.TestECommerce):
+    """Run the full ECommerce suite against the ProductTable storage mode."""
+
+    def create_ecommerce(self):
+        return ECommerce(columnar=True)
+
+    def test_calculate_total_inventory_value(self):
+        # Stock after setup: 9 laptops, 18 phones, 2 tables.
+        self.assertEqual(self.ecommerce.calculate_total_inventory_value(), 9 * 1000 + 18 * 500 + 2 * 150)
+
+    def test_find_products_in_price_range(self):
+        products = self.ecommerce.find_products_in_price_range(100, 500)
+        self.assertEqual([p.product_id for p in products], ["P002", "P003"])
+
+    def test_table_grows_past_capacity(self):
+        ecommerce = ECommerce(columnar=True)
+        ecommerce._product_table = type(ecommerce._product_table)(capacity=2)
+        for i in range(5):
+            ecommerce.add_product(f"P{i}", f"Item {i}", i + 0.5, i, "Misc")
+        self.assertEqual(ecommerce.products.get("P4").price, 4.5)
+        self.assertEqual([p.product_id for p in ecommerce.list_out_of_stock_products()], ["P0"])
+
+
+@unittest.skipUnless(np, "numpy is not installed")
+class TestPercentOff(unittest.TestCase):
+
+    def test_matches_money_percent_off(self):
+        from ecommerce import money
+        from ecommerce.columnar import percent_off
+
+        cents = [1, 5, 50, 150, 250, 267, 1999, 100000, 123456789, 10 ** 12 + 5]
+        for percentage in (0, 10, 15, 50, 33.3, 12.5, 100):
+            self.assertEqual(percent_off(np.array(cents, dtype=np.int64), percentage).tolist(),
+                             [money.percent_off(value, percentage) for value in cents], percentage)
+
+    def test_discount_matches_product_apply_discount(self):
+        prices = [round(i * 0.37 + 0.01, 2) for i in range(2000)]
+        row_store = ECommerce()
+        column_store = ECommerce(columnar=True)
+        for i, price in enumerate(prices):
+            row_store.add_product(f"P{i}", "Item", price, 1, "Misc")
+            column_store.add_product(f"P{i}", "Item", price, 1, "Misc")
+        for percentage in (15, 33.3, 12.5):
+            row_store.apply_discount_to_category("misc", percentage)
+            column_store.apply_discount_to_category("misc", percentage)
+        self.assertEqual([p.price for p in row_store.products], [p.price for p in column_store.products])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import random
+import threading
+import unittest
+
+from ecommerce.ecommerce import ECommerce
+
+PRODUCTS = 6
+INITIAL_STOCK = 150
+WORKERS = 8
+
+
+class TestConcurrentOrders(unittest.TestCase):
+
+    def setUp(self):
+        self.ecommerce = ECommerce()
+        for i in range(PRODUCTS):
+            self.ecommerce.add_product(f"P{i}", f"Product {i}", 10, INITIAL_STOCK, "Misc")
+        for worker in range(WORKERS):
+            self.ecommerce.add_customer(f"C{worker}", f"Customer {worker}", f"c{worker}@example.com", "5555555555")
+
+    def run_workers(self, target):
+        errors = []
+
+        def run(worker):
+            try:
+                target(worker)
+            except Exception as e:  # surfaced in the main thread below
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(worker,)) for worker in range(WORKERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def assert_stock_balances(self):
+        sold = dict.fromkeys(self.ecommerce.products.ids(), 0)
+        for order in self.ecommerce.orders:
+            for item in order.items:
+                sold[item.product.product_id] += item.quantity
+        for product in self.ecommerce.products:
+            self.assertGreaterEqual(product.stock, 0)
+            self.assertEqual(product.stock + sold[product.product_id], INITIAL_STOCK)
+        ranked = {product.product_id: units for product, units in self.ecommerce.top_selling_products(PRODUCTS)}
+        self.assertEqual(ranked, {product_id: units for product_id, units in sold.items() if units})
+
+    def test_no_overselling_under_contention(self):
+        def place_orders(worker):
+            rng = random.Random(worker)
+            for n in range(200):
+                items = {f"P{i}": rng.randint(1, 4) for i in rng.sample(range(PRODUCTS), 3)}
+                try:
+                    self.ecommerce.place_order(f"O{worker}-{n}", f"C{worker}", items)
+                except ValueError as e:
+                    self.assertIn("Not enough stock", str(e))
+
+        self.run_workers(place_orders)
+        self.assert_stock_balances()
+        out_of_stock = self.ecommerce.list_out_of_stock_products()
+        if isinstance(out_of_stock, str):
+            out_of_stock = []
+        self.assertEqual({p.product_id for p in out_of_stock},
+                         {p.product_id for p in self.ecommerce.products if p.stock == 0})
+
+    def test_concurrent_place_cancel_and_restock(self):
+        def churn(worker):
+            rng = random.Random(100 + worker)
+            placed = []
+            for n in range(200):
+                action = rng.random()
+                if action < 0.6:
+                    order_id = f"O{worker}-{n}"
+                    try:
+                        self.ecommerce.place_order(order_id, f"C{worker}", {f"P{rng.randrange(PRODUCTS)}": 2})
+                        placed.append(order_id)
+                    except ValueError:
+                        pass
+                elif action < 0.9 and placed:
+                    self.ecommerce.cancel_order(placed.pop(rng.randrange(len(placed))))
+                else:
+                    # Duplicate IDs across threads must be rejected without leaking stock.
+                    try:
+                        self.ecommerce.place_order("shared", f"C{worker}", {"P0": 1})
+                    except ValueError:
+                        pass
+
+        self.run_workers(churn)
+        self.assert_stock_balances()
+        spent = sum(customer.get_total_spent() for customer in self.ecommerce.customers)
+        self.assertEqual(spent, sum(order.total_cost for order in self.ecommerce.orders))
+
+    def test_failed_multi_item_order_takes_no_stock(self):
+        self.ecommerce.products.get("P5").update_stock(INITIAL_STOCK)
+        with self.assertRaises(ValueError):
+            self.ecommerce.place_order("O1", "C0", {"P0": 5, "P1": 5, "P5": 1})
+        self.assertEqual(self.ecommerce.products.get("P0").stock, INITIAL_STOCK)
+        self.assertEqual(self.ecommerce.products.get("P1").stock, INITIAL_STOCK)
+        self.assertEqual(len(self.ecommerce.orders), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
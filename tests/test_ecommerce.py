@@ -5,8 +5,11 @@ from ecommerce.ecommerce import Product, Customer, Order, ECommerce
 
 class TestECommerce(unittest.TestCase):
 
+    def create_ecommerce(self):
+        return ECommerce()
+
     def setUp(self):
-        self.ecommerce = ECommerce()
+        self.ecommerce = self.create_ecommerce()
 
         # Add sample products
         self.ecommerce.add_product("P001", "Laptop", 1000, 10, "Electronics")
@@ -34,6 +37,18 @@ class TestECommerce(unittest.TestCase):
         self.assertEqual(product.stock, 14)
         self.assertIn("5 units added", response)
 
+    def test_add_duplicate_product(self):
+        with self.assertRaises(ValueError) as context:
+            self.ecommerce.add_product("P001", "Laptop", 1000, 10, "Electronics")
+        self.assertEqual(str(context.exception), "Product P001 already exists.")
+        self.assertEqual(len(self.ecommerce.products), 3)
+
+    def test_product_lookup_by_id(self):
+        product = self.ecommerce.products.get("P002")
+        self.assertEqual(product.name, "Phone")
+        self.assertIsNone(self.ecommerce.products.get("P999"))
+        self.assertEqual(self.ecommerce.products[-1].product_id, "P003")
+
     def test_apply_discount_to_category(self):
         response = self.ecommerce.apply_discount_to_category("Electronics", 10)
         product = next(p for p in self.ecommerce.products if p.product_id == "P001")
@@ -46,6 +61,44 @@ class TestECommerce(unittest.TestCase):
         self.assertEqual(len(out_of_stock), 1)
         self.assertEqual(out_of_stock[0].name, "Laptop")
 
+    def test_out_of_stock_index_follows_stock_changes(self):
+        self.assertEqual(self.ecommerce.list_out_of_stock_products(), "No out-of-stock products found.")
+
+        self.ecommerce.place_order("O003", "C002", {"P003": 2})
+        out_of_stock = self.ecommerce.list_out_of_stock_products()
+        self.assertEqual([p.product_id for p in out_of_stock], ["P003"])
+
+        self.ecommerce.restock_product("P003", 1)
+        self.assertEqual(self.ecommerce.list_out_of_stock_products(), "No out-of-stock products found.")
+
+        self.ecommerce.products.get("P003").update_stock(1)
+        self.assertEqual(len(self.ecommerce.list_out_of_stock_products()), 1)
+
+        self.ecommerce.cancel_order("O003")
+        self.assertEqual(self.ecommerce.list_out_of_stock_products(), "No out-of-stock products found.")
+
+    def test_search_products_by_category(self):
+        results = self.ecommerce.search_products_by_category("electronics")
+        self.assertEqual([p.product_id for p in results], ["P001", "P002"])
+
+        response = self.ecommerce.search_products_by_category("Toys")
+        self.assertEqual(response, "No products found in category 'Toys'.")
+
+    def test_featured_products_and_sale_flag(self):
+        self.assertEqual(self.ecommerce.get_featured_products(), "No featured products available.")
+        product = self.ecommerce.products.get("P002")
+        product.mark_as_featured()
+        self.assertEqual(self.ecommerce.get_featured_products(), [product])
+
+        self.assertFalse(product.is_on_sale())
+        product.original_price = product.price
+        product.apply_discount(20)
+        self.assertTrue(product.is_on_sale())
+
+    def test_entities_reject_undeclared_attributes(self):
+        with self.assertRaises(AttributeError):
+            self.ecommerce.products.get("P001").colour = "silver"
+
     # === Customer Tests ===
     def test_add_customer(self):
         self.ecommerce.add_customer("C003", "Charlie", "charlie@example.com", "5555555555")
@@ -67,6 +120,12 @@ class TestECommerce(unittest.TestCase):
         self.assertEqual(len(recent_purchases), 2)
         self.assertEqual(recent_purchases[0].order_id, "O001")
 
+    def test_deactivate_account(self):
+        self.assertEqual(self.ecommerce.get_inactive_customers(), [])
+        bob = self.ecommerce.customers.get("C002")
+        bob.deactivate_account()
+        self.assertEqual(self.ecommerce.get_inactive_customers(), [bob])
+
     # === Order Tests ===
     def test_place_order(self):
         self.ecommerce.place_order("O003", "C001", {"P002": 1})
@@ -78,6 +137,43 @@ class TestECommerce(unittest.TestCase):
         response = self.ecommerce.cancel_order("O001")
         self.assertIn("Order O001 has been canceled", response)
         self.assertEqual(len(self.ecommerce.orders), 1)
+        self.assertNotIn("O001", self.ecommerce.orders)
+        self.assertEqual(self.ecommerce.products.get("P001").stock, 10)
+
+        with self.assertRaises(ValueError) as context:
+            self.ecommerce.cancel_order("O001")
+        self.assertEqual(str(context.exception), "Order not found.")
+
+    def test_place_order_duplicate_id(self):
+        with self.assertRaises(ValueError):
+            self.ecommerce.place_order("O001", "C002", {"P002": 1})
+        self.assertEqual(self.ecommerce.products.get("P002").stock, 18)
+
+    def test_place_order_rejects_non_positive_quantities(self):
+        for quantity in (0, -3):
+            with self.assertRaises(ValueError) as context:
+                self.ecommerce.place_order("O003", "C001", {"P001": 1, "P002": quantity})
+            self.assertEqual(str(context.exception), "Invalid quantity for product P002.")
+        self.assertEqual(self.ecommerce.products.get("P002").stock, 18)
+        self.assertNotIn("O003", self.ecommerce.orders)
+
+    def test_line_items(self):
+        order = self.ecommerce.orders.get("O001")
+        item = order.items[0]
+        self.assertEqual((item.product.product_id, item.quantity), ("P001", 1))
+        self.assertIs(item['product'], item.product)
+        self.assertEqual(item['quantity'], 1)
+        self.assertEqual(item['price'], item.product.price)
+        with self.assertRaises(KeyError):
+            item['discount']
+        self.assertTrue(order.contains_product("P002"))
+        self.assertIn("2x Phone @ $", order.get_itemized_bill())
+
+    def test_add_gift_message(self):
+        order = self.ecommerce.orders.get("O002")
+        self.assertIsNone(order.gift_message)
+        order.add_gift_message("Enjoy!")
+        self.assertEqual(order.gift_message, "Enjoy!")
 
     def test_get_orders_in_date_range(self):
         customer = next(c for c in self.ecommerce.customers if c.customer_id == "C001")
@@ -95,11 +191,68 @@ class TestECommerce(unittest.TestCase):
         self.assertIn("Order ID: O001", history)
         self.assertIn("Laptop", history)
 
+    def test_paged_listings(self):
+        self.ecommerce.add_product("P004", "Chair", 100, 15, "Furniture")
+        rows, token = self.ecommerce.page_products(page_size=3)
+        self.assertEqual(len(rows), 3)
+        self.assertIn("Laptop", rows[0])
+        rows, token = self.ecommerce.page_products(page_size=3, token=token)
+        self.assertEqual(len(rows), 1)
+        self.assertIn("Chair", rows[0])
+        self.assertIsNone(token)
+
+        rows, token = self.ecommerce.page_orders(page_size=1)
+        self.ecommerce.cancel_order("O001")
+        rows, token = self.ecommerce.page_orders(page_size=1, token=token)
+        self.assertIn("O002", rows[0])
+
+        rows, token = self.ecommerce.page_customers()
+        self.assertEqual((len(rows), token), (2, None))
+
+    def test_streamed_histories_match_wrappers(self):
+        self.ecommerce.place_order("O003", "C001", {"P003": 1})
+        chunks = list(self.ecommerce.iter_customer_order_history("C001"))
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual("".join(chunks), self.ecommerce.generate_customer_order_history("C001"))
+        self.assertTrue(chunks[2].startswith("Order ID: O003"))
+
+        chunks = list(self.ecommerce.iter_customer_purchase_history("C001"))
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual("".join(chunks), self.ecommerce.customer_purchase_history("C001"))
+        self.assertEqual(self.ecommerce.generate_customer_order_history("C999"), "No customer found with ID C999.")
+
     # === Report and Analytics Tests ===
     def test_generate_sales_report(self):
         report = self.ecommerce.generate_sales_report()
         self.assertIn("Total Sales: $2450", report)
 
+    def test_windowed_sales_report(self):
+        self.ecommerce.place_order("O003", "C001", {"P003": 1}, order_date="2024-01-30")
+        self.ecommerce.place_order("O004", "C002", {"P001": 1, "P003": 1}, order_date="2024-02-01")
+        self.ecommerce.place_order("O005", "C002", {"P002": 1}, order_date="2024-02-02")
+        self.ecommerce.apply_order_discount("O004", 50)
+
+        daily = self.ecommerce.sales_by_period("2024-01-01", "2024-02-01")
+        self.assertEqual([(day.isoformat(), revenue, orders, units) for day, revenue, orders, units, _ in daily],
+                         [("2024-01-30", 150, 1, 1), ("2024-02-01", 575, 1, 2)])
+        self.assertEqual(daily[1][4], {"Electronics": 500, "Furniture": 75})
+
+        monthly = self.ecommerce.generate_sales_report("2024-01-01", "2024-12-31", "month")
+        self.assertIn("2024-01-01: $150.00 (1 orders, 1 units)", monthly)
+        self.assertIn("2024-02-01: $1075.00 (2 orders, 3 units)\n  Electronics: $1000.00\n  Furniture: $75.00", monthly)
+        self.assertIn("Total Sales: $1225", monthly)
+        self.assertIn("2024-01-29: $1225.00 (3 orders, 4 units)",
+                      self.ecommerce.generate_sales_report(granularity="week"))
+
+        self.ecommerce.cancel_order("O004")
+        self.ecommerce.orders.get("O005").order_date = datetime.date(2024, 3, 1)
+        self.assertEqual([period[0].month for period in self.ecommerce.sales_by_period("2024-01-01", "2024-12-31",
+                                                                                          "month")], [1, 3])
+        self.assertIn("No sales found", self.ecommerce.generate_sales_report("2024-02-01", "2024-02-29"))
+        self.assertIn("Total Sales: $3100", self.ecommerce.generate_sales_report())
+        with self.assertRaisesRegex(ValueError, "Unsupported granularity 'year'."):
+            self.ecommerce.generate_sales_report(granularity="year")
+
     def test_find_most_purchased_product(self):
         most_purchased = self.ecommerce.find_most_purchased_product()
         self.assertIsNotNone(most_purchased)
@@ -114,6 +267,21 @@ class TestECommerce(unittest.TestCase):
         top_product = self.ecommerce.find_top_selling_product()
         self.assertIn("Top Selling Product: Table (Sold: 3 units)", top_product)
 
+    def test_top_selling_products(self):
+        self.ecommerce.place_order("O003", "C001", {"P002": 4})
+        top = self.ecommerce.top_selling_products(2)
+        self.assertEqual([(p.product_id, units) for p, units in top], [("P002", 6), ("P003", 3)])
+        self.assertEqual(len(self.ecommerce.top_selling_products(10)), 3)
+
+        self.ecommerce.cancel_order("O003")
+        self.ecommerce.cancel_order("O002")
+        top = self.ecommerce.top_selling_products(1)
+        self.assertEqual([(p.product_id, units) for p, units in top], [("P002", 2)])
+
+        self.ecommerce.cancel_order("O001")
+        self.assertEqual(self.ecommerce.find_top_selling_product(), "No sales data available.")
+        self.assertEqual(self.ecommerce.find_most_purchased_product(), "No products have been purchased yet.")
+
     def test_customer_purchase_history(self):
         history = self.ecommerce.customer_purchase_history("C001")
         self.assertIn("Purchase History for Alice:", history)
@@ -139,6 +307,21 @@ class TestECommerce(unittest.TestCase):
             self.ecommerce.update_customer_email("C999", "invalid@example.com")
         self.assertEqual(str(context.exception), "Customer not found.")
 
+    def test_store_level_entity_updates(self):
+        self.assertEqual(self.ecommerce.mark_product_featured("P002"), "Product Phone is now marked as featured.")
+        self.assertEqual([p.product_id for p in self.ecommerce.get_featured_products()], ["P002"])
+        self.assertEqual(self.ecommerce.update_customer_phone("C001", "1112223333"),
+                         "Phone number for Alice updated to 1112223333.")
+        self.assertIn("Phone: 1112223333", str(self.ecommerce.customers.get("C001")))
+        self.assertEqual(self.ecommerce.deactivate_customer("C002"), "Customer Bob's account has been deactivated.")
+        self.assertEqual([c.customer_id for c in self.ecommerce.get_inactive_customers()], ["C002"])
+        for method, args, message in (("mark_product_featured", ("P999",), "Product not found."),
+                                      ("update_customer_phone", ("C999", "1112223333"), "Customer not found."),
+                                      ("update_customer_phone", ("C001", "12-34"), "Invalid phone number format."),
+                                      ("deactivate_customer", ("C999",), "Customer not found.")):
+            with self.assertRaisesRegex(ValueError, message):
+                getattr(self.ecommerce, method)(*args)
+
     def test_get_highest_spending_customer(self):
         highest_spender = self.ecommerce.get_highest_spending_customer()
         self.assertIsNotNone(highest_spender)
@@ -161,6 +344,48 @@ class TestECommerce(unittest.TestCase):
         high_spenders = self.ecommerce.find_customers_with_high_spending(0)
         self.assertEqual(len(high_spenders), 2)  # Charlie has not made purchases yet
 
+    def test_running_spend_and_loyalty_tiers(self):
+        alice = self.ecommerce.customers.get("C001")
+        self.assertEqual(alice.get_total_spent(), 2000)
+        self.assertEqual(self.ecommerce.get_customers_by_loyalty("silver"), [alice])
+
+        self.ecommerce.place_order("O003", "C001", {"P002": 1})
+        self.assertEqual(alice.get_total_spent(), 2500)
+        self.assertEqual(self.ecommerce.get_customers_by_loyalty("Silver"), [])
+        self.assertEqual(self.ecommerce.get_customers_by_loyalty("Gold"), [alice])
+
+        self.ecommerce.orders.get("O003").apply_order_discount(50)
+        self.assertEqual(alice.get_total_spent(), 2250)
+
+        self.ecommerce.cancel_order("O003")
+        self.assertEqual(alice.get_total_spent(), 2000)
+        self.assertEqual(len(alice.purchase_history), 1)
+        self.assertEqual(self.ecommerce.get_customers_by_loyalty("Silver"), [alice])
+
+    def test_spending_queries_follow_cancellations(self):
+        self.ecommerce.cancel_order("O001")
+        self.assertEqual(self.ecommerce.get_highest_spending_customer().customer_id, "C002")
+        self.assertEqual(self.ecommerce.find_customers_with_high_spending(100)[0].customer_id, "C002")
+        report = self.ecommerce.generate_customer_spending_report()
+        self.assertEqual(report, "Customer Spending Report:\nBob: $450.00\nAlice: $0.00")
+
+    def test_find_customers_purchased_product(self):
+        buyers = self.ecommerce.find_customers_purchased_product("P002")
+        self.assertEqual([c.customer_id for c in buyers], ["C001"])
+        self.assertEqual(self.ecommerce.find_customers_purchased_product("P999"), [])
+
+        alice = self.ecommerce.customers.get("C001")
+        self.ecommerce.place_order("O003", "C001", {"P002": 1})
+        self.ecommerce.place_order("O004", "C002", {"P002": 1})
+        self.ecommerce.cancel_order("O001")
+        self.assertTrue(alice.has_purchased_product("P002"))
+        self.assertFalse(alice.has_purchased_product("P001"))
+        self.assertEqual(self.ecommerce.find_customers_purchased_product("P001"), [])
+
+        self.ecommerce.cancel_order("O003")
+        buyers = self.ecommerce.find_customers_purchased_product("P002")
+        self.assertEqual([c.customer_id for c in buyers], ["C002"])
+
     def test_find_orders_by_date(self):
         target_date = datetime.date.today().strftime("%Y-%m-%d")
         orders = self.ecommerce.find_orders_by_date(target_date)
@@ -173,6 +398,20 @@ class TestECommerce(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.ecommerce.find_orders_by_date("invalid-date")
 
+    def test_date_queries_accept_date_objects(self):
+        today = datetime.date.today()
+        self.ecommerce.place_order("O003", "C001", {"P002": 1})
+        self.ecommerce.orders.get("O003").order_date = today - datetime.timedelta(days=3)
+
+        orders = self.ecommerce.get_orders_in_date_range(today - datetime.timedelta(days=7), today)
+        self.assertEqual([o.order_id for o in orders], ["O003", "O001", "O002"])
+        self.assertEqual(len(self.ecommerce.find_orders_by_date(today)), 2)
+
+        self.ecommerce.cancel_order("O003")
+        response = self.ecommerce.get_orders_in_date_range(today - datetime.timedelta(days=7),
+                                                           today - datetime.timedelta(days=1))
+        self.assertEqual(response, "No orders found in the given date range.")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,135 @@
+import datetime
+import json
+import os
+import tempfile
+import unittest
+
+from ecommerce.ecommerce import ECommerce
+from ecommerce.importer import batched, iter_orders
+
+
+class TestBulkImport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.ecommerce = ECommerce()
+
+    def write(self, name, text):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write(text)
+        return path
+
+    def load_catalog(self):
+        products = self.write("products.csv",
+                              "product_id,name,price,stock,category\n"
+                              "P001,Laptop,1000,10,Electronics\n"
+                              "P002,Phone,500,1,Electronics\n"
+                              "P003,Table,150,5,Furniture\n")
+        customers = self.write("customers.jsonl",
+                               '{"customer_id": "C001", "name": "Alice", "email": "a@example.com", '
+                               '"phone_number": "1234567890"}\n'
+                               '\n'
+                               '{"customer_id": "C002", "name": "Bob", "email": "b@example.com", '
+                               '"phone_number": "9876543210"}\n')
+        self.assertEqual(self.ecommerce.import_products(products, batch_size=2), 3)
+        self.assertEqual(self.ecommerce.import_customers(customers), 2)
+
+    def test_import_products_and_customers(self):
+        self.load_catalog()
+        self.assertEqual(self.ecommerce.products.get("P002").price, 500)
+        self.assertEqual(len(self.ecommerce.search_products_by_category("electronics")), 2)
+        self.assertEqual(len(self.ecommerce.get_customers_by_loyalty("Bronze")), 2)
+
+    def test_import_orders_from_csv(self):
+        self.load_catalog()
+        orders = self.write("orders.csv",
+                            "order_id,customer_id,product_id,quantity,order_date\n"
+                            "O001,C001,P001,1,2024-03-01\n"
+                            "O001,C001,P002,1,2024-03-01\n"
+                            "O002,C002,P003,5,2024-03-02\n")
+        self.assertEqual(self.ecommerce.import_orders(orders), 2)
+
+        self.assertEqual(self.ecommerce.customers.get("C001").get_total_spent(), 1500)
+        self.assertEqual(len(self.ecommerce.find_orders_by_date(datetime.date(2024, 3, 2))), 1)
+        self.assertEqual([p.product_id for p in self.ecommerce.list_out_of_stock_products()], ["P002", "P003"])
+        self.assertIn("Table (Sold: 5 units)", self.ecommerce.find_top_selling_product())
+        buyers = self.ecommerce.find_customers_purchased_product("P001")
+        self.assertEqual([c.customer_id for c in buyers], ["C001"])
+
+        # Indexes keep tracking changes made after the import.
+        self.ecommerce.cancel_order("O002")
+        self.assertEqual([p.product_id for p in self.ecommerce.list_out_of_stock_products()], ["P002"])
+
+    def test_order_batch_is_validated_against_stock_up_front(self):
+        self.load_catalog()
+        orders = self.write("orders.jsonl", "\n".join(json.dumps(record) for record in [
+            {"order_id": "O001", "customer_id": "C001", "items": {"P001": 1}},
+            {"order_id": "O002", "customer_id": "C002", "items": {"P002": 1}},
+            {"order_id": "O003", "customer_id": "C001", "items": {"P002": 1}},
+        ]))
+        with self.assertRaises(ValueError) as context:
+            self.ecommerce.import_orders(orders)
+        self.assertEqual(str(context.exception), "Not enough stock for product Phone.")
+        self.assertEqual(len(self.ecommerce.orders), 0)
+        self.assertEqual(self.ecommerce.products.get("P001").stock, 10)
+
+    def test_bad_date_or_quantity_mid_batch_changes_nothing(self):
+        self.load_catalog()
+        for bad in ({"order_date": "2024-13-45"}, {"items": {"P001": 0}}):
+            records = [{"order_id": "O001", "customer_id": "C001", "items": {"P001": 2}, "order_date": "2024-03-01"},
+                       dict({"order_id": "O002", "customer_id": "C002", "items": {"P001": 3}}, **bad)]
+            with self.assertRaises(ValueError):
+                self.ecommerce.import_orders(self.write("orders.jsonl", "\n".join(map(json.dumps, records))))
+            self.assertEqual(len(self.ecommerce.orders), 0)
+            self.assertEqual(self.ecommerce.products.get("P001").stock, 10)
+
+    def test_imported_indexes_match_placing_orders_one_by_one(self):
+        self.load_catalog()
+        reference = ECommerce()
+        for product in self.ecommerce.products:
+            reference.add_product(product.product_id, product.name, product.price, product.stock, product.category)
+        for customer in self.ecommerce.customers:
+            reference.add_customer(customer.customer_id, customer.name, customer.email, customer.phone_number)
+        records = [{"order_id": f"O{i}", "customer_id": f"C00{i % 2 + 1}", "items": {f"P00{i % 2 * 2 + 1}": 1},
+                    "order_date": f"2024-03-0{i % 4 + 1}"} for i in range(5)]
+        records.append({"order_id": "O5", "customer_id": "C002", "items": {"P003": 3}, "order_date": "2024-03-02"})
+        self.ecommerce.import_orders(self.write("orders.jsonl", "\n".join(map(json.dumps, records))))
+        for record in records:
+            reference.place_order(record["order_id"], record["customer_id"], record["items"], record["order_date"])
+        for store in (self.ecommerce, reference):
+            store.add_customer("C003", "Carol", "c@example.com", "5555555555")
+        self.assertEqual(*[[(product.product_id, units) for product, units in store.top_selling_products()]
+                           for store in (self.ecommerce, reference)])
+        self.assertEqual(*[[customer.customer_id for customer in store.get_customers_by_loyalty("Bronze")]
+                           for store in (self.ecommerce, reference)])
+        for method in ("generate_customer_spending_report", "sales_by_period", "find_top_selling_product"):
+            self.assertEqual(getattr(self.ecommerce, method)(), getattr(reference, method)(), method)
+
+    def test_duplicate_ids_rejected(self):
+        self.load_catalog()
+        products = self.write("more.csv", "product_id,name,price,stock,category\nP001,Dup,1,1,Misc\n")
+        with self.assertRaises(ValueError):
+            self.ecommerce.import_products(products)
+
+    def test_unsupported_format(self):
+        path = self.write("products.xml", "<products/>")
+        with self.assertRaises(ValueError):
+            self.ecommerce.import_products(path)
+
+    def test_iter_orders_merges_consecutive_csv_rows(self):
+        path = self.write("orders.csv",
+                          "order_id,customer_id,product_id,quantity\n"
+                          "O1,C1,P1,1\nO1,C1,P2,2\nO1,C1,P1,1\nO2,C2,P1,3\n")
+        self.assertEqual(list(iter_orders(path)), [
+            ("O1", "C1", {"P1": 2, "P2": 2}, None),
+            ("O2", "C2", {"P1": 3}, None),
+        ])
+
+    def test_batched(self):
+        self.assertEqual(list(batched(range(5), 2)), [[0, 1], [2, 3], [4]])
+
+
+if __name__ == "__main__":
+    unittest.main()
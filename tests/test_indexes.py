@@ -0,0 +1,159 @@
+import datetime
+import random
+import time
+import unittest
+
+from ecommerce.indexes import DateIndex, IndexedCollection, RankedIndex, SortedKeys
+
+
+class Item:
+    def __init__(self, item_id):
+        self.item_id = item_id
+
+
+class TestIndexedCollection(unittest.TestCase):
+
+    def setUp(self):
+        self.collection = IndexedCollection("item_id", "Item")
+        for i in range(10):
+            self.collection.add(Item(f"I{i}"))
+
+    def ids(self, items):
+        return [item.item_id for item in items]
+
+    def test_pages_cover_collection_once(self):
+        seen = []
+        items, token = self.collection.page(4)
+        while True:
+            seen.extend(self.ids(items))
+            if token is None:
+                break
+            items, token = self.collection.page(4, token)
+        self.assertEqual(seen, [f"I{i}" for i in range(10)])
+
+    def test_tokens_survive_removals_and_adds(self):
+        items, token = self.collection.page(3)
+        self.collection.remove("I3")
+        self.collection.remove("I1")
+        self.collection.add(Item("I10"))
+        items, token = self.collection.page(3, token)
+        self.assertEqual(self.ids(items), ["I4", "I5", "I6"])
+
+    def test_tokens_resume_after_compaction(self):
+        collection = IndexedCollection("item_id", "Item")
+        for i in range(3000):
+            collection.add(Item(i))
+        items, token = collection.page(10)
+        for i in range(20, 2500):
+            collection.remove(i)
+        self.assertEqual(collection._generation, 1)
+        items, token = collection.page(15, token)
+        self.assertEqual(self.ids(items), list(range(10, 20)) + list(range(2500, 2505)))
+
+        collection.remove(2504)
+        for i in range(2505, 2800):
+            collection.remove(i)
+        with self.assertRaises(ValueError) as context:
+            collection.page(5, token)
+        self.assertEqual(str(context.exception), "Continuation token has expired.")
+
+    def test_invalid_token(self):
+        with self.assertRaises(ValueError):
+            self.collection.page(5, "not-a-token")
+        with self.assertRaises(ValueError):
+            self.collection.page(0)
+
+    def test_positional_access(self):
+        self.assertEqual(self.collection[0].item_id, "I0")
+        self.assertEqual(self.collection[-1].item_id, "I9")
+        with self.assertRaises(IndexError):
+            self.collection[10]
+
+
+class TestSortedKeys(unittest.TestCase):
+
+    def test_stays_sorted_across_chunks(self):
+        keys = SortedKeys()
+        keys.CHUNK = 4
+        values = list(range(200))
+        random.Random(3).shuffle(values)
+        for value in values:
+            keys.add(value)
+        self.assertEqual(list(keys.irange(-1)), list(range(200)))
+        for value in values[:150]:
+            keys.remove(value)
+        keys.update([500, -1])
+        self.assertEqual(list(keys.irange(0)), sorted(values[150:]) + [500])
+        self.assertEqual(len(keys), 52)
+        self.assertEqual(list(reversed(keys)), [500] + sorted(values[150:], reverse=True) + [-1])
+        with self.assertRaises(KeyError):
+            keys.remove(values[0])
+
+
+class TestRankedIndex(unittest.TestCase):
+
+    def test_top_and_above_break_ties_by_registration(self):
+        ranking = RankedIndex()
+        for key, score in [("a", 5), ("b", 7), ("c", 5), ("d", 1)]:
+            ranking.set(key, score)
+        self.assertEqual(ranking.top(), ["b", "a", "c", "d"])
+        self.assertEqual(ranking.top(2), ["b", "a"])
+        self.assertEqual(ranking.above(5), ["b"])
+        ranking.set("b", 0)
+        ranking.discard("a")
+        self.assertEqual(ranking.top(), ["c", "d", "b"])
+        self.assertEqual(ranking.score("a"), 0)
+
+    def test_rebuild_matches_incremental_sets(self):
+        pairs = [("a", 5), ("b", 7), ("c", 5), ("d", 1), ("e", 0)]
+        incremental, rebuilt = RankedIndex(), RankedIndex()
+        for key, score in pairs:
+            incremental.set(key, score)
+        rebuilt.set("stale", 9)
+        rebuilt.rebuild(pairs)
+        for ranking in (incremental, rebuilt):
+            ranking.set("f", 5)
+        self.assertEqual(rebuilt.top(), incremental.top())
+        self.assertEqual(rebuilt.above(4), ["b", "a", "c", "f"])
+        self.assertEqual(len(rebuilt), 6)
+
+    def test_updates_touch_one_chunk(self):
+        ranking = RankedIndex()
+        for i in range(5000):
+            ranking.set(i, 0)
+        for i in range(0, 5000, 7):
+            ranking.set(i, i)
+        chunks = ranking._entries._chunks
+        self.assertLessEqual(max(map(len, chunks)), 2 * SortedKeys.CHUNK)
+        self.assertEqual(ranking.top(3), [4998, 4991, 4984])
+
+    def test_adding_keys_stays_roughly_linear(self):
+        def per_key(count):
+            best = float("inf")
+            for _ in range(3):
+                ranking = RankedIndex()
+                start = time.perf_counter()
+                for i in range(count):
+                    # New customers start at zero spend, the head of the sorted order.
+                    ranking.set(i, 0)
+                best = min(best, time.perf_counter() - start)
+            return best / count
+        # A flat sorted list makes each insert O(n), so the per-key cost would grow about tenfold here.
+        self.assertLess(per_key(200000) / per_key(20000), 3)
+
+
+class TestDateIndex(unittest.TestCase):
+
+    def test_between_and_on(self):
+        index = DateIndex()
+        day = datetime.date(2024, 1, 1)
+        for offset, key in [(2, "x"), (0, "y"), (5, "z"), (2, "w")]:
+            index.add(day + datetime.timedelta(days=offset), key, key)
+        self.assertEqual(list(index.between(day, day + datetime.timedelta(days=2))), ["y", "x", "w"])
+        index.remove(day + datetime.timedelta(days=5), "z")
+        self.assertEqual(list(index.between(day, day + datetime.timedelta(days=9))), ["y", "x", "w"])
+        self.assertEqual(index.on(day + datetime.timedelta(days=2)), ["x", "w"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+
+from ecommerce import instrumentation
+from ecommerce.ecommerce import Customer, ECommerce
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        instrumentation.reset()
+        self.original_place_order = ECommerce.place_order
+        self.ecommerce = ECommerce()
+        self.ecommerce.add_product("P1", "Laptop", 1000, 10, "Electronics")
+        self.ecommerce.add_customer("C1", "Alice", "alice@example.com", "5555555555")
+
+    def tearDown(self):
+        instrumentation.stop_profiling()
+        instrumentation.disable()
+        instrumentation.reset()
+
+    def test_disabled_means_no_wrappers_and_no_metrics(self):
+        self.assertFalse(instrumentation.is_enabled())
+        self.ecommerce.place_order("O1", "C1", {"P1": 1})
+        self.assertEqual(self.ecommerce.stats(), {})
+        instrumentation.enable()
+        self.assertIsNot(ECommerce.place_order, self.original_place_order)
+        instrumentation.disable()
+        self.assertIs(ECommerce.place_order, self.original_place_order)
+
+    def test_counts_latency_and_result_sizes(self):
+        instrumentation.enable()
+        instrumentation.enable()
+        for n in range(5):
+            self.ecommerce.place_order(f"O{n}", "C1", {"P1": 1})
+        with self.assertRaises(ValueError):
+            self.ecommerce.place_order("O9", "C1", {"P1": 100})
+        self.ecommerce.list_orders()
+        list(self.ecommerce.iter_orders())
+
+        stats = self.ecommerce.stats()
+        place = stats["ECommerce.place_order"]
+        self.assertEqual((place["calls"], place["errors"]), (6, 1))
+        self.assertLessEqual(place["p50_seconds"], place["p95_seconds"])
+        self.assertLessEqual(place["p99_seconds"], place["max_seconds"])
+        self.assertEqual(stats["ECommerce.list_orders"]["max_result_size"], 5)
+        self.assertEqual(stats["ECommerce.iter_orders"]["mean_result_size"], 5)
+        self.assertEqual(stats["Customer.add_purchase"]["calls"], 5)
+        self.assertNotIn("ECommerce.stats", stats)
+
+        text = instrumentation.prometheus_text()
+        self.assertIn('ecommerce_call_seconds_count{method="ECommerce.place_order"} 6', text)
+        self.assertIn('ecommerce_call_seconds_bucket{method="ECommerce.place_order",le="+Inf"} 6', text)
+        self.assertIn('ecommerce_call_errors_total{method="ECommerce.place_order"} 1', text)
+
+    def test_snapshot_merges_exported_metrics(self):
+        instrumentation.enable()
+        for n in range(3):
+            self.ecommerce.place_order(f"O{n}", "C1", {"P1": 1})
+        exported = instrumentation.export()
+        place = instrumentation.snapshot()["ECommerce.place_order"]
+        merged = instrumentation.snapshot([exported, exported])["ECommerce.place_order"]
+        self.assertEqual(merged["calls"], 3 * place["calls"])
+        self.assertAlmostEqual(merged["total_seconds"], 3 * place["total_seconds"])
+        self.assertEqual(merged["max_seconds"], place["max_seconds"])
+        self.assertEqual(instrumentation.snapshot()["ECommerce.place_order"], place)
+
+    def test_sampling_profiler(self):
+        instrumentation.enable([Customer])
+        instrumentation.start_profiling(sample_rate=1.0)
+        self.ecommerce.place_order("O1", "C1", {"P1": 1})
+        profile = instrumentation.stop_profiling()
+        functions = {name for _, _, name in profile.stats}
+        self.assertIn("add_purchase", functions)
+        with self.assertRaisesRegex(ValueError, "Sample rate"):
+            instrumentation.start_profiling(0)
+
+    def test_histogram_percentiles(self):
+        histogram = instrumentation.LatencyHistogram()
+        for _ in range(99):
+            histogram.record(0.001)
+        histogram.record(1.0)
+        self.assertLess(histogram.percentile(0.5), 0.0011)
+        self.assertGreater(histogram.percentile(0.5), 0.0005)
+        self.assertEqual(histogram.percentile(1.0), 1.0)
+        self.assertIsNone(instrumentation.LatencyHistogram().percentile(0.5))
+
+
+if __name__ == "__main__":
+    unittest.main()
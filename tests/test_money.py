@@ -0,0 +1,114 @@
+import datetime
+import random
+import unittest
+
+from ecommerce.ecommerce import ECommerce
+from ecommerce.money import format_cents, percent_off, split_cents, to_cents, to_dollars
+from ecommerce.sharding import ShardedECommerce
+from ecommerce.sqlstore import SQLiteECommerce
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DAY = datetime.date(2024, 2, 1)
+
+
+class TestMoneyHelpers(unittest.TestCase):
+
+    def test_conversions(self):
+        self.assertEqual([to_cents(amount) for amount in (19.99, 0.1, 1000, 4.5, 0.07 * 3)],
+                         [1999, 10, 100000, 450, 21])
+        self.assertEqual([to_dollars(cents) for cents in (1750, 100000, 1999, -5)], [17.5, 1000, 19.99, -0.05])
+        self.assertIsInstance(to_dollars(100000), int)
+        self.assertEqual([format_cents(cents) for cents in (0, 5, 123405, -1999, 10 ** 15 - 1, -(10 ** 17 + 7))],
+                         ["0.00", "0.05", "1234.05", "-19.99", "9999999999999.99", "-1000000000000000.07"])
+        self.assertEqual([percent_off(cents, 10) for cents in (100000, 1999, 5, 15)], [90000, 1799, 4, 14])
+
+    def test_split_is_whole_cents_summing_to_the_total(self):
+        self.assertEqual(split_cents(100, {"a": 1, "b": 1, "c": 1}), {"a": 34, "b": 33, "c": 33})
+        self.assertEqual(split_cents(100, {"c": 1, "b": 1, "a": 1}), {"a": 34, "b": 33, "c": 33})
+        self.assertEqual(split_cents(0, {"a": 0}), {"a": 0})
+        rng = random.Random(1)
+        for _ in range(500):
+            weights = {f"k{i}": rng.randrange(1, 10 ** 6) for i in range(rng.randrange(1, 6))}
+            total = rng.randrange(sum(weights.values()) + 1)
+            shares = split_cents(total, weights)
+            self.assertEqual(sum(shares.values()), total)
+            self.assertTrue(all(abs(shares[key] - total * weight / sum(weights.values())) < 1
+                                for key, weight in weights.items()))
+
+
+class TestExactAggregates(unittest.TestCase):
+
+    def populate(self, store, orders=600):
+        store.add_product("P1", "Sticker", 0.1, 10 ** 6, "Paper")
+        store.add_product("P2", "Mug", 19.99, 10 ** 6, "Kitchen")
+        store.add_product("P3", "Pin", 0.07, 10 ** 6, "Paper")
+        for i in range(7):
+            store.add_customer(f"C{i}", f"Customer {i}", f"c{i}@example.com", "5555555555")
+        rng = random.Random(7)
+        for i in range(orders):
+            items = {"P1": rng.randrange(1, 9), "P2": rng.randrange(0, 3), "P3": rng.randrange(1, 5)}
+            store.place_order(f"O{i}", f"C{i % 7}", {product_id: quantity for product_id, quantity in items.items()
+                                                      if quantity},
+                              order_date=DAY + datetime.timedelta(days=i % 40))
+            if i % 5 == 0:
+                store.apply_order_discount(f"O{i}", 33.3)
+
+    def test_totals_are_exact_and_cancel_back_to_zero(self):
+        store = ECommerce()
+        self.populate(store)
+        orders = list(store.orders)
+        total = sum(order.total_cents for order in orders)
+        self.assertEqual(store.generate_sales_report(), f"Total Sales: ${to_dollars(total)}")
+        self.assertEqual(sum(customer._spent_cents for customer in store.customers), total)
+        for period, revenue, _, _, categories in store._period_totals(None, None, "week"):
+            self.assertEqual(sum(categories.values()), revenue, period)
+        self.assertEqual(sum(revenue for _, revenue, *_ in store._period_totals(None, None, "day")), total)
+
+        for order in orders:
+            store.cancel_order(order.order_id)
+        self.assertEqual(store.generate_sales_report(), "Total Sales: $0")
+        self.assertEqual(store.sales_by_period(), [])
+        self.assertEqual({customer.get_total_spent() for customer in store.customers}, {0})
+
+    def test_other_stores_agree_to_the_cent(self):
+        reference = ECommerce()
+        self.populate(reference, orders=200)
+        for store in (SQLiteECommerce(), ShardedECommerce(partitions=3)):
+            try:
+                self.populate(store, orders=200)
+                for method, args in (("generate_sales_report", ()), ("generate_sales_report", (None, DAY, "week")),
+                                     ("sales_by_period", (None, None, "month")),
+                                     ("generate_customer_spending_report", ()),
+                                     ("calculate_total_inventory_value", ())):
+                    self.assertEqual(getattr(store, method)(*args), getattr(reference, method)(*args),
+                                     (type(store).__name__, method))
+            finally:
+                store.close()
+
+
+    def test_dollar_bounds_are_compared_in_whole_cents(self):
+        stores = [ECommerce(), SQLiteECommerce(), ShardedECommerce(partitions=2)]
+        if np is not None:
+            stores.append(ECommerce(columnar=True))
+        for store in stores:
+            name = type(store).__name__
+            store.add_product("P1", "Gum", 0.29, 10, "Snacks")
+            store.add_product("P2", "Mug", 19.99, 10, "Kitchen")
+            store.add_customer("C1", "Ann", "a@example.com", "5555555555")
+            store.add_customer("C2", "Bob", "b@example.com", "5555555555")
+            store.place_order("O1", "C1", {"P1": 1})
+            store.place_order("O2", "C2", {"P2": 1})
+            self.assertEqual([p.product_id for p in store.find_products_in_price_range(0.29, 0.29)], ["P1"], name)
+            self.assertEqual([p.product_id for p in store.find_products_in_price_range(0.3, 19.99)], ["P2"], name)
+            self.assertEqual([c.customer_id for c in store.find_customers_with_high_spending(0.29)], ["C2"], name)
+            self.assertEqual(store.find_customers_with_high_spending(19.99), [], name)
+            if hasattr(store, "close"):
+                store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
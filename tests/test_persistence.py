@@ -0,0 +1,194 @@
+import datetime
+import os
+import tempfile
+import threading
+import unittest
+
+from ecommerce.archive import OrderArchive
+from ecommerce.persistence import DurableECommerce, Journal
+
+
+class TestDurableECommerce(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.data_dir = os.path.join(self.tmpdir.name, "state")
+
+    def open_store(self, **kwargs):
+        store = DurableECommerce(self.data_dir, **kwargs)
+        self.addCleanup(store.close)
+        return store
+
+    def populate(self, store):
+        store.add_product("P001", "Laptop", 1000, 10, "Electronics")
+        store.add_product("P002", "Phone", 500, 20, "Electronics")
+        store.add_customer("C001", "Alice", "alice@example.com", "1234567890")
+        store.place_order("O001", "C001", {"P001": 1, "P002": 2}, order_date="2024-05-01")
+        store.place_order("O002", "C001", {"P002": 1})
+        store.cancel_order("O002")
+        store.restock_product("P001", 5)
+        store.apply_discount_to_category("electronics", 10)
+        store.apply_order_discount("O001", 50)
+        store.update_customer_email("C001", "alice@new.example.com")
+
+    def assert_recovered(self, store):
+        self.assertEqual(store.products.get("P001").stock, 14)
+        self.assertEqual(store.products.get("P002").stock, 18)
+        self.assertEqual(store.products.get("P002").price, 450)
+        self.assertEqual(store.customers.get("C001").email, "alice@new.example.com")
+        self.assertEqual(store.customers.get("C001").get_total_spent(), 1000)
+        self.assertEqual(list(store.orders.ids()), ["O001"])
+        self.assertEqual(store.orders.get("O001").order_date, datetime.date(2024, 5, 1))
+        self.assertEqual(len(store.find_orders_by_date("2024-05-01")), 1)
+        self.assertEqual(store.sales_by_period("2024-05-01", "2024-05-01")[0][1:4], (1000, 1, 3))
+        self.assertEqual([item.price for item in store.orders.get("O001").items], [1000, 500])
+
+    def test_recovers_from_journal(self):
+        store = DurableECommerce(self.data_dir)
+        self.populate(store)
+        store.close()
+        self.assert_recovered(self.open_store())
+
+    def test_recovers_from_snapshot_and_tail(self):
+        store = DurableECommerce(self.data_dir, snapshot_every=4)
+        self.populate(store)
+        store.products.get("P001").mark_as_featured()
+        store.snapshot()
+        store.add_customer("C002", "Bob", "bob@example.com", "9876543210")
+        store.close()
+
+        files = sorted(os.listdir(self.data_dir))
+        self.assertEqual(files, ["journal-000000000011.log", "snapshot-000000000010.json.gz"])
+
+        recovered = self.open_store()
+        self.assert_recovered(recovered)
+        self.assertTrue(recovered.products.get("P001").is_featured)
+        self.assertIn("C002", recovered.customers)
+        recovered.place_order("O003", "C002", {"P001": 1})
+        recovered.close()
+        self.assertIn("O003", self.open_store().orders)
+
+    def test_entity_updates_are_journaled(self):
+        store = DurableECommerce(self.data_dir)
+        self.populate(store)
+        store.mark_product_featured("P002")
+        store.update_customer_phone("C001", "1112223333")
+        store.deactivate_customer("C001")
+        store.close()
+
+        recovered = self.open_store()
+        self.assert_recovered(recovered)
+        self.assertEqual([p.product_id for p in recovered.get_featured_products()], ["P002"])
+        self.assertEqual(recovered.customers.get("C001").phone_number, "1112223333")
+        self.assertFalse(recovered.customers.get("C001").is_active)
+
+    def test_archived_orders_are_not_replayed_into_memory(self):
+        archive_dir = os.path.join(self.tmpdir.name, "archive")
+        store = DurableECommerce(self.data_dir, archive=OrderArchive(archive_dir))
+        store.add_product("P001", "Mug", 10, 10, "Kitchen")
+        store.add_customer("C001", "Alice", "alice@example.com", "1234567890")
+        store.place_order("O1", "C001", {"P001": 1}, order_date="2024-01-05")
+        store.place_order("O2", "C001", {"P001": 1}, order_date="2024-03-05")
+        self.assertEqual(store.archive_orders("2024-02-01"), 1)
+        store.close()
+
+        for snapshot in (False, True):
+            recovered = self.open_store(archive=OrderArchive(archive_dir))
+            self.assertEqual(list(recovered.orders.ids()), ["O2"])
+            self.assertEqual(len(recovered.archive), 1)
+            self.assertEqual(recovered.generate_sales_report(), "Total Sales: $20")
+            self.assertEqual(recovered.top_selling_products()[0][1], 2)
+            self.assertEqual(recovered.customers.get("C001").get_total_spent(), 20)
+            self.assertTrue(recovered.customers.get("C001").has_purchased_product("P001"))
+            self.assertEqual([order.order_id for order in recovered.get_orders_in_date_range("2024-01-01",
+                                                                                             "2024-12-31")],
+                             ["O1", "O2"])
+            if not snapshot:
+                recovered.snapshot()
+            recovered.close()
+
+    def test_orders_for_other_products_are_not_held_up(self):
+        store = DurableECommerce(self.data_dir)
+        self.populate(store)
+        # An order waiting on P001's stock must not stop one for P002.
+        with store._product_locks["P001"]:
+            waiting = threading.Thread(target=store.place_order, args=("O003", "C001", {"P001": 1}, "2024-05-02"))
+            waiting.start()
+            other = threading.Thread(target=store.place_order, args=("O004", "C001", {"P002": 1}, "2024-05-02"))
+            other.start()
+            other.join(timeout=5)
+            self.assertFalse(other.is_alive())
+            self.assertIn("O004", store.orders)
+            self.assertTrue(waiting.is_alive())
+        waiting.join()
+        store.close()
+
+        recovered = self.open_store()
+        self.assertEqual(list(recovered.orders.ids()), ["O001", "O004", "O003"])
+        self.assertEqual((recovered.products.get("P001").stock, recovered.products.get("P002").stock), (13, 17))
+
+    def test_concurrent_mutations_replay_to_the_same_state(self):
+        store = DurableECommerce(self.data_dir, snapshot_every=50)
+        store.add_product("P001", "Pen", 1, 100, "Office")
+        store.add_customer("C001", "Alice", "alice@example.com", "1234567890")
+
+        def place(worker):
+            for i in range(40):
+                order_id = f"O{worker}-{i}"
+                try:
+                    store.place_order(order_id, "C001", {"P001": 1}, "2024-05-01")
+                except ValueError:
+                    store.restock_product("P001", 3)
+                    continue
+                if i % 3 == 0:
+                    store.cancel_order(order_id)
+                elif i % 5 == 0:
+                    store.apply_discount_to_category("office", 10)
+
+        threads = [threading.Thread(target=place, args=(worker,)) for worker in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        expected = (store.products.get("P001").stock, store.products.get("P001").price, list(store.orders.ids()),
+                    store.generate_sales_report())
+        store.close()
+
+        recovered = self.open_store(snapshot_every=50)
+        self.assertEqual((recovered.products.get("P001").stock, recovered.products.get("P001").price,
+                          list(recovered.orders.ids()), recovered.generate_sales_report()), expected)
+
+    def test_torn_final_record_is_ignored(self):
+        store = DurableECommerce(self.data_dir)
+        self.populate(store)
+        store.close()
+        (journal,) = [name for name in os.listdir(self.data_dir) if name.startswith("journal-")]
+        with open(os.path.join(self.data_dir, journal), "ab") as handle:
+            handle.write(b'[11,"add_customer",["C002"')
+
+        recovered = self.open_store()
+        self.assert_recovered(recovered)
+        self.assertNotIn("C002", recovered.customers)
+
+    def test_failed_mutations_are_not_journaled(self):
+        store = DurableECommerce(self.data_dir)
+        store.add_product("P001", "Laptop", 1000, 1, "Electronics")
+        store.add_customer("C001", "Alice", "alice@example.com", "1234567890")
+        with self.assertRaises(ValueError):
+            store.place_order("O001", "C001", {"P001": 2})
+        store.close()
+        self.assertEqual(len(self.open_store().orders), 0)
+
+    def test_journal_groups_fsyncs(self):
+        path = os.path.join(self.tmpdir.name, "journal.log")
+        journal = Journal(path, batch_size=3, flush_interval=60)
+        for seq in range(1, 5):
+            journal.append(seq, "cancel_order", [f"O{seq}"])
+        self.assertEqual(journal._pending, 1)
+        journal.close()
+        self.assertEqual([seq for seq, _, _ in Journal.read(path)], [1, 2, 3, 4])
+
+
+if __name__ == "__main__":
+    unittest.main()
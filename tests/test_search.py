@@ -0,0 +1,92 @@
+import os
+import random
+import tempfile
+import unittest
+
+from ecommerce.ecommerce import ECommerce
+from ecommerce.search import SearchIndex, match_rank, normalize
+from ecommerce.sharding import ShardedECommerce
+from ecommerce.sqlstore import SQLiteECommerce
+
+NAMES = ["Ann Smith", "John Smith", "Smithers Burns", "Jane Doe", "Zoë Ångström", "Jo", "O'Neil Kane",
+         "Johnny Appleseed", "Ann Smith"]
+QUERIES = ["smi", "jo", "john s", "mith", "ers", "neil", "o'n", "example", "ÅNG", "zoe", "j", "  ANN ", "zz", "",
+           "e.c", "@exa"]
+
+
+def populate(store):
+    for i, name in enumerate(NAMES):
+        store.add_product(f"P{i}", name.split()[-1] + " Widget", 10, 10, "Misc")
+        store.add_customer(f"C{i}", name, f"{name.split()[0].lower()}.{i}@example.com", "5555555555")
+
+
+class TestSearchIndex(unittest.TestCase):
+
+    def test_matches_the_ranking_of_a_full_scan(self):
+        rng = random.Random(5)
+        words = ["ann", "anne", "bob", "smith", "smithson", "doe", "ng", "jo", "ohn"]
+        entries = {f"K{i}": (" ".join(rng.choices(words, k=2)), f"{rng.choice(words)}{i}@mail.com") for i in range(300)}
+        index = SearchIndex()
+        index.update((key, key, texts) for key, texts in list(entries.items())[:150])
+        for key, texts in list(entries.items())[150:]:
+            index.add(key, key, *texts)
+        for key in list(entries)[::7]:
+            entries[key] = (entries[key][0], f"moved.{key}@example.org")
+            index.add(key, key, *entries[key])
+        for key in list(entries)[::11]:
+            index.remove(key)
+            del entries[key]
+        for query in ["s", "smith", "ann s", "mit", "ohn", "hn", "0@mail", "example", "on", "nothing"]:
+            for limit in (1, 5, 500):
+                expected = sorted((match_rank(normalize(query), texts), key) for key, texts in entries.items()
+                                  if match_rank(normalize(query), texts) is not None)[:limit]
+                self.assertEqual([(rank, key) for rank, key, _ in index.search(query, limit)], expected,
+                                 (query, limit))
+        self.assertEqual(len(index), len(entries))
+
+
+class TestStoreSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.store = ECommerce()
+        populate(self.store)
+
+    def test_search_products_and_customers(self):
+        self.assertEqual([p.product_id for p in self.store.search_products("smi")], ["P0", "P1", "P8"])
+        self.assertEqual([c.customer_id for c in self.store.search_customers("smi", limit=2)], ["C0", "C1"])
+        self.assertEqual([c.customer_id for c in self.store.search_customers("john")], ["C1", "C7"])
+        self.assertEqual([c.customer_id for c in self.store.search_customers("ångs")], ["C4"])
+        self.assertEqual(self.store.search_customers("   "), [])
+
+    def test_index_follows_changes(self):
+        self.store.add_customer("C99", "Zed", "zed@example.com", "5555555555")
+        self.assertEqual([c.customer_id for c in self.store.search_customers("zed")], ["C99"])
+        self.store.update_customer_email("C99", "nobody@elsewhere.net")
+        self.assertEqual([c.customer_id for c in self.store.search_customers("elsewhere")], ["C99"])
+        self.assertEqual([c.customer_id for c in self.store.search_customers("example", 100)],
+                         [f"C{i}" for i in range(9)])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "products.csv")
+            with open(path, "w") as handle:
+                handle.write("product_id,name,price,stock,category\nP50,Smithy Hammer,2,10,Tools\n")
+            self.store.import_products(path)
+        self.assertEqual([p.product_id for p in self.store.search_products("smi")], ["P0", "P1", "P8", "P50"])
+        self.assertEqual([c.customer_id for c in self.store.search_customers("elsewhere")], ["C99"])
+
+    def test_other_stores_rank_the_same_way(self):
+        sharded = ShardedECommerce(partitions=3)
+        sql = SQLiteECommerce()
+        try:
+            for store in (sharded, sql):
+                populate(store)
+                for query in QUERIES:
+                    for method in ("search_products", "search_customers"):
+                        self.assertEqual([e.name for e in getattr(store, method)(query, 4)],
+                                         [e.name for e in getattr(self.store, method)(query, 4)], (method, query))
+        finally:
+            sharded.close()
+            sql.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
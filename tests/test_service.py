@@ -0,0 +1,151 @@
+import asyncio
+import json
+import unittest
+
+from ecommerce.ecommerce import ECommerce
+from ecommerce.service import ECommerceService
+
+
+class Client:
+    """Minimal keep-alive HTTP/1.1 client for exercising the service."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, port):
+        return cls(*await asyncio.open_connection("127.0.0.1", port))
+
+    async def request(self, method, path, payload=None, headers=""):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\n{headers}\r\n"
+                          .encode() + body)
+        await self.writer.drain()
+        status_line = await self.reader.readline()
+        if not status_line:
+            return None, None, {}
+        response_headers = {}
+        while (line := await self.reader.readline()) != b"\r\n":
+            name, _, value = line.decode().partition(":")
+            response_headers[name.lower()] = value.strip()
+        data = await self.reader.readexactly(int(response_headers["content-length"]))
+        return int(status_line.split()[1]), json.loads(data), response_headers
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+class TestECommerceService(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.ecommerce = ECommerce()
+        self.ecommerce.add_product("P001", "Laptop", 1000, 10, "Electronics")
+        self.ecommerce.add_product("P002", "Phone", 500, 20, "Electronics")
+        self.ecommerce.add_customer("C001", "Alice", "alice@example.com", "1234567890")
+        self.service = await ECommerceService(self.ecommerce, port=0, max_pending_orders=64).start()
+        self.client = await Client.connect(self.service.port)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.service.close()
+
+    async def test_read_endpoints_share_one_connection(self):
+        status, products, headers = await self.client.request("GET", "/products?category=electronics")
+        self.assertEqual((status, len(products)), (200, 2))
+        self.assertEqual(headers["connection"], "keep-alive")
+
+        status, product, _ = await self.client.request("GET", "/products/P002")
+        self.assertEqual((status, product["name"]), (200, "Phone"))
+
+        status, body, _ = await self.client.request("GET", "/customers/C999")
+        self.assertEqual((status, body), (404, {"error": "Customer not found."}))
+
+        status, body, _ = await self.client.request("GET", "/reports/inventory-value")
+        self.assertEqual(body, {"inventory_value": 20000})
+
+        status, products, _ = await self.client.request("GET", "/products?q=pho")
+        self.assertEqual([product["name"] for product in products], ["Phone"])
+        status, customers, _ = await self.client.request("GET", "/customers?q=example&limit=x")
+        self.assertEqual([customer["customer_id"] for customer in customers], ["C001"])
+
+    async def test_concurrent_orders_are_batched(self):
+        clients = [await Client.connect(self.service.port) for _ in range(10)]
+        try:
+            responses = await asyncio.gather(*(
+                client.request("POST", "/orders", {"order_id": f"O{i}", "customer_id": "C001", "items": {"P002": 2}})
+                for i, client in enumerate(clients)))
+        finally:
+            for client in clients:
+                await client.close()
+        self.assertEqual(sorted(status for status, _, _ in responses), [201] * 10)
+        self.assertEqual(self.ecommerce.products.get("P002").stock, 0)
+
+        status, body, _ = await self.client.request(
+            "POST", "/orders", {"order_id": "O99", "customer_id": "C001", "items": {"P002": 1}})
+        self.assertEqual((status, body), (400, {"error": "Not enough stock for product Phone."}))
+
+        status, top, _ = await self.client.request("GET", "/reports/top-products?k=1")
+        self.assertEqual(top, [{"product": top[0]["product"], "units_sold": 20}])
+
+        status, periods, _ = await self.client.request("GET", "/reports/sales?granularity=month")
+        self.assertEqual((status, len(periods), periods[0]["orders"], periods[0]["units"]), (200, 1, 10, 20))
+        status, body, _ = await self.client.request("GET", "/reports/sales?granularity=year")
+        self.assertEqual((status, body), (400, {"error": "Unsupported granularity 'year'."}))
+
+    async def test_malformed_order_fails_alone_in_its_batch(self):
+        clients = [await Client.connect(self.service.port) for _ in range(5)]
+        try:
+            responses = await asyncio.gather(*(client.request("POST", "/orders", payload) for client, payload in zip(
+                clients, [{"order_id": "O1", "customer_id": "C001", "items": {"P001": 1}},
+                          {"order_id": "O2", "customer_id": "C001", "items": [["P001", 1]]},
+                          {"order_id": "O3", "customer_id": "C001", "items": {"P001": "2"}},
+                          {"order_id": "O4", "customer_id": "C001", "items": {"P001": 0}},
+                          {"order_id": "O5", "customer_id": "C001", "items": {"P001": -3}}])))
+        finally:
+            for client in clients:
+                await client.close()
+        self.assertEqual([status for status, _, _ in responses], [201, 400, 400, 400, 400])
+        self.assertEqual(responses[1][1], {"error": "Missing or invalid field: 'items' must map product IDs to "
+                                                    "positive integer quantities"})
+        self.assertEqual(list(self.ecommerce.orders.ids()), ["O1"])
+        self.assertEqual(self.ecommerce.products.get("P001").stock, 9)
+
+    async def test_write_endpoints(self):
+        status, customer, _ = await self.client.request(
+            "POST", "/customers", {"customer_id": "C002", "name": "Bob", "email": "b@example.com",
+                                   "phone_number": "9876543210"})
+        self.assertEqual((status, customer["loyalty"]), (201, "Bronze"))
+
+        status, _, _ = await self.client.request("POST", "/orders", {"order_id": "O1", "customer_id": "C002",
+                                                                      "items": {"P001": 2}})
+        self.assertEqual(status, 201)
+        status, body, _ = await self.client.request("DELETE", "/orders/O1")
+        self.assertEqual((status, body["message"]), (200, "Order O1 has been canceled and stock returned."))
+        status, _, _ = await self.client.request("DELETE", "/orders/O1")
+        self.assertEqual(status, 404)
+
+        status, body, _ = await self.client.request("POST", "/products", {"product_id": "P003"})
+        self.assertEqual(status, 400)
+        status, _, _ = await self.client.request("PUT", "/products")
+        self.assertEqual(status, 405)
+
+    async def test_connection_close_is_honoured(self):
+        status, _, headers = await self.client.request("GET", "/orders", headers="Connection: close\r\n")
+        self.assertEqual((status, headers["connection"]), (200, "close"))
+        self.assertEqual(await self.client.reader.read(), b"")
+
+    async def test_connection_limit(self):
+        self.service.max_connections = 1
+        extra = await Client.connect(self.service.port)
+        try:
+            status, _, headers = await extra.request("GET", "/products")
+        finally:
+            await extra.close()
+        self.assertEqual(status, 503)
+        self.assertEqual(headers["retry-after"], "1")
+
+
+if __name__ == "__main__":
+    unittest.main()
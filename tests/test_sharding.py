@@ -0,0 +1,222 @@
+import datetime
+import json
+import multiprocessing
+import os
+import pickle
+import tempfile
+import unittest
+
+from ecommerce import instrumentation
+from ecommerce.ecommerce import Customer, ECommerce
+from ecommerce.sharding import ShardedECommerce
+
+DAY = datetime.date(2024, 3, 1)
+
+
+def populate(store):
+    store.add_product("P1", "Laptop", 1000, 50, "Electronics")
+    store.add_product("P2", "Phone", 500, 50, "Electronics")
+    store.add_product("P3", "Shirt", 20, 100, "Clothing")
+    for i in range(12):
+        store.add_customer(f"C{i}", f"Customer {i}", f"c{i}@example.com", "5555555555")
+    for i in range(12):
+        items = {"P1": i % 3, "P2": 1, "P3": i + 1} if i % 3 else {"P2": 2, "P3": i + 1}
+        store.place_order(f"O{i}", f"C{i}", items, order_date=DAY + datetime.timedelta(days=i % 4))
+
+
+class TestShardedECommerce(unittest.TestCase):
+
+    def setUp(self):
+        self.reference = ECommerce()
+        self.sharded = ShardedECommerce(partitions=3)
+        populate(self.reference)
+        populate(self.sharded)
+
+    def test_customers_are_spread_across_partitions(self):
+        sizes = [len(partition.store.customers) for partition in self.sharded._partitions]
+        self.assertEqual(sum(sizes), 12)
+        self.assertGreater(min(sizes), 0)
+
+    def test_queries_match_a_single_store(self):
+        self.assertEqual(self.sharded.generate_sales_report(), self.reference.generate_sales_report())
+        self.assertEqual(self.sharded.generate_sales_report(DAY, DAY + datetime.timedelta(days=30), "week"),
+                         self.reference.generate_sales_report(DAY, DAY + datetime.timedelta(days=30), "week"))
+        self.assertEqual(self.sharded.generate_customer_spending_report().splitlines()[1:],
+                         self.reference.generate_customer_spending_report().splitlines()[1:])
+        self.assertEqual(self.sharded.find_top_selling_product(), self.reference.find_top_selling_product())
+        self.assertEqual([(p.product_id, units) for p, units in self.sharded.top_selling_products()],
+                         [(p.product_id, units) for p, units in self.reference.top_selling_products()])
+        self.assertEqual(self.sharded.get_highest_spending_customer().customer_id,
+                         self.reference.get_highest_spending_customer().customer_id)
+        for level in ("Bronze", "Silver", "Gold", "Platinum"):
+            self.assertEqual(sorted(c.customer_id for c in self.sharded.get_customers_by_loyalty(level)),
+                             sorted(c.customer_id for c in self.reference.get_customers_by_loyalty(level)))
+        self.assertEqual(sorted(c.customer_id for c in self.sharded.find_customers_purchased_product("P1")),
+                         sorted(c.customer_id for c in self.reference.find_customers_purchased_product("P1")))
+        self.assertEqual([c.get_total_spent() for c in self.sharded.find_customers_with_high_spending(1000)],
+                         [c.get_total_spent() for c in self.reference.find_customers_with_high_spending(1000)])
+        dates = [o.order_date for o in self.sharded.get_orders_in_date_range(DAY, DAY + datetime.timedelta(days=2))]
+        self.assertEqual(dates, sorted(dates))
+        self.assertEqual(len(dates), 9)
+        self.assertEqual(self.sharded.customer_purchase_history("C4"), self.reference.customer_purchase_history("C4"))
+
+    def test_entity_updates_reach_the_owning_store(self):
+        for store in (self.sharded, self.reference):
+            store.mark_product_featured("P3")
+            store.update_customer_phone("C5", "1112223333")
+            store.deactivate_customer("C7")
+        self.assertEqual([p.product_id for p in self.sharded.get_featured_products()], ["P3"])
+        self.assertEqual([str(c) for c in self.sharded.get_inactive_customers()],
+                         [str(c) for c in self.reference.get_inactive_customers()])
+        self.assertEqual(self.sharded.customer_purchase_history("C5"), self.reference.customer_purchase_history("C5"))
+        self.assertIn("Phone: 1112223333", str(self.sharded._route("C5").store.customers.get("C5")))
+
+    def test_stock_is_shared_by_all_partitions(self):
+        self.assertEqual(self.sharded.products.get("P3").stock, self.reference.products.get("P3").stock)
+        with self.assertRaisesRegex(ValueError, "Not enough stock"):
+            self.sharded.place_order("O99", "C0", {"P2": 1, "P3": 100})
+        self.assertEqual(self.sharded.products.get("P2").stock, 34)
+        self.assertEqual(self.sharded.cancel_order("O5"), "Order O5 has been canceled and stock returned.")
+        self.assertEqual(self.sharded.products.get("P3").stock, 100 - sum(range(1, 13)) + 6)
+        with self.assertRaisesRegex(ValueError, "Order not found."):
+            self.sharded.cancel_order("O5")
+
+    def test_order_ids_are_unique_across_partitions(self):
+        with self.assertRaisesRegex(ValueError, "Order O1 already exists."):
+            self.sharded.place_order("O1", "C2", {"P3": 1})
+        with self.assertRaisesRegex(ValueError, "Customer not found."):
+            self.sharded.place_order("O50", "missing", {"P3": 1})
+        self.assertEqual(self.sharded.products.get("P3").stock, 100 - sum(range(1, 13)))
+        self.sharded.place_order("O50", "C2", {"P3": 1})
+
+    def test_discount_reaches_partition_replicas(self):
+        self.sharded.apply_discount_to_category("Clothing", 50)
+        self.sharded.place_order("O60", "C7", {"P3": 2})
+        order = [o for o in self.sharded.get_orders_by_customer("C7") if o.order_id == "O60"][0]
+        self.assertEqual(order.total_cost, 20)
+
+    def test_paging_covers_every_customer_once(self):
+        rendered, token = self.sharded.page_customers(page_size=5)
+        while token is not None:
+            page, token = self.sharded.page_customers(page_size=5, token=token)
+            self.assertLessEqual(len(page), 5)
+            rendered.extend(page)
+        self.assertEqual(sorted(rendered), sorted(self.reference.list_customers()))
+        self.assertEqual(sorted(self.sharded.list_orders()), sorted(self.reference.list_orders()))
+        with self.assertRaisesRegex(ValueError, "Invalid continuation token."):
+            self.sharded.page_customers(token="9:")
+
+    def test_bulk_import_routes_rows(self):
+        sharded = ShardedECommerce(partitions=2)
+        with tempfile.TemporaryDirectory() as directory:
+            paths = {}
+            for name, text in (("products.csv", "product_id,name,price,stock,category\nP1,Pen,2.5,10,Office\n"),
+                               ("customers.csv", "customer_id,name,email,phone_number\n"
+                                                 "A,Ann,a@x.com,5555555555\nB,Bob,b@x.com,5555555555\n"),
+                               ("orders.csv", "order_id,customer_id,product_id,quantity\nO1,A,P1,3\nO2,B,P1,4\n"),
+                               ("too_many.csv", "order_id,customer_id,product_id,quantity\nO3,A,P1,1\nO4,B,P1,9\n")):
+                paths[name] = os.path.join(directory, name)
+                with open(paths[name], "w") as handle:
+                    handle.write(text)
+            self.assertEqual(sharded.import_products(paths["products.csv"]), 1)
+            self.assertEqual(sharded.import_customers(paths["customers.csv"]), 2)
+            self.assertEqual(sharded.import_orders(paths["orders.csv"]), 2)
+            with self.assertRaisesRegex(ValueError, "Not enough stock"):
+                sharded.import_orders(paths["too_many.csv"])
+        self.assertEqual(sharded.products.get("P1").stock, 3)
+        self.assertEqual(sharded.generate_sales_report(), "Total Sales: $17.5")
+        self.assertEqual(len(sharded.list_orders()), 2)
+
+
+    def test_failed_order_import_leaves_no_orders_behind(self):
+        customer_ids = ["C0", "C1", "C2", "C3"]
+        failing = self.sharded._route("C3").store
+        record_orders = failing.record_orders
+
+        def record_then_fail(batch):
+            record_orders(batch)
+            raise RuntimeError("Partition failed.")
+        failing.record_orders = record_then_fail
+        records = [{"order_id": f"N{i}", "customer_id": customer_id, "items": {"P3": 1}, "order_date": "2024-03-01"}
+                   for i, customer_id in enumerate(customer_ids)]
+        sales = self.sharded.generate_sales_report()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "orders.jsonl")
+            for bad_records in (records, records[:2] + [dict(records[2], order_date="2024-02-30")]):
+                with open(path, "w") as handle:
+                    handle.write("\n".join(map(json.dumps, bad_records)))
+                with self.assertRaises((RuntimeError, ValueError)):
+                    self.sharded.import_orders(path)
+                self.assertEqual(self.sharded.generate_sales_report(), sales)
+                self.assertEqual(len(self.sharded.list_orders()), 12)
+                self.assertEqual(self.sharded.products.get("P3").stock, 100 - sum(range(1, 13)))
+        with self.assertRaisesRegex(ValueError, "Order not found."):
+            self.sharded.cancel_order("N0")
+
+    def test_stats_cover_the_catalog_and_every_partition(self):
+        for _ in range(2):
+            self.sharded.list_products()
+            self.sharded.list_customers()
+        stats = self.sharded.cache_stats()
+        stores = [self.sharded.catalog] + [partition.store for partition in self.sharded._partitions]
+        for key in ("hits", "misses", "entries", "listing_hits"):
+            self.assertEqual(stats[key], sum(store.cache_stats()[key] for store in stores), key)
+        self.assertGreaterEqual(stats["hits"], 12)
+        self.assertEqual(stats["listing_hits"], 1)
+        self.assertGreater(stats["hit_rate"], 0)
+
+        instrumentation.reset()
+        instrumentation.enable()
+        try:
+            self.sharded.add_customer("C20", "Customer 20", "c20@example.com", "5555555555")
+            self.sharded.add_customer("C21", "Customer 21", "c21@example.com", "5555555555")
+            # In-process partitions share this process's metrics and are not counted twice.
+            self.assertEqual(self.sharded.stats()["ECommerce.add_customer"]["calls"], 2)
+        finally:
+            instrumentation.disable()
+            instrumentation.reset()
+
+
+class TestProcessPartitions(unittest.TestCase):
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == "fork", "workers inherit instrumentation by fork")
+    def test_stats_merge_worker_process_metrics(self):
+        instrumentation.reset()
+        instrumentation.enable()
+        try:
+            with ShardedECommerce(partitions=2, processes=True) as sharded:
+                populate(sharded)
+                stats = sharded.stats()
+        finally:
+            instrumentation.disable()
+            instrumentation.reset()
+        self.assertEqual(stats["ECommerce.add_product"]["calls"], 3)
+        self.assertEqual(stats["ECommerce.add_customer"]["calls"], 12)
+        self.assertEqual(stats["Customer.add_purchase"]["calls"], 12)
+        self.assertLessEqual(stats["Customer.add_purchase"]["p50_seconds"],
+                             stats["Customer.add_purchase"]["max_seconds"])
+
+    def test_partitions_in_worker_processes(self):
+        with ShardedECommerce(partitions=2, processes=True) as sharded:
+            populate(sharded)
+            reference = ECommerce()
+            populate(reference)
+            self.assertEqual(sharded.generate_sales_report(), reference.generate_sales_report())
+            buyers = sharded.find_customers_purchased_product("P1")
+            self.assertTrue(all(isinstance(customer, Customer) for customer in buyers))
+            self.assertEqual(len(buyers), 8)
+            self.assertEqual(sharded.cancel_order("O0"), "Order O0 has been canceled and stock returned.")
+            with self.assertRaisesRegex(ValueError, "Customer C1 already exists."):
+                sharded.add_customer("C1", "Again", "again@example.com", "5555555555")
+
+    def test_entities_pickle_without_their_store(self):
+        store = ECommerce()
+        populate(store)
+        customer = pickle.loads(pickle.dumps(store.customers.get("C3")))
+        self.assertIsNone(customer._owner)
+        self.assertEqual(customer.purchase_history[0].customer, customer)
+        self.assertEqual(customer.get_total_spent(), store.customers.get("C3").get_total_spent())
+
+
+if __name__ == "__main__":
+    unittest.main()
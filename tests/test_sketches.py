@@ -0,0 +1,136 @@
+import pickle
+import random
+import unittest
+
+from ecommerce.ecommerce import ECommerce
+from ecommerce.sketches import CountMinSketch, HeavyHitters, HyperLogLog, OrderSketches
+
+
+class TestCountMinSketch(unittest.TestCase):
+
+    def test_estimates_stay_within_bounds(self):
+        rng = random.Random(1)
+        sketch = CountMinSketch(epsilon=0.01, delta=0.01)
+        exact = {}
+        for _ in range(20000):
+            key = f"P{int(rng.paretovariate(1.2))}"
+            sketch.add(key)
+            exact[key] = exact.get(key, 0) + 1
+        errors = [sketch.estimate(key) - count for key, count in exact.items()]
+        self.assertGreaterEqual(min(errors), 0)
+        self.assertLessEqual(max(errors), 0.01 * sketch.total)
+        self.assertGreaterEqual(sketch.estimate("never seen"), 0)
+
+    def test_merge_matches_a_single_sketch(self):
+        whole, left, right = CountMinSketch(), CountMinSketch(), CountMinSketch()
+        for i in range(1000):
+            whole.add(f"K{i % 37}", i % 5)
+            (left if i % 2 else right).add(f"K{i % 37}", i % 5)
+        merged = pickle.loads(pickle.dumps(left)).merge(right)
+        self.assertEqual([merged.estimate(f"K{i}") for i in range(37)], [whole.estimate(f"K{i}") for i in range(37)])
+        self.assertEqual(merged.total, whole.total)
+        with self.assertRaisesRegex(ValueError, "different dimensions"):
+            merged.merge(CountMinSketch(epsilon=0.1))
+        with self.assertRaisesRegex(ValueError, "Error bounds"):
+            CountMinSketch(epsilon=0)
+
+
+class TestHeavyHitters(unittest.TestCase):
+
+    def test_tracks_the_biggest_keys(self):
+        hitters = HeavyHitters(k=5)
+        rng = random.Random(2)
+        for _ in range(5000):
+            hitters.add(f"P{rng.randrange(200)}")
+        for rank, key in enumerate(("A", "B", "C")):
+            hitters.add(key, 1000 - 100 * rank)
+        self.assertEqual([key for key, _ in hitters.top(3)], ["A", "B", "C"])
+        self.assertEqual(len(hitters.top()), 5)
+
+        other = HeavyHitters(k=5)
+        other.add("D", 5000)
+        self.assertEqual(hitters.merge(other).top(1)[0][0], "D")
+
+
+class TestHyperLogLog(unittest.TestCase):
+
+    def test_count_is_within_three_standard_errors(self):
+        for distinct in (50, 5000, 100000):
+            sketch = HyperLogLog(precision=12)
+            for i in range(distinct):
+                sketch.add(f"C{i}")
+                sketch.add(f"C{i}")
+            self.assertLess(abs(sketch.count() - distinct), 3 * sketch.standard_error * distinct + 1, distinct)
+
+    def test_merge_is_a_union(self):
+        left, right, whole = HyperLogLog(), HyperLogLog(), HyperLogLog()
+        for i in range(3000):
+            (left if i < 2000 else right).add(i)
+            whole.add(i)
+        right.add(5)
+        self.assertEqual(left.merge(right).count(), whole.count())
+        with self.assertRaisesRegex(ValueError, "Precision"):
+            HyperLogLog(precision=20)
+
+
+    def test_sparse_until_an_eighth_of_the_registers_are_set(self):
+        sparse, dense = HyperLogLog(), HyperLogLog()
+        dense._densify()
+        for i in range(100):
+            sparse.add(i)
+            dense.add(i)
+        self.assertEqual(sparse._registers, None)
+        self.assertEqual(sparse.count(), dense.count())
+        self.assertLessEqual(sparse._sparse.itemsize * len(sparse._sparse), 4 * 100)
+        for i in range(100, 200):
+            sparse.add(i)
+            dense.add(i)
+        self.assertEqual(sparse._registers, dense._registers)
+
+        left, right, whole = HyperLogLog(), HyperLogLog(), HyperLogLog()
+        for i in range(1000):
+            (left if i < 50 else right).add(i)
+            whole.add(i)
+        self.assertEqual(left.merge(right)._registers, whole._registers)
+        self.assertEqual(HyperLogLog().merge(left).count(), left.count())
+
+
+class TestOrderSketches(unittest.TestCase):
+
+    def setUp(self):
+        self.store = ECommerce(sketches=OrderSketches(top_k=3, precision=12))
+        self.store.add_product("P1", "Laptop", 1000, 10000, "Electronics")
+        self.store.add_product("P2", "Phone", 500, 10000, "Electronics")
+        self.store.add_product("P3", "Shirt", 20, 10000, "Clothing")
+        for i in range(300):
+            self.store.add_customer(f"C{i}", f"Customer {i}", f"c{i}@example.com", "5555555555")
+        for i in range(600):
+            items = {"P3": 2} if i % 3 else {"P1": 1, "P2": 1}
+            self.store.place_order(f"O{i}", f"C{i % 300}", items)
+
+    def test_fed_by_place_order(self):
+        sketches = self.store.sketches
+        self.assertEqual(sketches.orders, 600)
+        self.assertEqual(sketches.heavy_hitters(1), [("P3", 800)])
+        self.assertEqual(sketches.estimated_units("P1"), 200)
+        self.assertEqual(sketches.distinct_buyers("P9"), 0)
+        exact = len(self.store.find_customers_purchased_product("P1"))
+        self.assertAlmostEqual(sketches.distinct_buyers("P1"), exact, delta=3 * exact * 1.04 / 64)
+        self.assertAlmostEqual(sketches.distinct_buyers_in_category("electronics"), exact, delta=3 * exact * 1.04 / 64)
+        self.assertAlmostEqual(sketches.distinct_buyers_in_category("Clothing"), 200, delta=20)
+
+    def test_merge_across_processes(self):
+        other = ECommerce(sketches=OrderSketches(top_k=3, precision=12))
+        other.add_product("P1", "Laptop", 1000, 10, "Electronics")
+        other.add_customer("X", "Xavier", "x@example.com", "5555555555")
+        other.place_order("X1", "X", {"P1": 7})
+        # Pickling stands in for shipping a worker's sketches back to the parent.
+        merged = self.store.sketches.merge(pickle.loads(pickle.dumps(other.sketches)))
+        self.assertEqual(merged.estimated_units("P1"), 207)
+        self.assertEqual(merged.orders, 601)
+        with self.assertRaisesRegex(ValueError, "different dimensions"):
+            merged.merge(OrderSketches(precision=8))
+
+
+if __name__ == "__main__":
+    unittest.main()
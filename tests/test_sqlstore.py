@@ -0,0 +1,158 @@
+import datetime
+import os
+import tempfile
+import threading
+import unittest
+
+from ecommerce.ecommerce import ECommerce
+from ecommerce.sqlstore import SQLiteECommerce
+from tests.test_sharding import DAY, populate
+
+
+class TestSQLiteECommerce(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "store.db")
+        self.reference = ECommerce()
+        self.store = SQLiteECommerce(self.path, readers=2)
+        populate(self.reference)
+        populate(self.store)
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_queries_match_the_in_memory_store(self):
+        for method, args in (("list_products", ()), ("list_customers", ()), ("list_orders", ()),
+                             ("generate_sales_report", ()),
+                             ("generate_sales_report", (DAY, DAY + datetime.timedelta(days=30), "week")),
+                             ("sales_by_period", (None, None, "month")),
+                             ("generate_customer_spending_report", ()), ("find_top_selling_product", ()),
+                             ("calculate_total_inventory_value", ()), ("customer_purchase_history", ("C4",)),
+                             ("generate_customer_order_history", ("C5",)), ("customer_purchase_history", ("nobody",)),
+                             ("list_out_of_stock_products", ()), ("get_featured_products", ())):
+            self.assertEqual(getattr(self.store, method)(*args), getattr(self.reference, method)(*args), method)
+        self.assertEqual([(p.product_id, units) for p, units in self.store.top_selling_products()],
+                         [(p.product_id, units) for p, units in self.reference.top_selling_products()])
+        self.assertEqual(self.store.get_highest_spending_customer().customer_id,
+                         self.reference.get_highest_spending_customer().customer_id)
+        for level in ("Bronze", "Silver", "Gold", "Platinum"):
+            self.assertEqual(sorted(c.customer_id for c in self.store.get_customers_by_loyalty(level)),
+                             sorted(c.customer_id for c in self.reference.get_customers_by_loyalty(level)))
+        self.assertEqual(sorted(c.customer_id for c in self.store.find_customers_purchased_product("P1")),
+                         sorted(c.customer_id for c in self.reference.find_customers_purchased_product("P1")))
+        self.assertEqual([c.get_total_spent() for c in self.store.find_customers_with_high_spending(1000)],
+                         [c.get_total_spent() for c in self.reference.find_customers_with_high_spending(1000)])
+        self.assertEqual([p.product_id for p in self.store.find_products_in_price_range(20, 500)], ["P2", "P3"])
+        orders = self.store.get_orders_in_date_range(DAY, DAY + datetime.timedelta(days=1))
+        self.assertEqual([o.order_id for o in orders], ["O0", "O4", "O8", "O1", "O5", "O9"])
+        self.assertEqual(str(self.store.orders.get("O4")), str(self.reference.orders.get("O4")))
+        self.assertEqual(len(self.store.find_orders_by_date(DAY.isoformat())), 3)
+
+    def test_collections(self):
+        self.assertEqual(len(self.store.customers), 12)
+        self.assertIn("C3", self.store.customers)
+        self.assertNotIn("C99", self.store.customers)
+        self.assertIsNone(self.store.orders.get("O99"))
+        self.assertEqual(self.store.products[-1].product_id, "P3")
+        self.assertEqual([c.customer_id for c in self.store.customers][:2], ["C0", "C1"])
+        page, token = self.store.page_orders(page_size=5)
+        while token is not None:
+            more, token = self.store.page_orders(page_size=5, token=token)
+            page.extend(more)
+        self.assertEqual(page, self.reference.list_orders())
+        with self.assertRaisesRegex(ValueError, "Invalid continuation token."):
+            self.store.page_orders(token="x")
+
+    def test_writes_are_all_or_nothing(self):
+        with self.assertRaisesRegex(ValueError, "Not enough stock for product Shirt."):
+            self.store.place_order("O99", "C0", {"P2": 1, "P3": 100})
+        self.assertEqual(self.store.products.get("P2").stock, 34)
+        with self.assertRaisesRegex(ValueError, "Order O1 already exists."):
+            self.store.place_order("O1", "C2", {"P3": 1})
+        with self.assertRaisesRegex(ValueError, "Customer not found."):
+            self.store.place_order("O50", "missing", {"P3": 1})
+        with self.assertRaisesRegex(ValueError, "Product P9 not found."):
+            self.store.place_order("O50", "C2", {"P9": 1})
+        with self.assertRaisesRegex(ValueError, "Invalid quantity for product P3."):
+            self.store.place_order("O50", "C2", {"P3": -1})
+        with self.assertRaisesRegex(ValueError, "Product P1 already exists."):
+            self.store.add_product("P1", "Again", 1, 1, "Misc")
+        with self.assertRaisesRegex(ValueError, "Cannot restock with negative quantity."):
+            self.store.restock_product("P1", -1)
+        self.assertEqual(len(self.store.orders), 12)
+
+    def test_mutations_match_the_in_memory_store(self):
+        for store in (self.store, self.reference):
+            self.assertEqual(store.cancel_order("O5"), "Order O5 has been canceled and stock returned.")
+            self.assertEqual(store.apply_order_discount("O4", 25), "Discount applied to order O4.")
+            self.assertEqual(store.apply_discount_to_category("clothing", 10),
+                             "Discount applied to 1 product(s) in category 'clothing'.")
+            self.assertEqual(store.restock_product("P1", 5), "5 units added to Laptop.")
+            self.assertEqual(store.update_customer_email("C1", "new@example.com"),
+                             "Email for Customer 1 updated to new@example.com.")
+            self.assertEqual(store.update_customer_phone("C2", "1112223333"),
+                             "Phone number for Customer 2 updated to 1112223333.")
+            self.assertEqual(store.deactivate_customer("C3"), "Customer Customer 3's account has been deactivated.")
+            self.assertEqual(store.mark_product_featured("P2"), "Product Phone is now marked as featured.")
+            with self.assertRaisesRegex(ValueError, "Invalid phone number format."):
+                store.update_customer_phone("C2", "555")
+            store.place_order("O60", "C7", {"P3": 2, "P1": 1}, order_date=DAY)
+        for method in ("list_products", "list_customers", "list_orders", "generate_sales_report",
+                       "generate_customer_spending_report"):
+            self.assertEqual(getattr(self.store, method)(), getattr(self.reference, method)(), method)
+        for method in ("get_featured_products", "get_inactive_customers"):
+            self.assertEqual(list(map(str, getattr(self.store, method)())),
+                             list(map(str, getattr(self.reference, method)())), method)
+        self.assertEqual(self.store.sales_by_period(DAY, DAY, "day"), self.reference.sales_by_period(DAY, DAY, "day"))
+        with self.assertRaisesRegex(ValueError, "Order not found."):
+            self.store.cancel_order("O5")
+
+    def test_state_survives_reopening(self):
+        report = self.store.generate_customer_spending_report()
+        self.store.close()
+        self.store = SQLiteECommerce(self.path)
+        self.assertEqual(self.store.generate_customer_spending_report(), report)
+        self.assertEqual(self.store.products.get("P3").stock, self.reference.products.get("P3").stock)
+
+    def test_reads_do_not_wait_for_writes(self):
+        results = []
+        with self.store._writing() as db:
+            db.execute("UPDATE products SET stock = 0 WHERE product_id = 'P1'")
+            reader = threading.Thread(target=lambda: results.append(self.store.products.get("P1").stock))
+            reader.start()
+            reader.join(timeout=5)
+            self.assertFalse(reader.is_alive())
+        # The reader saw the last committed stock, not the open transaction's.
+        self.assertEqual(results, [self.reference.products.get("P1").stock])
+        self.assertEqual(self.store.products.get("P1").stock, 0)
+
+    def test_bulk_import_batches(self):
+        store = SQLiteECommerce()
+        with tempfile.TemporaryDirectory() as directory:
+            paths = {}
+            for name, text in (("products.csv", "product_id,name,price,stock,category\nP1,Pen,2.5,10,Office\n"),
+                               ("customers.csv", "customer_id,name,email,phone_number\n"
+                                                 "A,Ann,a@x.com,5555555555\nB,Bob,b@x.com,5555555555\n"),
+                               ("orders.csv", "order_id,customer_id,product_id,quantity\nO1,A,P1,3\nO2,B,P1,4\n"),
+                               ("too_many.csv", "order_id,customer_id,product_id,quantity\nO3,A,P1,1\nO4,B,P1,9\n")):
+                paths[name] = os.path.join(directory, name)
+                with open(paths[name], "w") as handle:
+                    handle.write(text)
+            self.assertEqual(store.import_products(paths["products.csv"]), 1)
+            self.assertEqual(store.import_customers(paths["customers.csv"]), 2)
+            self.assertEqual(store.import_orders(paths["orders.csv"]), 2)
+            with self.assertRaisesRegex(ValueError, "Not enough stock"):
+                store.import_orders(paths["too_many.csv"])
+            with self.assertRaisesRegex(ValueError, "Customer A already exists."):
+                store.import_customers(paths["customers.csv"])
+        self.assertEqual(store.products.get("P1").stock, 3)
+        self.assertEqual(store.generate_sales_report(), "Total Sales: $17.5")
+        self.assertEqual(store.get_highest_spending_customer().get_total_spent(), 10)
+        self.assertEqual(len(store.orders), 2)
+        store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()